@@ -0,0 +1,174 @@
+"""
+Webhook admission control: every delivery is stored, but how its replies are
+produced depends on the reply backlog.
+
+    decision = admit(channel, n_events)
+    decision.tier       # llm -> cached -> deterministic as the backlog grows
+    decision.dispatch   # False above ADMISSION_SHED_DEPTH: replies left to the autoreply tick
+
+Above ADMISSION_SHED_DEPTH replies are shed to the reconciliation sweep when it runs
+(FACEBOOK_AUTOREPLY_SWEEP_ENABLED / FACEBOOK_AUTOREPLY_ENABLED); with the sweep off
+they are still dispatched, at the deterministic tier, so no event goes unanswered.
+
+Backlog = reply events still waiting to be claimed (MessageEvent.processed is False)
+and the age of the oldest one (worker lag). It is read from the DB, so it covers
+Celery workers in other processes, and refreshed at most every
+ADMISSION_REFRESH_SECONDS; events admitted since the last read are added on top so a
+burst inside one refresh window still counts.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, Tuple
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .db import engine
+from .models import MessageEvent, utcnow
+from .settings import settings
+
+logger = logging.getLogger("admission")
+
+TIERS = ("llm", "cached", "deterministic")
+REPLY_CHANNELS = ("facebook_message", "facebook_comment")
+
+_lock = threading.Lock()
+_read_at = 0.0
+_db_depth = 0
+_db_lag_s = 0.0
+_admitted_since_read = 0
+_counters: Dict[str, int] = {
+    "deliveries": 0,
+    "events": 0,
+    "replies_llm": 0,
+    "replies_cached": 0,
+    "replies_deterministic": 0,
+    "degraded": 0,  # reply events admitted below the llm tier
+    "dropped": 0,  # reply events not dispatched (shed to the autoreply tick)
+}
+
+
+@dataclass(frozen=True)
+class Decision:
+    tier: str
+    dispatch: bool
+    depth: int
+    lag_s: float
+
+
+def _read_backlog() -> Tuple[int, float]:
+    since = utcnow() - timedelta(seconds=int(settings.ADMISSION_WINDOW_SECONDS))
+    with Session(engine) as session:
+        depth, oldest = session.exec(
+            select(func.count(MessageEvent.id), func.min(MessageEvent.created_at)).where(
+                MessageEvent.processed == False,  # noqa: E712
+                MessageEvent.channel.in_(REPLY_CHANNELS),
+                MessageEvent.created_at >= since,
+            )
+        ).one()
+    lag = 0.0
+    if oldest is not None:
+        lag = max(0.0, (utcnow().replace(tzinfo=None) - oldest.replace(tzinfo=None)).total_seconds())
+    return int(depth or 0), lag
+
+
+def backlog(force: bool = False) -> Tuple[int, float]:
+    """(pending reply events, oldest pending age in seconds)."""
+    global _read_at, _db_depth, _db_lag_s, _admitted_since_read
+    now = time.monotonic()
+    with _lock:
+        fresh = not force and now - _read_at < float(settings.ADMISSION_REFRESH_SECONDS)
+        if fresh:
+            return _db_depth + _admitted_since_read, _db_lag_s
+
+    try:
+        depth, lag = _read_backlog()
+    except Exception as e:
+        logger.warning("admission_backlog_read_failed", extra={"extra": {"err": str(e)}})
+        with _lock:
+            return _db_depth + _admitted_since_read, _db_lag_s
+
+    with _lock:
+        _read_at, _db_depth, _db_lag_s, _admitted_since_read = now, depth, lag, 0
+        return depth, lag
+
+
+def tier_for(depth: int, lag_s: float) -> str:
+    if depth >= int(settings.ADMISSION_DETERMINISTIC_DEPTH) or lag_s >= float(
+        settings.ADMISSION_DETERMINISTIC_LAG_SECONDS
+    ):
+        return "deterministic"
+    if depth >= int(settings.ADMISSION_CACHED_DEPTH) or lag_s >= float(settings.ADMISSION_CACHED_LAG_SECONDS):
+        return "cached"
+    return "llm"
+
+
+def sweep_enabled() -> bool:
+    return bool(settings.FACEBOOK_AUTOREPLY_SWEEP_ENABLED or settings.FACEBOOK_AUTOREPLY_ENABLED)
+
+
+def current_tier() -> str:
+    if not bool(settings.ADMISSION_ENABLED):
+        return "llm"
+    return tier_for(*backlog())
+
+
+def admit(channel: str, n_events: int) -> Decision:
+    """Called once per stored delivery with the number of new events it produced."""
+    global _admitted_since_read
+    replies = n_events if channel == "facebook" else 0  # only Facebook events get auto-replies
+
+    if not bool(settings.ADMISSION_ENABLED):
+        depth, lag, tier, dispatch = 0, 0.0, "llm", True
+    else:
+        depth, lag = backlog()
+        tier = tier_for(depth, lag)
+        dispatch = True
+        if depth >= int(settings.ADMISSION_SHED_DEPTH):
+            tier = "deterministic"
+            dispatch = not sweep_enabled()
+
+    with _lock:
+        _counters["deliveries"] += 1
+        _counters["events"] += n_events
+        if replies:
+            if dispatch:
+                _admitted_since_read += replies
+                _counters[f"replies_{tier}"] += replies
+                if tier != "llm":
+                    _counters["degraded"] += replies
+            else:
+                _counters["dropped"] += replies
+
+    if replies and (tier != "llm" or not dispatch):
+        logger.info(
+            "webhook_admission_degraded",
+            extra={"extra": {"tier": tier, "dispatch": dispatch, "depth": depth, "lag_s": round(lag, 1), "events": replies}},
+        )
+    return Decision(tier=tier, dispatch=dispatch, depth=depth, lag_s=lag)
+
+
+def metrics() -> Dict[str, Any]:
+    depth, lag = backlog(force=True)
+    with _lock:
+        counters = dict(_counters)
+    return {
+        "ok": True,
+        "enabled": bool(settings.ADMISSION_ENABLED),
+        "queue_depth": depth,
+        "worker_lag_seconds": round(lag, 2),
+        "tier": tier_for(depth, lag) if bool(settings.ADMISSION_ENABLED) else "llm",
+        "thresholds": {
+            "cached_depth": int(settings.ADMISSION_CACHED_DEPTH),
+            "deterministic_depth": int(settings.ADMISSION_DETERMINISTIC_DEPTH),
+            "shed_depth": int(settings.ADMISSION_SHED_DEPTH),
+            "cached_lag_seconds": float(settings.ADMISSION_CACHED_LAG_SECONDS),
+            "deterministic_lag_seconds": float(settings.ADMISSION_DETERMINISTIC_LAG_SECONDS),
+        },
+        "counters": counters,  # since process start
+    }
@@ -1,65 +1,276 @@
 from __future__ import annotations
 
+import contextvars
+import copy
+import importlib
+import json
 import logging
-from typing import Any, Callable, Dict
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 
+from .. import tracing
 from ..schemas import ToolCall
-from ..tools import (
-    research,
-    shopify,
-    facebook,
-    whatsapp,
-    content,
-    supplier,
-    call_fallback,
-    local_actions,
-)
-
-from ..tools.shopify_autopilot import add_product_full_auto  # ✅ NEW
+from ..settings import settings
+from . import tool_cache
 
 logger = logging.getLogger("agent.executor")
 
 
-TOOL_REGISTRY: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
-    "research.find_winning_product": lambda args: research.find_winning_product(**args),
-    "research.analyze_pricing": lambda args: research.analyze_pricing(**args),
+@dataclass(frozen=True)
+class ToolSpec:
+    """
+    Registry entry: the tool plus the limits execute() enforces.
 
-    "shopify.draft_product": lambda args: shopify.draft_product(**args),
-    "shopify.publish_product": lambda args: shopify.publish_product(**args),
+    target       - "package.module:function" (imported on first use, called as fn(**args))
+                   or a callable taking the args dict
 
-    # ✅ NEW: Full automation (no approval)
-    "shopify.autopilot_add_product": lambda args: add_product_full_auto(**args),
+    deadline_s   - max seconds per attempt (waiting for a concurrency slot included)
+    max_retries  - extra attempts after a timeout/exception; only used when idempotent
+    concurrency  - max in-flight calls of this tool per process
+    idempotent   - safe to retry (no external side effects on a repeat)
+    cache_ttl_s  - >0 memoizes successful results (idempotent tools only)
+    cache_settings - settings that change the result (part of the cache key)
+    invalidate_on  - model names whose DB writes drop cached results
+    """
 
-    "facebook.create_post": lambda args: facebook.create_post(**args),
-    "facebook.reply_comment": lambda args: facebook.reply_comment(**args),
-    "facebook.reply_message": lambda args: facebook.reply_message(**args),
-    "facebook.queue_posts_for_approval": lambda args: facebook.queue_posts_for_approval(**args),
+    target: Union[str, Callable[[Dict[str, Any]], Dict[str, Any]]]
+    deadline_s: float = 30.0
+    max_retries: int = 0
+    concurrency: int = 8
+    idempotent: bool = False
+    cache_ttl_s: float = 0.0
+    cache_settings: Tuple[str, ...] = ()
+    invalidate_on: Tuple[str, ...] = ()
 
-    "whatsapp.send_reply": lambda args: whatsapp.send_reply(**args),
 
-    "content.triage_inbox": lambda args: content.triage_inbox(**args),
-    "content.generate_post": lambda args: content.generate_post(**args),
-    "content.generate_posts_batch": lambda args: content.generate_posts_batch(**args),
-    "content.generate_product_copy": lambda args: content.generate_product_copy(**args),
+TOOL_REGISTRY: Dict[str, ToolSpec] = {
+    "research.find_winning_product": ToolSpec(
+        "app.tools.research:find_winning_product", 10, 1, 8, True, cache_ttl_s=3600
+    ),
+    "research.analyze_pricing": ToolSpec(
+        "app.tools.research:analyze_pricing", 10, 1, 8, True, cache_ttl_s=600, invalidate_on=("ProductDraft",)
+    ),
 
-    "supplier.outreach_draft": lambda args: supplier.outreach_draft(**args),
-    "call_fallback.missed_call_followup": lambda args: call_fallback.missed_call_followup(**args),
+    "shopify.draft_product": ToolSpec("app.tools.shopify:draft_product", 15, 0, 4),
+    "shopify.publish_product": ToolSpec("app.tools.shopify:publish_product", 30, 0, 2),
 
-    "local.write_file": lambda args: local_actions.write_file(**args),
-    "local.exec": lambda args: local_actions.exec_cmd(**args),
+    # ✅ NEW: Full automation (no approval) - 7 image searches + product create
+    "shopify.autopilot_add_product": ToolSpec("app.tools.shopify_autopilot:add_product_full_auto", 180, 0, 2),
 
-    "status.summary": lambda args: {"ok": True, "note": "Use /api/status/summary for full summary."},
+    "facebook.create_post": ToolSpec("app.tools.facebook:create_post", 25, 0, 4),
+    "facebook.reply_comment": ToolSpec("app.tools.facebook:reply_comment", 25, 0, 8),
+    "facebook.reply_message": ToolSpec("app.tools.facebook:reply_message", 25, 0, 8),
+    "facebook.queue_posts_for_approval": ToolSpec("app.tools.facebook:queue_posts_for_approval", 5, 0, 4),
+
+    "whatsapp.send_reply": ToolSpec("app.tools.whatsapp:send_reply", 20, 0, 8),
+
+    "content.triage_inbox": ToolSpec(
+        "app.tools.content:triage_inbox", 10, 1, 4, True, cache_ttl_s=30, invalidate_on=("MessageEvent",)
+    ),
+    "content.generate_post": ToolSpec(
+        "app.tools.content:generate_post", 10, 1, 8, True, cache_ttl_s=3600, cache_settings=("BRAND_NAME",)
+    ),
+    "content.generate_posts_batch": ToolSpec(
+        "app.tools.content:generate_posts_batch", 10, 1, 4, True, cache_ttl_s=3600, cache_settings=("BRAND_NAME",)
+    ),
+    "content.generate_product_copy": ToolSpec(
+        "app.tools.content:generate_product_copy", 10, 1, 4, True, cache_ttl_s=600, invalidate_on=("ProductDraft",)
+    ),
+
+    "supplier.outreach_draft": ToolSpec("app.tools.supplier:outreach_draft", 5, 1, 8, True, cache_ttl_s=86400),
+    "call_fallback.missed_call_followup": ToolSpec(
+        "app.tools.call_fallback:missed_call_followup", 5, 1, 8, True, cache_ttl_s=86400
+    ),
+
+    "local.write_file": ToolSpec("app.tools.local_actions:write_file", 10, 0, 1),
+    "local.exec": ToolSpec("app.tools.local_actions:exec_cmd", 35, 0, 1),
+
+    "status.summary": ToolSpec(
+        lambda args: {"ok": True, "note": "Use /api/status/summary for full summary."}, 5, 0, 8, True, cache_ttl_s=30
+    ),
 }
 
+for _spec_entry in TOOL_REGISTRY.values():
+    tool_cache.watch(_spec_entry.invalidate_on)
+
+_RETRYABLE = ("timeout", "exception")
+
+_sem_lock = threading.Lock()
+_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+
+
+_resolved: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
 
-def execute(call: ToolCall) -> Dict[str, Any]:
-    fn = TOOL_REGISTRY.get(call.name)
-    if not fn:
-        return {"ok": False, "error": "tool_not_found", "tool": call.name}
 
+def _spec(entry: Any) -> Optional[ToolSpec]:
+    if entry is None or isinstance(entry, ToolSpec):
+        return entry
+    return ToolSpec(target=entry)  # plain callables registered at runtime get defaults
+
+
+def _resolve(spec: ToolSpec) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Imports the tool module on first use, so API/worker boot does not pay for every integration."""
+    if callable(spec.target):
+        return spec.target
+    fn = _resolved.get(spec.target)
+    if fn is None:
+        module_name, _, attr = spec.target.partition(":")
+        func = getattr(importlib.import_module(module_name), attr)
+
+        def fn(args: Dict[str, Any], _func: Callable[..., Any] = func) -> Dict[str, Any]:
+            return _func(**args)
+
+        _resolved[spec.target] = fn
+    return fn
+
+
+def _semaphore(name: str, limit: int) -> threading.BoundedSemaphore:
+    with _sem_lock:
+        sem = _semaphores.get(name)
+        if sem is None:
+            sem = _semaphores[name] = threading.BoundedSemaphore(max(1, int(limit)))
+        return sem
+
+
+def _attempt(name: str, spec: ToolSpec, args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One call under the tool's concurrency cap and deadline. The call runs on its own daemon
+    thread; on timeout we stop waiting (Python threads cannot be killed) and its slot is only
+    released when the call really returns, so a hung integration cannot exceed its cap.
+    """
+    t0 = time.monotonic()
+    sem = _semaphore(name, spec.concurrency)
+    if not sem.acquire(timeout=spec.deadline_s):
+        return {
+            "ok": False,
+            "error": "concurrency_limit",
+            "tool": name,
+            "limit": spec.concurrency,
+            "message": f"{name}: no free slot within {spec.deadline_s}s",
+        }
+
+    box: Dict[str, Any] = {}
+    done = threading.Event()
     try:
-        out = fn(call.args or {})
-        return out if isinstance(out, dict) else {"ok": True, "result": out}
+        fn = _resolve(spec)
     except Exception as e:
-        logger.exception("tool_exec_failed", extra={"extra": {"tool": call.name, "err": str(e)}})
-        return {"ok": False, "error": "exception", "tool": call.name, "message": str(e)}
+        sem.release()
+        logger.exception("tool_import_failed", extra={"extra": {"tool": name, "err": str(e)}})
+        return {"ok": False, "error": "tool_import_failed", "tool": name, "message": str(e)}
+
+    ctx = contextvars.copy_context()
+
+    def run() -> None:
+        try:
+            box["out"] = ctx.run(fn, args)
+        except BaseException as e:  # surfaced to the caller below
+            box["exc"] = e
+        finally:
+            sem.release()
+            done.set()
+
+    threading.Thread(target=run, name=f"tool:{name}", daemon=True).start()
+
+    remaining = spec.deadline_s - (time.monotonic() - t0)
+    if not done.wait(max(0.0, remaining)):
+        logger.warning("tool_exec_timeout", extra={"extra": {"tool": name, "deadline_s": spec.deadline_s}})
+        return {
+            "ok": False,
+            "error": "timeout",
+            "tool": name,
+            "deadline_s": spec.deadline_s,
+            "message": f"{name} exceeded its {spec.deadline_s}s deadline",
+        }
+
+    if "exc" in box:
+        e = box["exc"]
+        logger.error(
+            "tool_exec_failed",
+            exc_info=(type(e), e, e.__traceback__),
+            extra={"extra": {"tool": name, "err": str(e)}},
+        )
+        return {"ok": False, "error": "exception", "tool": name, "message": str(e)}
+
+    out = box.get("out")
+    return out if isinstance(out, dict) else {"ok": True, "result": out}
+
+
+def execute(call: ToolCall) -> Dict[str, Any]:
+    return execute_cached(call)[0]
+
+
+def execute_cached(call: ToolCall) -> Tuple[Dict[str, Any], bool]:
+    """execute() plus whether the output came from the memo cache."""
+    spec = _spec(TOOL_REGISTRY.get(call.name))
+    if not spec:
+        return {"ok": False, "error": "tool_not_found", "tool": call.name}, False
+
+    cache_key = None
+    if spec.cache_ttl_s > 0 and spec.idempotent and bool(settings.TOOL_CACHE_ENABLED):
+        cache_key = tool_cache.make_key(call.name, call.args or {}, spec.cache_settings, spec.invalidate_on)
+        hit = tool_cache.get(cache_key)
+        if hit is not None:
+            return hit, True
+
+    attempts = 1 + (max(0, spec.max_retries) if spec.idempotent else 0)
+    out: Dict[str, Any] = {}
+    with tracing.span(f"tool.{call.name}") as sp:
+        for n in range(1, attempts + 1):
+            out = _attempt(call.name, spec, call.args or {})
+            if out.get("error") not in _RETRYABLE:
+                break
+            if n < attempts:
+                time.sleep(min(0.25 * n, 1.0))
+        if sp is not None:
+            sp.set(attempts=n)
+            if out.get("ok") is not True:
+                sp.finish(error=str(out.get("error") or "not_ok"))
+
+    if out.get("ok") is not True and n > 1:
+        out = {**out, "attempts": n}
+    if cache_key and out.get("ok") is True:
+        tool_cache.put(cache_key, out, spec.cache_ttl_s)
+    return out, False
+
+
+class CallMemo:
+    """
+    Shares tool results between the runs of one batch: the first run to reach an
+    idempotent (name, args) call executes it, identical calls from other runs wait for
+    and reuse that output. Non-idempotent tools (Shopify create, replies) always run.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self.hits = 0
+
+    def execute_cached(self, call: ToolCall) -> Tuple[Dict[str, Any], bool, bool]:
+        """execute_cached() plus whether the output was shared from another run's call."""
+        spec = _spec(TOOL_REGISTRY.get(call.name))
+        if not spec or not spec.idempotent:
+            return (*execute_cached(call), False)
+
+        key = json.dumps([call.name, call.args or {}], sort_keys=True, default=str)
+        with self._lock:
+            fut = self._futures.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._futures[key] = Future()
+            else:
+                self.hits += 1
+
+        if not leader:
+            out, cached = fut.result()
+            return copy.deepcopy(out), cached, True
+
+        try:
+            out, cached = execute_cached(call)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        fut.set_result((copy.deepcopy(out), cached))
+        return out, cached, False
@@ -1,15 +1,23 @@
 from __future__ import annotations
 
+import contextvars
+import json
 import logging
-from typing import Any, Dict, List, Optional
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from sqlmodel import Session
+from sqlalchemy import update
+from sqlmodel import Session, select
 
+from .. import tracing
+from ..db import engine
 from ..models import RunRecord, AuditLog
-from ..schemas import CommandResponse, StepResult
+from ..schemas import CommandResponse, StepResult, ToolCall
+from ..settings import settings
 from . import planner
-from .policy import evaluate
-from .executor import execute
+from .policy import PolicyDecision, evaluate
+from .executor import CallMemo, execute_cached
 
 logger = logging.getLogger("agent.orchestrator")
 
@@ -22,8 +30,14 @@ class Orchestrator:
     - No queued_approval status exists
     """
 
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, memo: Optional[CallMemo] = None):
         self.session = session
+        self.memo = memo  # set by run_batch(): identical idempotent calls are shared across runs
+
+    def _commit(self) -> None:
+        # SQLite COMMIT is not a cursor execute, so it gets its own span
+        with tracing.span("db.commit"):
+            self.session.commit()
 
     def _log(
         self,
@@ -42,15 +56,96 @@ class Orchestrator:
                 payload=payload,
             )
         )
-        self.session.commit()
+        self._commit()
 
-    def handle_command(self, text: str) -> CommandResponse:
-        run = RunRecord(command_text=text, status="created", summary="", result_json={})
+    def _policy(self, run_id: Optional[int], idx: int, call: ToolCall) -> PolicyDecision:
+        pol = evaluate(call, context={"run_id": run_id})
+
+        # approvals disabled => convert needs_approval -> allowed
+        pol_dict = pol.__dict__.copy()
+        if pol_dict.get("action") == "needs_approval":
+            pol_dict["action"] = "allowed"
+            pol_dict["risk"] = pol_dict.get("risk") or "high"
+            pol_dict["reason"] = (pol_dict.get("reason") or "") + " | approvals_disabled: executed immediately"
+
+        self._log(
+            run_id,
+            idx,
+            "step",
+            "policy",
+            {"tool": call.name, "decision": pol_dict, "args": call.args},
+        )
+        return pol
+
+    def create_run(self, text: str, status: str = "created") -> RunRecord:
+        run = RunRecord(command_text=text, status=status, summary="", result_json={})
         self.session.add(run)
         self.session.commit()
         self.session.refresh(run)
+        return run
+
+    def handle_command(self, text: str) -> CommandResponse:
+        return self.execute_run(self.create_run(text))
+
+    def _cancel_requested(self, run_id: Optional[int]) -> bool:
+        # read the column directly: the DELETE endpoint writes it from another session/process
+        status = self.session.exec(select(RunRecord.status).where(RunRecord.id == run_id)).first()
+        return status == "cancel_requested"
+
+    def _start(self, run: RunRecord) -> bool:
+        """
+        Moves the run to running unless a cancel (or another worker) got there first: a
+        conditional UPDATE, so a DELETE landing between a status read and this write
+        cannot be overwritten. running is accepted too: an acks_late redelivery of a run
+        whose worker died.
+        """
+        res = self.session.exec(
+            update(RunRecord)
+            .where(RunRecord.id == run.id, RunRecord.status.in_(("created", "queued", "running")))
+            .values(status="running")
+            .execution_options(synchronize_session=False)
+        )
+        self._commit()
+        self.session.refresh(run)
+        return int(res.rowcount or 0) == 1
+
+    def _progress(self, run: RunRecord, steps: List[StepResult], total: int) -> None:
+        run.result_json = {
+            "steps": [s.model_dump() for s in steps],
+            "progress": {"done": len(steps), "total": total},
+        }
+        self.session.add(run)
+        self._commit()
+
+    def execute_run(self, run: RunRecord) -> CommandResponse:
+        with tracing.start_trace("run", run_id=run.id) as trace:
+            resp = self._execute_run(run, trace)
+        if trace is not None:
+            # the root span closes above, so the stored trace covers the whole run
+            compact = trace.compact()
+            run.result_json = {**(run.result_json or {}), "trace": compact}
+            self.session.add(run)
+            self.session.commit()
+            tracing.export(compact, f"run-{run.id}")
+        return resp
 
-        calls = planner.plan(text)
+    def _execute_run(self, run: RunRecord, trace: Optional[tracing.Trace]) -> CommandResponse:
+        t_run = time.perf_counter()
+        text = run.command_text
+
+        if not self._start(run):
+            if run.status == "cancel_requested":
+                run.status = "cancelled"
+                run.summary = "Cancelled before start."
+                self.session.add(run)
+                self.session.commit()
+            # otherwise already finished (a duplicate delivery): report it as it is
+            return CommandResponse(run_id=run.id, status=run.status, summary=run.summary, steps=[])
+
+        with tracing.span("plan") as sp:
+            calls = planner.plan(text)
+            if sp is not None:
+                sp.set(steps=len(calls))
         self._log(
             run.id,
             0,
@@ -59,76 +154,24 @@ class Orchestrator:
             {"command": text, "calls": [c.model_dump() for c in calls]},
         )
 
-        steps: List[StepResult] = []
-
-        for idx, call in enumerate(calls, start=1):
-            pol = evaluate(call, context={"run_id": run.id})
-
-            # approvals disabled => convert needs_approval -> allowed
-            pol_dict = pol.__dict__.copy()
-            if pol_dict.get("action") == "needs_approval":
-                pol_dict["action"] = "allowed"
-                pol_dict["risk"] = pol_dict.get("risk") or "high"
-                pol_dict["reason"] = (pol_dict.get("reason") or "") + " | approvals_disabled: executed immediately"
-
-            self._log(
-                run.id,
-                idx,
-                "step",
-                "policy",
-                {"tool": call.name, "decision": pol_dict, "args": call.args},
-            )
-
-            if pol.action == "blocked":
-                steps.append(
-                    StepResult(
-                        index=idx,
-                        tool=call.name,
-                        risk=pol.risk,
-                        status="blocked",
-                        output={"reason": pol.reason},
-                    )
-                )
-                continue
-
-            # execute immediately (allowed OR needs_approval treated as allowed)
-            out = execute(call)
-
-            if out.get("ok") is True:
-                steps.append(
-                    StepResult(
-                        index=idx,
-                        tool=call.name,
-                        risk=pol.risk,
-                        status="executed",
-                        output=out,
-                    )
-                )
-                self._log(run.id, idx, "step", "executed", {"tool": call.name, "output": out})
-            else:
-                steps.append(
-                    StepResult(
-                        index=idx,
-                        tool=call.name,
-                        risk=pol.risk,
-                        status="error",
-                        output=out,
-                        error=out.get("message"),
-                    )
-                )
-                self._log(run.id, idx, "step", "error", {"tool": call.name, "output": out})
+        steps, cancelled = self._run_steps(run, calls)
 
         # No queued approval concept anymore
-        run.status = "completed"
-        run.summary = "Completed."
+        elapsed_ms = round((time.perf_counter() - t_run) * 1000.0, 1)
+        run.status = "cancelled" if cancelled else "completed"
+        run.summary = "Cancelled." if cancelled else "Completed."
         run.result_json = {
             "steps": [s.model_dump() for s in steps],
+            "progress": {"done": len(steps), "total": len(calls)},
             "approvals_queued": 0,
             "approvals_disabled": True,
+            "elapsed_ms": elapsed_ms,
         }
+        if trace is not None:
+            run.result_json["timing_ms"] = trace.compact()["breakdown_ms"]
 
         self.session.add(run)
-        self.session.commit()
+        self._commit()
 
         return CommandResponse(
             run_id=run.id,
@@ -136,8 +179,139 @@ class Orchestrator:
             summary=run.summary,
             steps=steps,
             approvals_queued=0,
+            elapsed_ms=elapsed_ms,
         )
 
+    def _run_steps(self, run: RunRecord, calls: List[ToolCall]) -> Tuple[List[StepResult], bool]:
+        """
+        Runs the plan as a DAG: a step starts once every step it depends on (depends_on + bind
+        sources) executed OK; independent steps share a bounded thread pool.
+
+        Determinism: policy is evaluated and logged for every step up front, in plan order;
+        execution logs are written in plan order as soon as all earlier steps have finished;
+        the returned StepResults are ordered by index.
+
+        Cancellation is cooperative: once the run is marked cancel_requested no new step is
+        started; running steps finish and the rest are reported as blocked/cancelled.
+        """
+        run_id = run.id
+        cancelled = False
+        ids: Dict[str, int] = {}
+        for idx, call in enumerate(calls, start=1):
+            ids[call.id or f"s{idx}"] = idx
+
+        deps: Dict[int, Set[int]] = {}
+        results: Dict[int, StepResult] = {}
+        policies: Dict[int, PolicyDecision] = {}
+
+        for idx, call in enumerate(calls, start=1):
+            with tracing.span("policy", index=idx, tool=call.name):
+                pol = self._policy(run_id, idx, call)
+            policies[idx] = pol
+
+            names = set(call.depends_on) | {ref.split(".", 1)[0] for ref in call.bind.values()}
+            unknown = sorted(n for n in names if n not in ids)
+            deps[idx] = {ids[n] for n in names if n in ids}
+
+            if pol.action == "blocked":
+                results[idx] = StepResult(
+                    index=idx, tool=call.name, risk=pol.risk, status="blocked", output={"reason": pol.reason}
+                )
+            elif unknown:
+                results[idx] = StepResult(
+                    index=idx,
+                    tool=call.name,
+                    risk=pol.risk,
+                    status="blocked",
+                    output={"reason": "unknown_dependency", "depends_on": unknown},
+                )
+
+        pending = {idx for idx in range(1, len(calls) + 1) if idx not in results}
+        running: Dict[Future, int] = {}
+        log_cursor = 1
+
+        def flush_logs() -> None:
+            nonlocal log_cursor
+            if log_cursor not in results:
+                return
+            while log_cursor in results:
+                r = results[log_cursor]
+                if r.status == "executed":
+                    self._log(run_id, r.index, "step", "executed", {"tool": r.tool, "output": r.output})
+                elif r.status == "error":
+                    self._log(run_id, r.index, "step", "error", {"tool": r.tool, "output": r.output})
+                log_cursor += 1
+            self._progress(run, [results[i] for i in range(1, log_cursor)], len(calls))
+
+        workers = max(1, int(settings.ORCHESTRATOR_MAX_PARALLEL))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="orch-step") as pool:
+            while pending or running:
+                if pending and not cancelled and self._cancel_requested(run_id):
+                    cancelled = True
+                    self._log(run_id, 0, "system", "cancelled", {"pending_steps": sorted(pending)})
+                    for idx in sorted(pending):
+                        results[idx] = StepResult(
+                            index=idx,
+                            tool=calls[idx - 1].name,
+                            risk=policies[idx].risk,
+                            status="blocked",
+                            output={"reason": "cancelled"},
+                        )
+                    pending.clear()
+
+                for idx in sorted(pending):
+                    if any(d in results and results[d].status != "executed" for d in deps[idx]):
+                        pending.discard(idx)
+                        results[idx] = StepResult(
+                            index=idx,
+                            tool=calls[idx - 1].name,
+                            risk=policies[idx].risk,
+                            status="blocked",
+                            output={"reason": "dependency_failed"},
+                        )
+                    elif all(d in results for d in deps[idx]):
+                        pending.discard(idx)
+                        call = _bind_args(calls[idx - 1], ids, results)
+                        # copy per step: a Context can only be entered by one thread at a time
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, _timed_execute, call, idx, self.memo)] = idx
+
+                if not running:
+                    if not pending:
+                        break
+                    # nothing runnable left: the remaining steps wait on each other
+                    for idx in sorted(pending):
+                        results[idx] = StepResult(
+                            index=idx,
+                            tool=calls[idx - 1].name,
+                            risk=policies[idx].risk,
+                            status="blocked",
+                            output={"reason": "dependency_cycle"},
+                        )
+                    pending.clear()
+                    break
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    idx = running.pop(fut)
+                    out, cached, shared, ms = fut.result()
+                    ok = out.get("ok") is True
+                    results[idx] = StepResult(
+                        index=idx,
+                        tool=calls[idx - 1].name,
+                        risk=policies[idx].risk,
+                        status="executed" if ok else "error",
+                        output=out,
+                        error=None if ok else out.get("message"),
+                        elapsed_ms=ms,
+                        cached=cached,
+                        shared=shared,
+                    )
+                flush_logs()
+
+        flush_logs()
+        return [results[idx] for idx in sorted(results)], cancelled
+
     def resume_from_approval(self, run_id: int, approval_id: int) -> CommandResponse:
         # Approvals are removed, so this endpoint shouldn't be used anymore.
         return CommandResponse(
@@ -147,3 +321,101 @@ class Orchestrator:
             steps=[],
             approvals_queued=0,
         )
+
+
+def _timed_execute(
+    call: ToolCall, index: int, memo: Optional[CallMemo] = None
+) -> Tuple[Dict[str, Any], bool, bool, float]:
+    t0 = time.perf_counter()
+    with tracing.span("step", index=index, tool=call.name) as sp:
+        if memo is not None:
+            out, cached, shared = memo.execute_cached(call)
+        else:
+            (out, cached), shared = execute_cached(call), False
+        if sp is not None:
+            sp.set(cached=cached, shared=shared, ok=out.get("ok") is True)
+    return out, cached, shared, round((time.perf_counter() - t0) * 1000.0, 1)
+
+
+def run_batch(texts: List[str], max_parallel: Optional[int] = None) -> Tuple[List[CommandResponse], Dict[str, Any]]:
+    """
+    Runs many commands at once, one RunRecord (and DB session) per command.
+
+    All commands are planned first (warming the planner cache and counting duplicate
+    calls), then executed on a bounded pool sharing one CallMemo, so e.g. ten
+    add-product commands for the same niche do a single research lookup. Process-wide
+    resources (pooled HTTP clients, executor memo cache, recent-title cache) are shared
+    as usual. Returns responses in request order plus an aggregate timing report.
+    """
+    t0 = time.perf_counter()
+    plans = [planner.plan(t) for t in texts]
+    memo = CallMemo()
+    workers = max(1, min(len(texts), int(max_parallel or settings.BATCH_MAX_PARALLEL)))
+
+    def one(text: str) -> CommandResponse:
+        with Session(engine) as session:
+            orch = Orchestrator(session=session, memo=memo)
+            run = orch.create_run(text)
+            try:
+                return orch.execute_run(run)
+            except Exception as e:
+                logger.exception("batch_command_failed", extra={"extra": {"run_id": run.id, "err": str(e)}})
+                session.rollback()
+                run.status = "failed"
+                run.summary = f"Failed: {e}"
+                session.add(run)
+                session.commit()
+                return CommandResponse(run_id=run.id, status=run.status, summary=run.summary, steps=[])
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-cmd") as pool:
+        results = list(pool.map(one, texts))
+
+    tools: Dict[str, Dict[str, Any]] = {}
+    for r in results:
+        for s in r.steps:
+            t = tools.setdefault(s.tool, {"calls": 0, "ms": 0.0, "cached": 0, "shared": 0, "errors": 0})
+            t["calls"] += 1
+            t["ms"] = round(t["ms"] + (s.elapsed_ms or 0.0), 1)
+            t["cached"] += int(s.cached)
+            t["shared"] += int(s.shared)
+            t["errors"] += int(s.status == "error")
+
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[r.status] = statuses.get(r.status, 0) + 1
+
+    timing = {
+        "commands": len(texts),
+        "max_parallel": workers,
+        "wall_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+        "sum_command_ms": round(sum(r.elapsed_ms or 0.0 for r in results), 1),
+        "planned_calls": sum(len(p) for p in plans),
+        "distinct_calls": len({json.dumps([c.name, c.args], sort_keys=True, default=str) for p in plans for c in p}),
+        "shared_calls": memo.hits,
+        "cache_hits": sum(t["cached"] for t in tools.values()),
+        "statuses": statuses,
+        "tools": tools,
+    }
+    return results, timing
+
+
+def _lookup(data: Any, path: str) -> Any:
+    for part in [p for p in path.split(".") if p]:
+        if isinstance(data, dict):
+            data = data.get(part)
+        elif isinstance(data, list) and part.isdigit() and int(part) < len(data):
+            data = data[int(part)]
+        else:
+            return None
+    return data
+
+
+def _bind_args(call: ToolCall, ids: Dict[str, int], results: Dict[int, StepResult]) -> ToolCall:
+    """Copies upstream outputs into args, e.g. bind={"product_id": "s1.draft_id"}."""
+    if not call.bind:
+        return call
+    args = dict(call.args or {})
+    for arg, ref in call.bind.items():
+        step_id, _, path = ref.partition(".")
+        args[arg] = _lookup(results[ids[step_id]].output, path)
+    return call.model_copy(update={"args": args})
@@ -1,13 +1,27 @@
 from __future__ import annotations
 
+import copy
 import re
-from typing import List
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
 
+from ..intents import classify
 from ..schemas import ToolCall
+from ..settings import settings
+
+_WS_RE = re.compile(r"\s+")
+_NICHE_KV_RE = re.compile(r"\bniche\s*[:=]\s*(\"[^\"]+\"|'[^']+'|[^,;\n]+)", re.I)
+_NICHE_FOR_RE = re.compile(r"\bfor\s+([a-z0-9 &\-\_]+)")
+_NICHE_BETWEEN_RE = re.compile(
+    r"\b(?:add|create|make|publish|post|put|launch|upload)\b(.*?)(?:\bproduct\b|\bitem\b|\bgoods\b|\bsku\b)"
+)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_QTY_RE = re.compile(r"\b(?:qty|quantity|inventory|inventory_qty)\s*[:=]\s*(\d+)", re.I)
 
 
 def _norm(text: str) -> str:
-    return re.sub(r"\s+", " ", (text or "").strip())
+    return _WS_RE.sub(" ", (text or "").strip())
 
 
 _STOP = {
@@ -19,74 +33,108 @@ _STOP = {
 }
 
 
-_ADD_HINTS = ("add", "create", "make", "publish", "post", "put", "launch", "upload")
-_PRODUCT_HINTS = ("product", "item", "goods", "sku")
-
-
 def _extract_niche(raw: str) -> str | None:
     s = _norm(raw)
     low = s.lower()
 
     # explicit niche=...
-    m = re.search(r"\bniche\s*[:=]\s*(\"[^\"]+\"|'[^']+'|[^,;\n]+)", s, re.I)
+    m = _NICHE_KV_RE.search(s)
     if m:
         v = m.group(1).strip().strip('"').strip("'").strip()
         return v or None
 
     # "for summer", "for electronics", "for home decor"
-    m2 = re.search(r"\bfor\s+([a-z0-9 &\-\_]+)", low)
+    m2 = _NICHE_FOR_RE.search(low)
     if m2:
         cand = m2.group(1)
-        words = [w for w in re.findall(r"[a-z0-9]+", cand) if w and w not in _STOP]
+        words = [w for w in _WORD_RE.findall(cand) if w and w not in _STOP]
         niche = " ".join(words).strip()
         return niche or None
 
     # words between add/create and product/item
-    m3 = re.search(
-        r"\b(?:add|create|make|publish|post|put|launch|upload)\b(.*?)(?:\bproduct\b|\bitem\b|\bgoods\b|\bsku\b)",
-        low,
-    )
+    m3 = _NICHE_BETWEEN_RE.search(low)
     if m3:
         cand = m3.group(1)
-        words = [w for w in re.findall(r"[a-z0-9]+", cand) if w and w not in _STOP]
+        words = [w for w in _WORD_RE.findall(cand) if w and w not in _STOP]
         niche = " ".join(words).strip()
         return niche or None
 
     return None
 
 
-def plan(command_text: str) -> List[ToolCall]:
-    raw = _norm(command_text)
-    t = raw.lower()
+def _niche_arg(raw: str) -> Dict[str, Any]:
+    niche = _extract_niche(raw)
+    return {"niche": niche} if niche else {}
+
 
-    if any(k in t for k in ["show me system status", "system status", "status summary", "health"]):
-        return [ToolCall(name="status.summary", args={})]
+def _qty_arg(raw: str) -> Dict[str, Any]:
+    m = _QTY_RE.search(raw)
+    return {"inventory_qty": int(m.group(1))} if m else {}
 
-    if "triage inbox" in t or ("triage" in t and "inbox" in t):
-        return [ToolCall(name="content.triage_inbox", args={"limit": 50})]
 
+@dataclass(frozen=True)
+class Rule:
+    """
+    One planner rule. Rules are tried in order; the first match wins.
+
+    when     - alternatives of intent sets (app.intents); the rule matches if the command
+               has every intent of at least one set. () as a set matches everything.
+    calls    - ToolCall templates: (tool name, static args)
+    extract  - functions raw_text -> extra args, merged into the first call
+    """
+
+    name: str
+    when: Tuple[Tuple[str, ...], ...]
+    calls: Tuple[Tuple[str, Dict[str, Any]], ...]
+    extract: Tuple[Callable[[str], Dict[str, Any]], ...] = ()
+
+
+RULES: Tuple[Rule, ...] = (
+    Rule("status", when=(("status",),), calls=(("status.summary", {}),)),
+    Rule("triage_inbox", when=(("triage", "inbox"),), calls=(("content.triage_inbox", {"limit": 50}),)),
     # ✅ MAIN RULE: any "add/create/publish + product/item/sku" => Shopify autopilot
-    looks_like_add_product = (
-        any(h in t for h in _ADD_HINTS) and any(p in t for p in _PRODUCT_HINTS)
-    ) or ("winning product" in t or "wining product" in t)
-
-    if looks_like_add_product:
-        args = {}
-
-        niche = _extract_niche(raw)
-        if niche:
-            args["niche"] = niche
-
-        m_qty = re.search(r"\b(?:qty|quantity|inventory|inventory_qty)\s*[:=]\s*(\d+)", raw, re.I)
-        if m_qty:
-            try:
-                args["inventory_qty"] = int(m_qty.group(1))
-            except Exception:
-                pass
-
-        return [ToolCall(name="shopify.autopilot_add_product", args=args)]
-
-    return [
-        ToolCall(name="content.triage_inbox", args={"limit": 20}),
-        ToolCall(name="status.summary", args={}),
-    ]
+    Rule(
+        "add_product",
+        when=(("add", "product"), ("winning",)),
+        calls=(("shopify.autopilot_add_product", {}),),
+        extract=(_niche_arg, _qty_arg),
+    ),
+    Rule(
+        "default",
+        when=((),),
+        calls=(("content.triage_inbox", {"limit": 20}), ("status.summary", {})),
+    ),
+)
+
+# (intent sets, rule) pairs, built once at import
+_COMPILED: Tuple[Tuple[Tuple[frozenset, ...], Rule], ...] = tuple(
+    (tuple(frozenset(group) for group in rule.when), rule) for rule in RULES
+)
+
+_Plan = Tuple[Tuple[str, Dict[str, Any]], ...]
+
+
+def _match(raw: str) -> _Plan:
+    intents = classify(raw)
+    for groups, rule in _COMPILED:
+        if any(g <= intents for g in groups):
+            calls = [(name, dict(args)) for name, args in rule.calls]
+            for fn in rule.extract:
+                calls[0][1].update(fn(raw))
+            return tuple(calls)
+    return ()
+
+
+_plan_cached = lru_cache(maxsize=max(0, int(settings.PLANNER_CACHE_SIZE)))(_match)
+
+
+def plan(command_text: str) -> List[ToolCall]:
+    """
+    Plans are cached by whitespace-normalized text (case is kept: niche=... values are
+    case-sensitive). Each call gets fresh ToolCall objects, so callers may mutate them.
+    """
+    return [ToolCall(name=name, args=copy.deepcopy(args)) for name, args in _plan_cached(_norm(command_text))]
+
+
+def plan_cache_info() -> Dict[str, Any]:
+    return _plan_cached.cache_info()._asdict()
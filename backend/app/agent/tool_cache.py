@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlmodel import Session
+
+from ..redis_client import get_redis
+from ..settings import settings
+
+logger = logging.getLogger("agent.tool_cache")
+
+_GEN_PREFIX = "jarvis:toolcache:gen:"
+
+_lock = threading.Lock()
+_store: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_local_gen: Dict[str, int] = {}
+_watched: set[str] = set()  # only these tables bump generations on commit
+
+
+# ------------------------------
+# Invalidation: a generation counter per table
+# ------------------------------
+def _generations(models: Iterable[str]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Current generation of each model. Redis makes writes in one process (e.g. the nightly
+    worker creating a ProductDraft) invalidate cached results in every other process.
+    """
+    names = sorted(set(models))
+    if not names:
+        return ()
+    with _lock:
+        local = [str(_local_gen.get(n, 0)) for n in names]
+    try:
+        remote = get_redis().mget([_GEN_PREFIX + n for n in names])
+    except Exception:
+        remote = [None] * len(names)
+    return tuple((n, f"{l}.{r or 0}") for n, l, r in zip(names, local, remote))
+
+
+def generation(model: str) -> str:
+    """Tag that changes whenever a write to a watched model commits (in any process)."""
+    return _generations([model])[0][1]
+
+
+def watch(models: Iterable[str]) -> None:
+    _watched.update(models)
+
+
+def invalidate(model: str) -> None:
+    with _lock:
+        _local_gen[model] = _local_gen.get(model, 0) + 1
+    try:
+        get_redis().incr(_GEN_PREFIX + model)
+    except Exception:
+        pass
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_models(session, _flush_context) -> None:
+    written = session.info.setdefault("toolcache_written", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        name = type(obj).__name__
+        if name in _watched:
+            written.add(name)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_models(session) -> None:
+    for model in session.info.pop("toolcache_written", ()):
+        invalidate(model)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_written_models(session) -> None:
+    session.info.pop("toolcache_written", None)
+
+
+# ------------------------------
+# Store
+# ------------------------------
+def make_key(
+    tool: str,
+    args: Dict[str, Any],
+    settings_keys: Iterable[str] = (),
+    invalidate_on: Iterable[str] = (),
+) -> str:
+    raw = json.dumps(
+        {
+            "tool": tool,
+            "args": args or {},
+            "settings": {k: getattr(settings, k, None) for k in sorted(settings_keys)},
+            "gen": _generations(invalidate_on),
+        },
+        sort_keys=True,
+        default=str,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        hit = _store.get(key)
+        if hit is None:
+            return None
+        expires_at, value = hit
+        if expires_at < time.monotonic():
+            _store.pop(key, None)
+            return None
+        _store.move_to_end(key)
+    return copy.deepcopy(value)
+
+
+def put(key: str, value: Dict[str, Any], ttl_s: float) -> None:
+    with _lock:
+        _store[key] = (time.monotonic() + ttl_s, copy.deepcopy(value))
+        _store.move_to_end(key)
+        while len(_store) > int(settings.TOOL_CACHE_MAX_ENTRIES):
+            _store.popitem(last=False)
+
+
+def clear() -> None:
+    with _lock:
+        _store.clear()
@@ -5,6 +5,7 @@ from .routes_command import router as command_router
 from .routes_approvals import router as approvals_router
 from .routes_logs import router as logs_router
 from .routes_runs import router as runs_router
+from .routes_usage import router as usage_router
 from .webhooks_facebook import router as facebook_webhook_router
 from .webhooks_whatsapp import router as whatsapp_webhook_router
 
@@ -20,6 +21,7 @@ def build_api_router() -> APIRouter:
     router.include_router(approvals_router)
     router.include_router(logs_router)
     router.include_router(runs_router)
+    router.include_router(usage_router)
 
     # ✅ this line makes /api/auth/* work
     router.include_router(auth_router)
@@ -1,16 +1,113 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+import logging
+from typing import Callable, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Response
 from sqlmodel import Session
 
+from .. import idempotency
 from ..deps import get_session
-from ..schemas import CommandRequest, CommandResponse
-from ..agent.orchestrator import Orchestrator
+from ..models import RunRecord
+from ..schemas import BatchCommandRequest, BatchCommandResponse, CommandRequest, CommandResponse
+from ..agent.orchestrator import Orchestrator, run_batch
 
+logger = logging.getLogger("api.command")
 router = APIRouter(prefix="/api", tags=["command"])
 
 
-@router.post("/command", response_model=CommandResponse)
-def post_command(payload: CommandRequest, session: Session = Depends(get_session)) -> CommandResponse:
+def submit_command(
+    session: Session,
+    text: str,
+    background: bool,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    on_run: Optional[Callable[[RunRecord], None]] = None,
+) -> CommandResponse:
     orch = Orchestrator(session=session)
-    return orch.handle_command(payload.text)
+    if not background:
+        run = orch.create_run(text)
+        if on_run:
+            on_run(run)
+        return orch.execute_run(run)
+
+    from ..celery_app import celery_app  # deferred: the sync path never needs celery/kombu
+
+    run = orch.create_run(text, status="queued")
+    if on_run:
+        on_run(run)
+    try:
+        celery_app.send_task("app.tasks.jobs.execute_run", args=[run.id], ignore_result=True)
+        queue = "celery"
+    except Exception as e:
+        # broker down: still answer fast and run in this process after the response
+        from ..tasks.jobs import run_in_background
+
+        logger.warning("enqueue_failed_running_in_process", extra={"extra": {"run_id": run.id, "err": str(e)}})
+        background_tasks.add_task(run_in_background, run.id)
+        queue = "in_process"
+
+    response.status_code = 202
+    return CommandResponse(
+        run_id=run.id,
+        status=run.status,
+        summary=f"Queued ({queue}). Poll GET /api/runs/{run.id}.",
+        steps=[],
+    )
+
+
+@router.post("/command", response_model=CommandResponse)
+def post_command(
+    payload: CommandRequest,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    session: Session = Depends(get_session),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+) -> CommandResponse:
+    if not idempotency_key:
+        return submit_command(session, payload.text, payload.background, background_tasks, response)
+
+    req_hash = idempotency.request_hash(payload.model_dump())
+    claimed, row = idempotency.claim("command", idempotency_key, req_hash)
+    if not claimed:
+        return _replay(row, req_hash, response)
+
+    try:
+        result = submit_command(
+            session,
+            payload.text,
+            payload.background,
+            background_tasks,
+            response,
+            on_run=lambda run: idempotency.attach_run(row.key_hash, run.id),
+        )
+    except Exception:
+        idempotency.release(row.key_hash)
+        raise
+    idempotency.complete(row.key_hash, result.model_dump(), response.status_code or 200, result.run_id)
+    return result
+
+
+def _replay(row, req_hash: str, response: Response) -> CommandResponse:
+    """Same key again: return the stored response, waiting for the original if it is still running."""
+    if row.request_hash and row.request_hash != req_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+
+    if row.status == "in_progress":
+        row = idempotency.wait(row.key_hash) or row
+    if row.status != "completed":
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "request_in_progress", "run_id": row.run_id, "poll": f"/api/runs/{row.run_id}" if row.run_id else None},
+        )
+
+    response.status_code = row.status_code
+    response.headers["Idempotent-Replayed"] = "true"
+    return CommandResponse(**row.response)
+
+
+@router.post("/commands/batch", response_model=BatchCommandResponse)
+def post_commands_batch(payload: BatchCommandRequest) -> BatchCommandResponse:
+    # no request session: every command gets its own (runs execute concurrently)
+    results, timing = run_batch(payload.commands, payload.max_parallel)
+    return BatchCommandResponse(results=results, timing=timing)
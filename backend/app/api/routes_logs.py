@@ -3,6 +3,7 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends, Query
 from sqlmodel import Session, select
 
+from .. import blobstore
 from ..deps import get_session
 from ..models import AuditLog
 
@@ -14,6 +15,7 @@ def list_logs(
     session: Session = Depends(get_session),
     limit: int = Query(50, ge=1, le=500),
     run_id: int | None = Query(None),
+    expand_raw: bool = Query(False, description="inline raw webhook bodies instead of their blob refs"),
 ):
     stmt = select(AuditLog).order_by(AuditLog.id.desc()).limit(limit)
     if run_id is not None:
@@ -28,7 +30,7 @@ def list_logs(
             "step_index": l.step_index,
             "event_type": l.event_type,
             "message": l.message,
-            "payload": l.payload,
+            "payload": blobstore.audit_payload(l, session) if expand_raw else l.payload,
         }
         for l in logs
     ]
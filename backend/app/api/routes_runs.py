@@ -1,24 +1,53 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response
+from sqlalchemy import update
 from sqlmodel import Session
 
+from .. import tracing
 from ..deps import get_session
+from ..models import AuditLog, RunRecord
 from ..agent.orchestrator import Orchestrator
+from .routes_command import submit_command
 
 router = APIRouter(prefix="/api", tags=["runs"])
 
+_ACTIVE = ("created", "queued", "running")
+
+# cancellation is cooperative (agent/orchestrator.py): it is checked between steps only
+_CANCEL_SCOPE = "between_steps: steps already running finish, no new step starts"
+
+
+def _run_view(run: RunRecord) -> dict:
+    res = run.result_json or {}
+    return {
+        "id": run.id,
+        "created_at": run.created_at.isoformat(),
+        "command_text": run.command_text,
+        "status": run.status,
+        "summary": run.summary,
+        "progress": res.get("progress") or {"done": len(res.get("steps") or []), "total": None},
+        "steps": res.get("steps") or [],
+        "elapsed_ms": res.get("elapsed_ms"),
+        "timing_ms": res.get("timing_ms"),
+    }
+
 
 @router.post("/run/shopify")
-def run_shopify(session: Session = Depends(get_session), payload: dict | None = None):
+def run_shopify(
+    background_tasks: BackgroundTasks,
+    response: Response,
+    session: Session = Depends(get_session),
+    payload: dict | None = None,
+):
     action = (payload or {}).get("action", "draft_product")
-    orch = Orchestrator(session=session)
     text_map = {
         "draft_product": "Add a winning product and prepare it to sell",
         "analyze_pricing": "Analyze product and propose best price",
         "publish": f"Publish product {(payload or {}).get('product_id', '123')}",
     }
-    return orch.handle_command(text_map.get(action, "Add a winning product and prepare it to sell"))
+    text = text_map.get(action, "Add a winning product and prepare it to sell")
+    return submit_command(session, text, bool((payload or {}).get("background")), background_tasks, response)
 
 
 @router.post("/run/inbox")
@@ -28,3 +57,60 @@ def run_inbox(session: Session = Depends(get_session), payload: dict | None = No
     if action == "triage":
         return orch.handle_command("Triage inbox")
     return orch.handle_command("Show me system status")
+
+
+@router.get("/runs/{run_id}")
+def get_run(run_id: int, session: Session = Depends(get_session)):
+    run = session.get(RunRecord, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return _run_view(run)
+
+
+@router.get("/runs/{run_id}/trace")
+def get_run_trace(run_id: int, format: str = "waterfall", session: Session = Depends(get_session)):
+    run = session.get(RunRecord, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    trace = (run.result_json or {}).get("trace")
+    if not trace:
+        raise HTTPException(status_code=404, detail="No trace recorded for this run")
+    if format == "otlp":
+        return tracing.to_otlp(trace)
+
+    spans = tracing.waterfall(trace)
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "trace_id": trace.get("trace_id"),
+        "duration_ms": spans[0]["dur_ms"] if spans else None,
+        "breakdown_ms": trace.get("breakdown_ms") or {},
+        "dropped_spans": trace.get("dropped", 0),
+        "spans": spans,
+    }
+
+
+@router.delete("/runs/{run_id}")
+def cancel_run(run_id: int, session: Session = Depends(get_session)):
+    run = session.get(RunRecord, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.status == "cancel_requested":
+        return {**_run_view(run), "cancel": _CANCEL_SCOPE}
+    if run.status not in _ACTIVE:
+        raise HTTPException(status_code=409, detail=f"Run already {run.status}")
+
+    # conditional: a run that finished since the read above keeps its final status
+    res = session.exec(
+        update(RunRecord)
+        .where(RunRecord.id == run_id, RunRecord.status.in_(_ACTIVE))
+        .values(status="cancel_requested")
+        .execution_options(synchronize_session=False)
+    )
+    if int(res.rowcount or 0) == 1:
+        session.add(AuditLog(run_id=run.id, event_type="system", message="cancel_requested", payload={}))
+    session.commit()
+    session.refresh(run)
+    if run.status != "cancel_requested":
+        raise HTTPException(status_code=409, detail=f"Run already {run.status}")
+    return {**_run_view(run), "cancel": _CANCEL_SCOPE}
@@ -3,16 +3,20 @@ from __future__ import annotations
 from fastapi import APIRouter, Depends
 from sqlmodel import Session, select
 
+from .. import admission, catalog, lease
 from ..deps import get_session
 from ..settings import settings
 from ..models import Approval, RunRecord, AuditLog
 from ..schemas import StatusResponse, StatusSummary
+from ..tools import reply_cache
+from ..tools.ollama import model_state
 
 router = APIRouter(prefix="/api", tags=["status"])
 
 
 @router.get("/status", response_model=StatusResponse)
 def get_status() -> StatusResponse:
+    ollama = model_state()
     return StatusResponse(
         ok=True,
         dry_run=bool(settings.DRY_RUN),
@@ -21,9 +25,32 @@ def get_status() -> StatusResponse:
         redis_url=settings.REDIS_URL,
         local_actions_enabled=bool(settings.LOCAL_ACTIONS_ENABLED),
         ollama_enabled=bool(settings.OLLAMA_ENABLED),
+        ollama_model_resident=ollama.get("resident"),
+        ollama=ollama,
     )
 
 
+@router.get("/status/admission")
+def get_admission_status():
+    """Webhook reply backlog, current reply tier, degrade/drop counters (this process)."""
+    return {**admission.metrics(), "reply_cache": reply_cache.stats()}
+
+
+@router.get("/status/leases")
+def get_lease_status():
+    """Periodic-task leases: current holder and acquired/skipped/lost/unlocked counters."""
+    return lease.stats()
+
+
+@router.get("/status/catalog")
+def get_catalog_status(resolve: str = ""):
+    """Research catalog: loaded files, index size, reloads; ?resolve=<text> shows how a niche resolves."""
+    out = catalog.stats()
+    if resolve:
+        out["resolve"] = catalog.match(resolve).__dict__
+    return out
+
+
 @router.get("/status/summary", response_model=StatusSummary)
 def get_status_summary(session: Session = Depends(get_session)) -> StatusSummary:
     pending = session.exec(select(Approval).where(Approval.status == "pending")).all()
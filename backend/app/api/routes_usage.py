@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from ..deps import get_session
+from ..tools.llm_usage import usage_report
+
+router = APIRouter(prefix="/api", tags=["usage"])
+
+
+@router.get("/usage/llm")
+def get_llm_usage(
+    session: Session = Depends(get_session),
+    minutes: int = Query(60, ge=1, le=60 * 24 * 30),
+):
+    return usage_report(session, minutes=minutes)
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
 import logging
-from fastapi import APIRouter, Depends, Request
+from typing import Any, Dict, List, Tuple
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 
+from .. import admission
 from ..deps import get_session
-from ..models import AuditLog, MessageEvent
+from ..models import AuditLog
 from ..settings import settings
-from ..tools.content import draft_reply
-from ..tools import facebook as fb
+from ..tools.ollama import mark_webhook_traffic
+from ..webhook_events import facebook_events, store_delivery
 
 logger = logging.getLogger("webhooks.facebook")
 router = APIRouter(tags=["webhooks"])
@@ -30,76 +34,27 @@ async def facebook_verify(request: Request, session: Session = Depends(get_sessi
 
 
 @router.post("/webhooks/facebook")
-async def facebook_webhook(request: Request, session: Session = Depends(get_session)):
+async def facebook_webhook(request: Request, background_tasks: BackgroundTasks):
+    """
+    Fast ack: store the delivery and its events in one transaction (off the event loop)
+    and return. Replies are drafted/sent by tasks/replies.py after the response, at the
+    tier admission picked for the current backlog (or left to the reconciliation sweep
+    when shedding).
+    """
     payload = await request.json()
-    session.add(AuditLog(event_type="webhook", message="facebook_event", payload=payload))
-    session.commit()
-
-    # ---------- 1) Messenger messages ----------
-    try:
-        for entry in (payload.get("entry") or []):
-            for msg in (entry.get("messaging") or []):
-                sender = (msg.get("sender") or {}).get("id") or ""
-                message = msg.get("message") or {}
-                text = message.get("text") or ""
-                mid = message.get("mid") or ""
-
-                # Ignore echo
-                if message.get("is_echo") is True:
-                    continue
-
-                if sender and text:
-                    session.add(
-                        MessageEvent(
-                            channel="facebook_message",
-                            external_id=mid,
-                            from_user=sender,
-                            text=text,
-                            meta={"raw": msg},
-                        )
-                    )
-                    session.commit()
-
-                    drafted = draft_reply(channel="facebook_message", from_user=sender, text=text, brand=None)
-                    fb.reply_message(sender, drafted["text"])
-
-    except Exception as e:
-        logger.exception("facebook_message_flow_failed", extra={"extra": {"err": str(e)}})
-
-    # ---------- 2) Feed comments ----------
-    # NOTE: Feed webhooks can come in entry[].changes[].value
-    try:
-        for entry in (payload.get("entry") or []):
-            for ch in (entry.get("changes") or []):
-                value = ch.get("value") or {}
-
-                # Typical fields for comment events:
-                # item: "comment", verb: "add"
-                item = value.get("item")
-                verb = value.get("verb")
-                if item != "comment" or verb not in ("add", "edited"):
-                    continue
+    event_ids, decision = await run_in_threadpool(_ingest, payload)
+    if event_ids and decision.dispatch:
+        background_tasks.add_task(_dispatch_replies, event_ids, decision.tier)
+    return {"ok": True, "events": len(event_ids)}
 
-                comment_id = value.get("comment_id") or value.get("id") or ""
-                comment_text = value.get("message") or ""
-                from_id = (value.get("from") or {}).get("id") or value.get("from_id") or ""
 
-                if comment_id and comment_text:
-                    session.add(
-                        MessageEvent(
-                            channel="facebook_comment",
-                            external_id=comment_id,
-                            from_user=from_id or "unknown",
-                            text=comment_text,
-                            meta={"raw": ch},
-                        )
-                    )
-                    session.commit()
+def _dispatch_replies(event_ids: List[int], tier: str) -> None:
+    from ..tasks.replies import dispatch  # deferred: celery loads on the first delivery, not at API boot
 
-                    drafted = draft_reply(channel="facebook_comment", from_user=from_id or "unknown", text=comment_text, brand=None)
-                    fb.reply_comment(comment_id, drafted["text"])
+    dispatch(event_ids, tier)
 
-    except Exception as e:
-        logger.exception("facebook_comment_flow_failed", extra={"extra": {"err": str(e)}})
 
-    return {"ok": True}
+def _ingest(payload: Any) -> Tuple[List[int], admission.Decision]:
+    mark_webhook_traffic()
+    event_ids = store_delivery("facebook_event", payload, facebook_events(payload))
+    return event_ids, admission.admit("facebook", len(event_ids))
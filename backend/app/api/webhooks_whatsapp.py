@@ -1,51 +1,36 @@
 from __future__ import annotations
 
 import logging
+from typing import Any, Dict
+
 from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 
+from .. import admission
 from ..deps import get_session
-from ..models import AuditLog, MessageEvent
+from ..models import AuditLog
 from ..settings import settings
-from ..tools.content import draft_reply
+from ..tools.ollama import mark_webhook_traffic
+from ..webhook_events import store_delivery, whatsapp_events
 
 logger = logging.getLogger("webhooks.whatsapp")
 router = APIRouter(tags=["webhooks"])
 
 
 @router.post("/webhooks/whatsapp")
-async def whatsapp_webhook(request: Request, session: Session = Depends(get_session)):
+async def whatsapp_webhook(request: Request):
+    # fast ack: persist off the event loop; nothing is drafted inline
     payload = await request.json()
-    session.add(AuditLog(event_type="webhook", message="whatsapp_event", payload=payload))
-    session.commit()
-
-    try:
-        entries = payload.get("entry", []) or []
-        for entry in entries:
-            changes = entry.get("changes", []) or []
-            for ch in changes:
-                val = (ch.get("value") or {})
-                messages = val.get("messages", []) or []
-                for m in messages:
-                    from_user = m.get("from", "")
-                    mid = m.get("id", "")
-                    body = ((m.get("text") or {}).get("body")) or ""
-                    if body:
-                        session.add(
-                            MessageEvent(
-                                channel="whatsapp_message",
-                                external_id=mid,
-                                from_user=from_user,
-                                text=body,
-                                meta={"raw": m},
-                            )
-                        )
-        session.commit()
-    except Exception as e:
-        logger.exception("whatsapp_ingest_failed", extra={"extra": {"err": str(e)}})
+    stored = await run_in_threadpool(_ingest, payload)
+    return {"ok": True, "events": stored}
+
 
-    drafted = draft_reply(channel="whatsapp_message", from_user="unknown", text="(see logs)", brand=None)
-    return {"ok": True, "draft_reply_example": drafted}
+def _ingest(payload: Any) -> int:
+    mark_webhook_traffic()
+    stored = len(store_delivery("whatsapp_event", payload, whatsapp_events(payload)))
+    admission.admit("whatsapp", stored)  # counted only: WhatsApp events are not auto-replied
+    return stored
 
 
 @router.get("/webhooks/whatsapp")
@@ -0,0 +1,106 @@
+"""
+Content-addressed store for raw JSON payloads (RawBlob table).
+
+    ref = put(session, payload)          # sha256 of the canonical JSON; no-op if present
+    body = get(ref)                      # decompressed dict, small LRU in front
+    event_raw(ev) / audit_payload(log)   # lazy accessors for rows that only keep the ref
+
+A webhook delivery is stored once. Its AuditLog row keeps {"raw_blob": sha, ...} and
+each MessageEvent keeps {"raw_blob": sha, "raw_path": [...]}: the path of its item
+inside the delivery, so a message's raw dict is never written a second time.
+Rows written before the store existed still carry the body inline and are returned
+as-is.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+
+from .db import engine
+from .models import AuditLog, MessageEvent, RawBlob, utcnow
+from .settings import settings
+
+_CACHE_MAX = 256
+_cache: "OrderedDict[str, Any]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def encode(obj: Any) -> Tuple[str, bytes]:
+    """Returns (sha256, canonical JSON bytes). Key order does not change the hash."""
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest(), raw
+
+
+def put(session: Session, obj: Any) -> str:
+    """Stores obj in the caller's transaction (committed with it). Returns its sha256."""
+    sha, raw = encode(obj)
+    session.exec(
+        sqlite_insert(RawBlob)
+        .values(
+            sha256=sha,
+            created_at=utcnow(),
+            size=len(raw),
+            data=zlib.compress(raw, int(settings.RAW_BLOB_COMPRESS_LEVEL)),
+        )
+        .on_conflict_do_nothing(index_elements=["sha256"])
+    )
+    return sha
+
+
+def get(sha: str, session: Optional[Session] = None) -> Optional[Any]:
+    with _cache_lock:
+        if sha in _cache:
+            _cache.move_to_end(sha)
+            return _cache[sha]
+
+    if session is None:
+        with Session(engine) as s:
+            row = s.get(RawBlob, sha)
+    else:
+        row = session.get(RawBlob, sha)
+    if row is None:
+        return None
+    obj = json.loads(zlib.decompress(row.data))
+
+    with _cache_lock:
+        _cache[sha] = obj
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return obj
+
+
+def resolve(obj: Any, path: Sequence[Any]) -> Any:
+    for part in path:
+        try:
+            obj = obj[part]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return obj
+
+
+def event_raw(ev: MessageEvent, session: Optional[Session] = None) -> Optional[Dict[str, Any]]:
+    """Raw platform dict for one MessageEvent (fetched from its delivery blob on demand)."""
+    meta = ev.meta or {}
+    if "raw" in meta:  # legacy row
+        return meta["raw"]
+    sha = meta.get("raw_blob")
+    if not sha:
+        return None
+    return resolve(get(sha, session), meta.get("raw_path") or [])
+
+
+def audit_payload(log: AuditLog, session: Optional[Session] = None) -> Dict[str, Any]:
+    """AuditLog payload with a raw_blob ref expanded back to the original body."""
+    payload = log.payload or {}
+    sha = payload.get("raw_blob")
+    if not sha:
+        return payload
+    body = get(sha, session)
+    return body if isinstance(body, dict) else payload
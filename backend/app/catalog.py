@@ -0,0 +1,348 @@
+"""
+Product catalog for research: items per niche, loaded from versioned data files, and
+a trigram/token index that resolves free-text niches ("home kitchen gadgets",
+"phone accesories") to a catalog niche.
+
+Files live in CATALOG_DIR (default: app/data/catalog) and are named
+<name>.v<N>.json or <name>.v<N>.csv; for each <name> only the highest N is loaded, so
+a new version is dropped in next to the old one. Files are merged in name order.
+
+    JSON: {"niches": {"beauty": {"name": "...", "aliases": ["skincare", ...],
+                                 "items": [{"base": "...", "desc": "...", "cost": [lo, hi]}]}}}
+    CSV:  niche,base,desc,cost_min,cost_max   (items only; aliases come from JSON)
+
+Resolution: an exact niche key / name / alias wins outright; otherwise each niche is
+scored by the better of
+- phrase: trigram similarity of the whole text to one of its names/aliases, times the
+  share of the text's trigrams that phrase covers
+- tokens: per query token, the best (trigram similarity x weight) over the niche's
+  index tokens, averaged; a name/alias token weighs the share of its phrase the query
+  contains (all of "phone accessories" in the query: 1.0 each, only "accessories":
+  0.5), so a whole multi-word alias outweighs a one-word alias of another niche;
+  item-title tokens weigh ITEM_TOKEN_WEIGHT
+Below CATALOG_MIN_SCORE the niche is "general". Results are memoized per index.
+
+The directory is re-checked at most every CATALOG_RELOAD_CHECK_SECONDS; a changed
+file set or mtime rebuilds the index in place. A file that fails to load is logged
+and the previous index stays in use.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .settings import settings
+
+logger = logging.getLogger("catalog")
+
+FALLBACK = "general"
+ITEM_TOKEN_WEIGHT = 0.5
+TOKEN_MIN_SIMILARITY = 0.45  # below this two words are not the same word misspelt
+MEMO_MAX_ENTRIES = 4096
+
+_FILE_RE = re.compile(r"^(?P<name>.+)\.v(?P<version>\d+)\.(?P<ext>json|csv)$")
+_NOISE_RE = re.compile(r"\b(in my store|in store|my store|shopify|store|shop)\b")
+_STOPWORDS = {"and", "for", "the", "of", "my", "with", "products", "product", "items", "item", "niche", "stuff"}
+
+
+def normalize(text: str) -> str:
+    s = (text or "").strip().lower().replace("&", " and ")
+    s = _NOISE_RE.sub(" ", s)
+    s = re.sub(r"[^a-z0-9]+", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def tokens(text: str) -> List[str]:
+    return [t for t in normalize(text).split() if len(t) > 1 and t not in _STOPWORDS]
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+def _jaccard(shared: int, a: int, b: int) -> float:
+    return shared / float(a + b - shared) if shared else 0.0
+
+
+@dataclass(frozen=True)
+class Resolution:
+    niche: str
+    score: float
+    via: str  # exact, phrase, tokens, fallback
+    matched: str = ""
+
+
+@dataclass
+class _Gram:
+    # trigram inverted index over a set of strings (phrases or single tokens)
+    sizes: Dict[str, int] = field(default_factory=dict)
+    postings: Dict[str, List[str]] = field(default_factory=lambda: defaultdict(list))
+
+    def add(self, s: str) -> None:
+        if s in self.sizes:
+            return
+        grams = trigrams(s)
+        self.sizes[s] = len(grams)
+        for g in grams:
+            self.postings[g].append(s)
+
+    def similar(self, s: str, min_sim: float) -> List[Tuple[str, float, float]]:
+        """(candidate, jaccard similarity, share of s's trigrams the candidate covers)"""
+        grams = trigrams(s)
+        shared: Dict[str, int] = defaultdict(int)
+        for g in grams:
+            for cand in self.postings.get(g, ()):
+                shared[cand] += 1
+        out = [(cand, _jaccard(n, len(grams), self.sizes[cand]), n / float(len(grams))) for cand, n in shared.items()]
+        return [(cand, sim, cov) for cand, sim, cov in out if sim >= min_sim]
+
+
+class Index:
+    """Immutable once built; reload swaps in a new one."""
+
+    def __init__(self, niches: Dict[str, Dict[str, Any]], files: List[str]) -> None:
+        self.niches = niches
+        self.files = files
+        self.built_at = time.time()
+
+        self._exact: Dict[str, str] = {}
+        self._phrase_niche: Dict[str, str] = {}
+        self._token_weights: Dict[str, Dict[str, float]] = defaultdict(dict)  # item-title tokens
+        self._token_phrases: Dict[str, List[Tuple[str, int, int]]] = defaultdict(list)  # (niche, phrase id, tokens)
+        self._phrases = _Gram()
+        self._tokens = _Gram()
+        self._memo: Dict[str, Resolution] = {}
+        self._memo_lock = threading.Lock()
+
+        t0 = time.perf_counter()
+        for key, niche in niches.items():
+            phrases = [key, niche.get("name") or ""] + list(niche.get("aliases") or [])
+            for phrase in (normalize(p) for p in phrases):
+                if not phrase:
+                    continue
+                self._exact.setdefault(phrase, key)
+                self._phrase_niche.setdefault(phrase, key)
+                self._phrases.add(phrase)
+                toks = sorted(set(tokens(phrase)))
+                pid = len(self._phrase_niche)
+                for t in toks:
+                    self._token_phrases[t].append((key, pid, len(toks)))
+                    self._tokens.add(t)
+            for item in niche["items"]:
+                for t in tokens(item["base"]):
+                    self._add_token(t, key, ITEM_TOKEN_WEIGHT)
+        self.build_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+
+    def _add_token(self, tok: str, key: str, weight: float) -> None:
+        weights = self._token_weights[tok]
+        weights[key] = max(weights.get(key, 0.0), weight)
+        self._tokens.add(tok)
+
+    def items(self, niche: str) -> List[Dict[str, Any]]:
+        return list((self.niches.get(niche) or {}).get("items") or [])
+
+    def resolve(self, text: str) -> Resolution:
+        q = normalize(text)
+        with self._memo_lock:
+            hit = self._memo.get(q)
+        if hit is not None:
+            return hit
+
+        res = self._score(q)
+        with self._memo_lock:
+            if len(self._memo) >= MEMO_MAX_ENTRIES:
+                self._memo.clear()
+            self._memo[q] = res
+        return res
+
+    def _score(self, q: str) -> Resolution:
+        if not q:
+            return Resolution(FALLBACK, 0.0, "fallback")
+        if q in self._exact:
+            return Resolution(self._exact[q], 1.0, "exact", q)
+
+        best = Resolution(FALLBACK, 0.0, "fallback")
+        # a phrase only speaks for the part of the query it covers: "toys" alone must not
+        # outvote "dog toys"'s token evidence
+        for phrase, sim, coverage in self._phrases.similar(q, float(settings.CATALOG_MIN_SCORE)):
+            if sim * coverage > best.score:
+                best = Resolution(self._phrase_niche[phrase], sim * coverage, "phrase", phrase)
+
+        q_tokens = tokens(q)
+        if q_tokens:
+            per_token: List[Dict[str, float]] = [{} for _ in q_tokens]  # niche -> evidence, per query token
+            hits: Dict[Tuple[str, int, int], Dict[int, float]] = defaultdict(dict)  # phrase -> {query token: sim}
+            for i, qt in enumerate(q_tokens):
+                for tok, sim, _ in self._tokens.similar(qt, TOKEN_MIN_SIMILARITY):
+                    for key, weight in self._token_weights.get(tok, {}).items():
+                        per_token[i][key] = max(per_token[i].get(key, 0.0), sim * weight)
+                    for phrase in self._token_phrases.get(tok, ()):
+                        hits[phrase][i] = max(hits[phrase].get(i, 0.0), sim)
+            for (key, _, n), by_token in hits.items():
+                share = min(1.0, len(by_token) / float(n))
+                for i, sim in by_token.items():
+                    per_token[i][key] = max(per_token[i].get(key, 0.0), sim * share)
+
+            totals: Dict[str, float] = defaultdict(float)
+            for evidence in per_token:
+                for key, s in evidence.items():
+                    totals[key] += s
+            for key, total in totals.items():
+                score = total / len(q_tokens)
+                if score > best.score:
+                    best = Resolution(key, score, "tokens", " ".join(q_tokens))
+
+        if best.score < float(settings.CATALOG_MIN_SCORE):
+            return Resolution(FALLBACK, round(best.score, 3), "fallback", best.matched)
+        return Resolution(best.niche, round(best.score, 3), best.via, best.matched)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._memo_lock:
+            memo = len(self._memo)
+        return {
+            "files": self.files,
+            "niches": len(self.niches),
+            "items": sum(len(n["items"]) for n in self.niches.values()),
+            "index_tokens": len(self._tokens.sizes),
+            "index_phrases": len(self._phrase_niche),
+            "build_ms": self.build_ms,
+            "built_at": self.built_at,
+            "memo_entries": memo,
+        }
+
+
+# ------------------------------
+# Loading
+# ------------------------------
+def catalog_dir() -> str:
+    return settings.CATALOG_DIR or os.path.join(os.path.dirname(__file__), "data", "catalog")
+
+
+def _current_files(directory: str) -> List[str]:
+    latest: Dict[str, Tuple[int, str]] = {}
+    for fn in os.listdir(directory):
+        m = _FILE_RE.match(fn)
+        if not m:
+            continue
+        version = int(m.group("version"))
+        if m.group("name") not in latest or version > latest[m.group("name")][0]:
+            latest[m.group("name")] = (version, fn)
+    return [latest[name][1] for name in sorted(latest)]
+
+
+def _signature(directory: str, files: Iterable[str]) -> Tuple:
+    out = []
+    for fn in files:
+        st = os.stat(os.path.join(directory, fn))
+        out.append((fn, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+def _item(row: Dict[str, Any]) -> Dict[str, Any]:
+    base = str(row.get("base") or "").strip()
+    if not base:
+        raise ValueError(f"catalog item without base: {row!r}")
+    cost = row.get("cost") or (row.get("cost_min"), row.get("cost_max"))
+    lo, hi = (int(float(c)) for c in cost) if all(c not in (None, "") for c in cost) else (400, 900)
+    return {"base": base, "desc": str(row.get("desc") or "").strip(), "cost": (lo, hi)}
+
+
+def _niche(niches: Dict[str, Dict[str, Any]], key: str) -> Dict[str, Any]:
+    key = normalize(key)
+    if not key:
+        raise ValueError("catalog niche without key")
+    return niches.setdefault(key, {"name": key, "aliases": [], "items": []})
+
+
+def _load_file(path: str, niches: Dict[str, Dict[str, Any]]) -> None:
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for key, spec in (data.get("niches") or {}).items():
+            niche = _niche(niches, key)
+            niche["name"] = spec.get("name") or niche["name"]
+            niche["aliases"] += [a for a in spec.get("aliases") or [] if a not in niche["aliases"]]
+            niche["items"] += [_item(i) for i in spec.get("items") or []]
+    else:
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                _niche(niches, row.get("niche") or "")["items"].append(_item(row))
+
+
+def load(directory: Optional[str] = None) -> Index:
+    directory = directory or catalog_dir()
+    files = _current_files(directory)
+    niches: Dict[str, Dict[str, Any]] = {}
+    for fn in files:
+        _load_file(os.path.join(directory, fn), niches)
+    if not (niches.get(FALLBACK) or {}).get("items"):
+        raise ValueError(f"catalog has no {FALLBACK!r} items")
+    return Index(niches, files)
+
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"index": None, "signature": None, "checked_at": 0.0, "reloads": 0, "last_error": None}
+
+
+def index() -> Index:
+    """Current index; re-checks the catalog files at most every CATALOG_RELOAD_CHECK_SECONDS."""
+    idx = _state["index"]
+    if idx is not None and time.monotonic() - _state["checked_at"] < float(settings.CATALOG_RELOAD_CHECK_SECONDS):
+        return idx
+
+    with _lock:
+        if _state["index"] is not None and time.monotonic() - _state["checked_at"] < float(settings.CATALOG_RELOAD_CHECK_SECONDS):
+            return _state["index"]
+        _state["checked_at"] = time.monotonic()
+        directory = catalog_dir()
+        try:
+            sig = _signature(directory, _current_files(directory))
+            if _state["index"] is None or sig != _state["signature"]:
+                _state["signature"] = sig  # a broken file set is retried once it changes again
+                _state["index"] = load(directory)
+                _state["reloads"] += 1
+                _state["last_error"] = None
+                logger.info("catalog_loaded", extra={"extra": _state["index"].stats()})
+        except Exception as e:
+            _state["last_error"] = str(e)
+            if _state["index"] is None:
+                raise
+            logger.warning("catalog_reload_failed", extra={"extra": {"dir": directory, "err": str(e)}})
+        return _state["index"]
+
+
+def reload() -> Index:
+    with _lock:
+        _state["checked_at"] = 0.0
+        _state["signature"] = None
+    return index()
+
+
+def resolve(text: str) -> str:
+    """Catalog niche key for free text ("general" when nothing scores high enough)."""
+    return index().resolve(text).niche
+
+
+def match(text: str) -> Resolution:
+    return index().resolve(text)
+
+
+def items(niche: str) -> List[Dict[str, Any]]:
+    return index().items(niche)
+
+
+def stats() -> Dict[str, Any]:
+    idx = index()
+    return {"dir": catalog_dir(), "reloads": _state["reloads"], "last_error": _state["last_error"], **idx.stats()}
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+from typing import List
+
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import celeryd_init, worker_process_init, worker_ready
+from kombu import Exchange, Queue
 
 from .settings import settings
 
@@ -9,24 +13,86 @@ celery_app = Celery(
     "jarvis",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.tasks.jobs", "app.tasks.facebook_auto"],  # ✅ added
+    include=["app.tasks.jobs", "app.tasks.facebook_auto", "app.tasks.replies"],  # ✅ added
 )
 
+# ------------------------------
+# Queue topology
+# ------------------------------
+# realtime:  webhook replies / sweep / keepalive - short, latency-sensitive
+# batch:     background commands and nightly research/content - long, may run minutes
+# reporting: reports and housekeeping
+# A worker started without -Q consumes all of them (dev); docker-compose runs one
+# worker per queue so a nightly job can never sit in front of a reply.
+QUEUES = ("realtime", "batch", "reporting", "default")
+
+# Redis broker priorities: 0 is served first
+PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW = 0, 3, 6
+
+TASK_ROUTES = {
+    "app.tasks.replies.process_message_events": {"queue": "realtime", "priority": PRIORITY_HIGH},
+    "app.tasks.jobs.facebook_autoreply_tick": {"queue": "realtime", "priority": PRIORITY_NORMAL},
+    "app.tasks.jobs.ollama_keepalive_tick": {"queue": "realtime", "priority": PRIORITY_LOW},
+    "app.tasks.jobs.execute_run": {"queue": "batch", "priority": PRIORITY_HIGH},  # a user is waiting
+    "app.tasks.jobs.nightly_warmup": {"queue": "batch", "priority": PRIORITY_NORMAL},
+    "app.tasks.jobs.nightly_inbox_triage": {"queue": "batch", "priority": PRIORITY_LOW},
+    "app.tasks.jobs.nightly_product_research": {"queue": "batch", "priority": PRIORITY_LOW},
+    "app.tasks.jobs.research_niche": {"queue": "batch", "priority": PRIORITY_LOW},
+    "app.tasks.jobs.research_summary": {"queue": "batch", "priority": PRIORITY_NORMAL},
+    "app.tasks.jobs.nightly_content_generation": {"queue": "batch", "priority": PRIORITY_LOW},
+    "app.tasks.jobs.daily_report": {"queue": "reporting", "priority": PRIORITY_NORMAL},
+    "app.tasks.jobs.purge_idempotency_keys": {"queue": "reporting", "priority": PRIORITY_LOW},
+}
+
+# Long tasks are acked only after they finish, so a worker dying mid-run hands the job
+# to another worker instead of losing it. Replies are already redelivery-safe.
+#
+# visibility_timeout is per broker connection, not per queue: the batch-sized value also
+# applies to realtime messages a worker had reserved but not started when it died
+# (at most worker_prefetch_multiplier x concurrency per worker, since realtime tasks
+# are acked early). Those are only redelivered after the timeout, so realtime work
+# must not depend on it: webhook replies use no countdown/ETA tasks while Redis is up
+# (debounce deferrals go through the Redis due set, tasks/replies.py), the reconciliation sweep
+# answers any reply lost that way, and the beat ticks simply run again next period.
+_LONG_TASKS = [name for name, route in TASK_ROUTES.items() if route["queue"] in ("batch", "reporting")]
+
 celery_app.conf.update(
     task_default_queue="default",
+    task_queues=[Queue(name, Exchange(name), routing_key=name) for name in QUEUES],
+    task_routes=TASK_ROUTES,
+    task_default_priority=PRIORITY_NORMAL,
+    task_annotations={name: {"acks_late": True, "reject_on_worker_lost": True} for name in _LONG_TASKS},
+    worker_prefetch_multiplier=1,  # no worker hoards tasks it cannot start yet
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+        # unacked (acks_late) tasks are redelivered after this: must exceed the longest batch task
+        "visibility_timeout": int(settings.CELERY_VISIBILITY_TIMEOUT_SECONDS),
+    },
     timezone="UTC",
     enable_utc=True,
 )
 
+# NIGHTLY_WARMUP_LEAD_MINUTES before the first nightly job (may cross midnight)
+_WARMUP_HOUR, _WARMUP_MINUTE = divmod(
+    (settings.NIGHTLY_HOUR * 60 + settings.NIGHTLY_MINUTE - settings.NIGHTLY_WARMUP_LEAD_MINUTES) % (24 * 60), 60
+)
+
 celery_app.conf.beat_schedule = {
+    "nightly_warmup": {
+        "task": "app.tasks.jobs.nightly_warmup",
+        "schedule": crontab(hour=_WARMUP_HOUR, minute=_WARMUP_MINUTE),
+    },
     "nightly_inbox_triage": {
         "task": "app.tasks.jobs.nightly_inbox_triage",
         "schedule": crontab(hour=settings.NIGHTLY_HOUR, minute=settings.NIGHTLY_MINUTE),
     },
+    # reconciliation sweep only: live replies are event-driven (tasks/reply_stream.py)
     "facebook_autoreply_tick": {
-    "task": "app.tasks.jobs.facebook_autoreply_tick",
-    "schedule": settings.FACEBOOK_AUTOREPLY_POLL_SECONDS,
-},
+        "task": "app.tasks.jobs.facebook_autoreply_tick",
+        "schedule": settings.FACEBOOK_AUTOREPLY_POLL_SECONDS,
+    },
 
     "nightly_product_research": {
         "task": "app.tasks.jobs.nightly_product_research",
@@ -41,10 +107,13 @@ celery_app.conf.beat_schedule = {
         "schedule": crontab(hour=settings.REPORT_HOUR, minute=settings.REPORT_MINUTE),
     },
 
-    # ✅ NEW: auto reply every minute
-    "facebook_auto_reply_every_minute": {
-        "task": "app.tasks.facebook_auto.facebook_auto_reply",
-        "schedule": crontab(minute="*/1"),
+    "ollama_keepalive_tick": {
+        "task": "app.tasks.jobs.ollama_keepalive_tick",
+        "schedule": settings.OLLAMA_KEEPER_SECONDS,
+    },
+    "purge_idempotency_keys": {
+        "task": "app.tasks.jobs.purge_idempotency_keys",
+        "schedule": crontab(minute=17),
     },
 
     # ✅ NEW: auto post daily at 10:00 UTC
@@ -53,3 +122,58 @@ celery_app.conf.beat_schedule = {
         "schedule": crontab(hour=10, minute=0),
     },
 }
+
+
+@worker_ready.connect
+def _preload_llm(**_kwargs) -> None:
+    from .tools.ollama import preload_in_background
+
+    preload_in_background("worker_ready")
+
+
+_worker_queues: List[str] = []  # -Q of this worker ([] = all queues)
+_worker_pool: List[str] = ["prefork"]  # -P of this worker
+
+
+@celeryd_init.connect
+def _remember_queues(options=None, **_kwargs) -> None:
+    options = options or {}
+    queues = options.get("queues") or []
+    if isinstance(queues, str):
+        queues = queues.split(",")
+    _worker_queues[:] = [q.strip() for q in queues if q.strip()]
+    _worker_pool[0] = str(options.get("pool_cls") or "prefork")
+
+
+def _runs_reply_pipeline() -> bool:
+    # the stream consumer / due poller belongs with the realtime tasks
+    return settings.WEBHOOK_REPLY_MODE in ("stream", "celery") and (not _worker_queues or "realtime" in _worker_queues)
+
+
+def _start_reply_pipeline() -> None:
+    if settings.WEBHOOK_REPLY_MODE == "stream":
+        from .tasks.reply_stream import start_consumer
+
+        start_consumer()
+    else:
+        from .tasks.replies import start_due_poller
+
+        start_due_poller()
+
+
+def _forks_children() -> bool:
+    return any(p in _worker_pool[0] for p in ("prefork", "processes"))
+
+
+# One consumer per process that executes tasks: every prefork child (worker_process_init
+# runs in each of them), or the worker itself with a solo / threads / gevent pool.
+@worker_process_init.connect
+def _start_reply_pipeline_in_child(**_kwargs) -> None:
+    if _runs_reply_pipeline():
+        _start_reply_pipeline()
+
+
+@worker_ready.connect
+def _start_reply_pipeline_in_worker(**_kwargs) -> None:
+    if _runs_reply_pipeline() and not _forks_children():
+        _start_reply_pipeline()
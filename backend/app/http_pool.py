@@ -0,0 +1,78 @@
+"""
+Process-wide pooled HTTP clients.
+
+    with http_pool.client(timeout=20.0) as client:
+        r = client.get(url, params=...)
+
+Same call shape as `with httpx.Client(timeout=...) as client`, but connections
+(TLS handshakes to Pexels/OpenAI/Shopify, the local Ollama socket) are reused
+across calls and threads instead of being rebuilt per request. Leaving the
+block does not close the pool.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict
+
+_lock = threading.Lock()
+_clients: Dict[int, Any] = {}  # pid -> httpx.Client (prefork workers must not share sockets)
+
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE = 16
+
+
+def _shared() -> Any:
+    pid = os.getpid()
+    c = _clients.get(pid)
+    if c is None:
+        import httpx  # deferred: keeps httpx out of API/worker import time
+
+        with _lock:
+            c = _clients.get(pid)
+            if c is None:
+                c = _clients[pid] = httpx.Client(
+                    limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+                    timeout=30.0,
+                )
+    return c
+
+
+class _Bound:
+    """The shared client with a per-call default timeout."""
+
+    __slots__ = ("_client", "_timeout")
+
+    def __init__(self, timeout: float):
+        self._client = _shared()
+        self._timeout = timeout
+
+    def request(self, method: str, url: str, **kwargs: Any) -> Any:
+        kwargs.setdefault("timeout", self._timeout)
+        return self._client.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> Any:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> Any:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs: Any) -> Any:
+        return self.request("PUT", url, **kwargs)
+
+    def __enter__(self) -> "_Bound":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+def client(timeout: float = 30.0) -> _Bound:
+    return _Bound(timeout)
+
+
+def close() -> None:
+    with _lock:
+        c = _clients.pop(os.getpid(), None)
+    if c is not None:
+        c.close()
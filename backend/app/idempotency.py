@@ -0,0 +1,196 @@
+"""
+First writer wins: claim() inserts the key row (primary key = hash), so exactly one
+request executes; everyone else gets the existing row back and either replays its
+stored response or waits for it. Rows use their own short sessions so a rollback in
+the caller never loses the claim.
+
+An in_progress row only holds a lease (IDEMPOTENCY_LEASE_SECONDS, well above the
+replay wait plus a foreground run): if its owner dies before complete() / release(),
+a retry takes the key over once the lease has run out instead of getting 409 until
+the full TTL. complete() extends the row to IDEMPOTENCY_TTL_SECONDS.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+
+from .db import engine
+from .models import IdempotencyKey
+from .settings import settings
+
+logger = logging.getLogger("idempotency")
+
+
+def _utc(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def key_hash(scope: str, key: str) -> str:
+    return hashlib.sha256(f"{scope}\x00{key}".encode("utf-8")).hexdigest()
+
+
+def request_hash(body: Any) -> str:
+    raw = json.dumps(body, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def claim(
+    scope: str, key: str, req_hash: str = "", ttl_s: Optional[int] = None, status: str = "in_progress"
+) -> Tuple[bool, IdempotencyKey]:
+    """Returns (claimed, row). claimed=False means another request owns (or owned) the key."""
+    h = key_hash(scope, key)
+    if ttl_s is None:
+        ttl_s = settings.IDEMPOTENCY_LEASE_SECONDS if status == "in_progress" else settings.IDEMPOTENCY_TTL_SECONDS
+    ttl = int(ttl_s)
+    now = datetime.now(timezone.utc)
+
+    for _ in range(2):
+        with Session(engine, expire_on_commit=False) as session:
+            row = IdempotencyKey(
+                key_hash=h,
+                scope=scope,
+                request_hash=req_hash,
+                status=status,
+                expires_at=now + timedelta(seconds=ttl),
+            )
+            session.add(row)
+            try:
+                session.commit()
+                return True, row
+            except IntegrityError:
+                session.rollback()
+
+            existing = session.get(IdempotencyKey, h)
+            if existing is None:
+                continue  # released between our insert and read
+            if _utc(existing.expires_at) > now:
+                return False, existing
+            if existing.status == "in_progress":
+                logger.warning("idempotency_lease_taken_over", extra={"extra": {"scope": scope, "run_id": existing.run_id}})
+            session.delete(existing)  # expired (or an abandoned lease): take it over
+            session.commit()
+
+    # lost two races in a row: treat as owned by someone else
+    with Session(engine, expire_on_commit=False) as session:
+        existing = session.get(IdempotencyKey, h)
+    return False, existing or IdempotencyKey(key_hash=h, scope=scope, expires_at=now)
+
+
+def _webhook_upsert(now: datetime):
+    expires_at = now + timedelta(seconds=int(settings.IDEMPOTENCY_WEBHOOK_TTL_SECONDS))
+    stmt = sqlite_insert(IdempotencyKey)
+    # an expired marker is taken over; a live one makes the row a no-op (nothing returned)
+    return stmt.on_conflict_do_update(
+        index_elements=["key_hash"],
+        set_={"created_at": now, "expires_at": expires_at},
+        where=IdempotencyKey.expires_at < now,
+    ).returning(IdempotencyKey.key_hash), expires_at
+
+
+def claim_webhook_events(session: Session, keys: Iterable[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+    """
+    Marks (scope, event_id) pairs as seen in the caller's transaction, in one multi-row
+    upsert, and returns the pairs that were new. Markers commit or roll back together
+    with the events they guard.
+    """
+    by_hash = {key_hash(scope, event_id): (scope, event_id) for scope, event_id in keys if event_id}
+    if not by_hash:
+        return set()
+    now = datetime.now(timezone.utc)
+    stmt, expires_at = _webhook_upsert(now)
+    rows = session.execute(
+        stmt,
+        [
+            {
+                "key_hash": h,
+                "scope": scope,
+                "request_hash": "",
+                "status": "completed",
+                "run_id": None,
+                "status_code": 200,
+                "response": {},
+                "created_at": now,
+                "expires_at": expires_at,
+            }
+            for h, (scope, _event_id) in by_hash.items()
+        ],
+    )
+    return {by_hash[r[0]] for r in rows}
+
+
+def seen(scope: str, event_id: str, session: Optional[Session] = None) -> bool:
+    """Webhook de-dupe for a single id: True if it was already accepted (within the webhook TTL)."""
+    if not event_id:
+        return False
+    if session is not None:
+        return not claim_webhook_events(session, [(scope, event_id)])
+    with Session(engine) as own:
+        new = claim_webhook_events(own, [(scope, event_id)])
+        own.commit()
+    return not new
+
+
+def attach_run(h: str, run_id: Optional[int]) -> None:
+    """Records the run executing a claimed key, so waiting replays can point at it."""
+    with Session(engine) as session:
+        row = session.get(IdempotencyKey, h)
+        if row is not None:
+            row.run_id = run_id
+            session.add(row)
+            session.commit()
+
+
+def complete(h: str, response: Dict[str, Any], status_code: int = 200, run_id: Optional[int] = None) -> None:
+    with Session(engine) as session:
+        row = session.get(IdempotencyKey, h)
+        if row is None:
+            return
+        row.status = "completed"
+        row.expires_at = datetime.now(timezone.utc) + timedelta(seconds=int(settings.IDEMPOTENCY_TTL_SECONDS))
+        row.response = response
+        row.status_code = status_code
+        row.run_id = run_id if run_id is not None else row.run_id
+        session.add(row)
+        session.commit()
+
+
+def release(h: str) -> None:
+    """Drops a claim whose request failed, so a retry executes again."""
+    with Session(engine) as session:
+        row = session.get(IdempotencyKey, h)
+        if row is not None and row.status == "in_progress":
+            session.delete(row)
+            session.commit()
+
+
+def wait(h: str, timeout_s: Optional[float] = None) -> Optional[IdempotencyKey]:
+    """Polls until the owner completes (or releases) the key. Returns the latest row."""
+    deadline = time.monotonic() + float(timeout_s if timeout_s is not None else settings.IDEMPOTENCY_WAIT_SECONDS)
+    delay = 0.05
+    while True:
+        with Session(engine, expire_on_commit=False) as session:
+            row = session.get(IdempotencyKey, h)
+        if row is None or row.status != "in_progress" or time.monotonic() >= deadline:
+            return row
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def purge_expired() -> int:
+    with Session(engine) as session:
+        res = session.exec(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now(timezone.utc)))
+        session.commit()
+        n = int(res.rowcount or 0)
+    if n:
+        logger.info("idempotency_purged", extra={"extra": {"rows": n}})
+    return n
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+# ------------------------------
+# Keyword sets (one place for triage, replies and the planner)
+# ------------------------------
+INTENT_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    # customer messages
+    "order": ("order", "shipping", "delivery", "delivered", "where", "track", "tracking"),
+    "refund": ("refund", "return", "money back", "cancel"),
+    # commands
+    "status": ("show me system status", "system status", "status summary", "health"),
+    "triage": ("triage",),
+    "inbox": ("inbox",),
+    "add": ("add", "create", "make", "publish", "post", "put", "launch", "upload"),
+    "product": ("product", "item", "goods", "sku"),
+    "winning": ("winning product", "wining product"),
+}
+
+
+def _compile(groups: Dict[str, Tuple[str, ...]]) -> Tuple[re.Pattern[str], Dict[str, FrozenSet[str]]]:
+    """
+    Builds ONE alternation regex over every keyword (longest first) and a
+    keyword -> intents table. The alternation sits in a lookahead, so the scan
+    tries every position and overlapping keywords are all seen ("addelivery"
+    => add + delivery). Only the longest keyword starting at a position is
+    reported, so a keyword that contains another also carries that keyword's
+    intents ("winning product" => winning + product).
+    """
+    owners: Dict[str, set[str]] = {}
+    for intent, words in groups.items():
+        for w in words:
+            owners.setdefault(w.lower(), set()).add(intent)
+
+    table: Dict[str, FrozenSet[str]] = {}
+    for w in owners:
+        implied = set(owners[w])
+        for other, other_intents in owners.items():
+            if other != w and other in w:
+                implied |= other_intents
+        table[w] = frozenset(implied)
+
+    ordered = sorted(table, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(re.escape(w) for w in ordered) + "))")
+    return pattern, table
+
+
+_PATTERN, _TABLE = _compile(INTENT_KEYWORDS)
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+def classify(text: str) -> FrozenSet[str]:
+    """
+    Returns every intent whose keywords appear in text (substring match,
+    case-insensitive), in a single regex pass.
+    """
+    t = (text or "").lower()
+    if not t:
+        return _EMPTY
+
+    found: set[str] = set()
+    for m in _PATTERN.finditer(t):
+        found |= _TABLE[m.group(1)]
+    return frozenset(found)
+
+
+def customer_intent(text: str | None = None, intents: Iterable[str] | None = None) -> str:
+    """
+    Maps a customer message to one bucket: order > refund > general.
+    """
+    found = classify(text or "") if intents is None else intents
+    if "order" in found:
+        return "order"
+    if "refund" in found:
+        return "refund"
+    return "general"
+
+
+# ------------------------------
+# Fast path (no LLM)
+# ------------------------------
+# Before an LLM call only unambiguous order-status / refund phrases qualify (whole
+# words): "where can I buy this?" or "how much is delivery?" need a real answer.
+# The broad INTENT_KEYWORDS buckets are for triage and the no-LLM fallback.
+FAST_PATH_PHRASES: Dict[str, Tuple[str, ...]] = {
+    "order": (
+        r"order status",
+        r"status of my order",
+        r"where(?: is|'s) my (?:order|parcel|package)",
+        r"track(?:ing)? (?:my |the )?(?:order|parcel|package)",
+        r"tracking (?:number|id|code|link)",
+        r"(?:has|did|when will) my order (?:ship|shipped|arrive|be delivered)",
+        r"(?:order|parcel|package) (?:not|never|hasn't been|has not been) (?:arrived|received|delivered)",
+    ),
+    # a request, not a pre-sales question: "what's your refund policy?" and "money back
+    # guarantee?" are general
+    "refund": (
+        r"my refund",
+        r"refund (?:my|for|on) (?:my |the |this )?(?:order|purchase|payment)",
+        r"(?:want|need|like|get|request(?:ing)?) (?:a|my) refund",
+        r"(?:want|get|give me) my money back",
+        r"cancel my order",
+        r"return my order",
+    ),
+}
+_FAST_PATH_PATTERNS = {
+    intent: re.compile(r"\b(?:" + "|".join(phrases) + r")\b") for intent, phrases in FAST_PATH_PHRASES.items()
+}
+
+
+def precise_intent(text: str) -> str:
+    """order / refund only on a FAST_PATH_PHRASES match, else general."""
+    t = re.sub(r"\s+", " ", (text or "").lower().replace("’", "'"))
+    for intent in ("order", "refund"):
+        if _FAST_PATH_PATTERNS[intent].search(t):
+            return intent
+    return "general"
+
+
+_FAST_REPLIES = {
+    "order": "Sure—please share your order number and the email/phone used at checkout",
+    "refund": "I can help with next steps—please share your order number and a human will review your request.",
+}
+
+
+def fast_reply_text(text: str, channel: str, precise: bool = False) -> Optional[str]:
+    """
+    Deterministic reply body for order/refund messages, or None when the
+    message needs a real answer. The caller adds the brand phrase.
+    precise=True (the pre-LLM fast path) matches FAST_PATH_PHRASES only.
+    """
+    kind = precise_intent(text) if precise else customer_intent(text)
+    if kind == "order":
+        short_end = "" if "comment" in (channel or "") else " (so I can look it up)."
+        return _FAST_REPLIES["order"] + short_end
+    if kind == "refund":
+        return _FAST_REPLIES["refund"]
+    return None
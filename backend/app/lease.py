@@ -0,0 +1,181 @@
+"""
+Redis lease locks for periodic tasks: at most one run of a task at a time, across all
+workers.
+
+    @shared_task(name="app.tasks.jobs.daily_report")
+    @exclusive("daily_report")
+    def daily_report(): ...
+
+- acquire: SET NX PX ttl with a random token
+- heartbeat: while the run is alive the lease is extended every ttl/3, so ttl only
+  bounds how long a crashed worker blocks the next run, not how long a run may take
+- held by someone else: the run is skipped (returns {"ok": True, "skipped": "lease_held"})
+- release: deleted only if we still own it
+
+Redis problems never block a run (it executes unlocked and is counted as such).
+Per-task counters (acquired / skipped / lost / unlocked) live in Redis and are
+reported by stats() and GET /api/status/leases.
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from .redis_client import get_redis
+from .settings import settings
+
+logger = logging.getLogger("lease")
+
+_LOCK_PREFIX = "jarvis:lease:lock:"
+_STATS_PREFIX = "jarvis:lease:stats:"
+_NAMES_KEY = "jarvis:lease:names"
+
+# Extends / deletes the lock only if we still own it.
+_EXTEND_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _count(name: str, field: str, **extra: Any) -> None:
+    try:
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        pipe.sadd(_NAMES_KEY, name)
+        pipe.hincrby(_STATS_PREFIX + name, field, 1)
+        if extra:
+            pipe.hset(_STATS_PREFIX + name, mapping={k: str(v) for k, v in extra.items()})
+        pipe.execute()
+    except Exception:
+        pass
+
+
+class Lease:
+    def __init__(self, name: str, ttl_s: float) -> None:
+        self.name = name
+        self.key = _LOCK_PREFIX + name
+        self.ttl_ms = max(1000, int(ttl_s * 1000))
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"
+        self.lost = False
+        self._stop = threading.Event()
+        self._beat: Optional[threading.Thread] = None
+
+    def acquire(self) -> Optional[bool]:
+        """True = ours, False = held elsewhere, None = Redis unavailable."""
+        try:
+            ok = bool(get_redis().set(self.key, self.token, nx=True, px=self.ttl_ms))
+        except Exception as e:
+            logger.warning("lease_redis_unavailable", extra={"extra": {"lease": self.name, "err": str(e)}})
+            return None
+        if ok:
+            self._beat = threading.Thread(target=self._heartbeat, name=f"lease-{self.name}", daemon=True)
+            self._beat.start()
+        return ok
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.ttl_ms / 3000.0):
+            try:
+                if not get_redis().eval(_EXTEND_LUA, 1, self.key, self.token, self.ttl_ms):
+                    self.lost = True
+                    logger.warning("lease_lost", extra={"extra": {"lease": self.name}})
+                    return
+            except Exception as e:  # keep trying: the lease is still valid until ttl
+                logger.debug("lease_extend_failed", extra={"extra": {"lease": self.name, "err": str(e)}})
+
+    def release(self) -> None:
+        self._stop.set()
+        if self._beat is not None:
+            self._beat.join(timeout=1.0)
+        try:
+            get_redis().eval(_RELEASE_LUA, 1, self.key, self.token)
+        except Exception:
+            pass
+
+    def holder(self) -> Optional[str]:
+        try:
+            return get_redis().get(self.key)
+        except Exception:
+            return None
+
+
+def exclusive(name: str, ttl_s: Optional[float] = None) -> Callable:
+    """Skip-if-held lease around a (periodic) task body."""
+
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not bool(settings.LEASE_LOCKS_ENABLED):
+                return fn(*args, **kwargs)
+
+            lease = Lease(name, float(ttl_s or settings.LEASE_DEFAULT_TTL_SECONDS))
+            got = lease.acquire()
+            if got is False:
+                holder = lease.holder()
+                logger.info("periodic_task_skipped", extra={"extra": {"lease": name, "holder": holder}})
+                _count(name, "skipped", last_skipped_at=int(time.time()), last_skipped_holder=holder or "")
+                return {"ok": True, "skipped": "lease_held", "task": name, "holder": holder}
+            if got is None:
+                _count(name, "unlocked")
+                return fn(*args, **kwargs)
+
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                lease.release()
+                took = round(time.perf_counter() - t0, 3)
+                if lease.lost:
+                    _count(name, "lost", last_lost_at=int(time.time()))
+                _count(name, "acquired", last_run_at=int(time.time()), last_run_seconds=took)
+
+        return wrapper
+
+    return deco
+
+
+def _num(v: str) -> Any:
+    try:
+        return int(v)
+    except ValueError:
+        try:
+            return float(v)
+        except ValueError:
+            return v
+
+
+def stats() -> Dict[str, Any]:
+    try:
+        r = get_redis()
+        names: List[str] = sorted(r.smembers(_NAMES_KEY))
+        pipe = r.pipeline(transaction=False)
+        for n in names:
+            pipe.hgetall(_STATS_PREFIX + n)
+            pipe.pttl(_LOCK_PREFIX + n)
+            pipe.get(_LOCK_PREFIX + n)
+        res = pipe.execute()
+    except Exception as e:
+        return {"ok": False, "error": "redis_unavailable", "message": str(e)}
+
+    leases = {}
+    for i, n in enumerate(names):
+        raw, ttl_ms, holder = res[3 * i], res[3 * i + 1], res[3 * i + 2]
+        leases[n] = {
+            **{k: _num(v) for k, v in (raw or {}).items()},
+            "held_by": holder,
+            "ttl_ms": ttl_ms if holder else None,
+        }
+    return {"ok": True, "leases": leases}
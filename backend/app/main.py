@@ -8,6 +8,7 @@ from .logging_json import configure_json_logging
 from .settings import settings
 from .db import init_db
 from .api.router import api_router
+from .tools.ollama import preload_in_background
 
 configure_json_logging(settings.LOG_LEVEL)
 logger = logging.getLogger("app")
@@ -26,6 +27,7 @@ app.add_middleware(
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
+    preload_in_background("api_startup")
     logger.info(
         "startup_complete",
         extra={"extra": {"db": settings.DATABASE_PATH, "dry_run": bool(settings.DRY_RUN)}},
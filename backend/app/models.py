@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
-from sqlalchemy import String  # ✅ added
+from sqlalchemy import LargeBinary, String, UniqueConstraint  # ✅ added
 from sqlmodel import SQLModel, Field, Column, JSON
 
 
@@ -25,7 +25,7 @@ class RunRecord(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=utcnow, index=True)
     command_text: str = Field(default="")
-    status: str = Field(default="created")  # created, completed, failed, queued_approval
+    status: str = Field(default="created")  # created, queued, running, cancel_requested, cancelled, completed, failed
     summary: str = Field(default="")
     result_json: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
 
@@ -85,3 +85,54 @@ class User(SQLModel, table=True):
 
     username: str = Field(sa_column=Column(String, unique=True, index=True))
     password_hash: str = Field(default="")
+
+
+class LlmUsageRollup(SQLModel, table=True):
+    """One row per (minute, provider): counters + a fixed-bucket latency histogram."""
+
+    __table_args__ = (UniqueConstraint("minute", "provider"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    minute: datetime = Field(index=True)
+    provider: str = Field(default="", index=True)  # ollama, openai, deterministic
+
+    calls: int = Field(default=0)
+    errors: int = Field(default=0)
+    cache_hits: int = Field(default=0)
+    fallbacks: int = Field(default=0)
+    prompt_tokens: int = Field(default=0)
+    completion_tokens: int = Field(default=0)
+    cost_usd: float = Field(default=0.0)
+    latency_ms_sum: float = Field(default=0.0)
+    latency_ms_max: float = Field(default=0.0)
+    latency_hist: List[int] = Field(default_factory=list, sa_column=Column(JSON))
+    fallback_reasons: Dict[str, int] = Field(default_factory=dict, sa_column=Column(JSON))
+
+
+class IdempotencyKey(SQLModel, table=True):
+    """
+    Replay protection: Idempotency-Key headers on POST /api/command and webhook event ids.
+    Keyed by sha256(scope + key), so raw client keys / external ids are not stored.
+    """
+
+    key_hash: str = Field(primary_key=True)
+    scope: str = Field(default="", index=True)  # command, facebook_message, facebook_comment, whatsapp_message
+    request_hash: str = Field(default="")  # same key + different body => rejected
+    status: str = Field(default="in_progress")  # in_progress, completed
+    run_id: Optional[int] = Field(default=None)
+    status_code: int = Field(default=200)
+    response: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=utcnow)
+    expires_at: datetime = Field(index=True)
+
+
+class RawBlob(SQLModel, table=True):
+    """
+    Content-addressed raw payloads (webhook bodies), stored once and zlib-compressed.
+    AuditLog / MessageEvent rows reference them by sha256; see app/blobstore.py.
+    """
+
+    sha256: str = Field(primary_key=True)  # of the canonical JSON, before compression
+    created_at: datetime = Field(default_factory=utcnow, index=True)
+    size: int = Field(default=0)  # uncompressed bytes
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
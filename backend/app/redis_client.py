@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+import redis
+
+from .settings import settings
+
+_client: Optional[redis.Redis] = None
+
+# After a failed connect, fail fast for this long instead of paying the connect timeout
+# on every call (webhook ingest touches Redis several times per delivery).
+_COOLDOWN_S = 5.0
+_down_until = 0.0
+
+
+class _FailFastPool(redis.ConnectionPool):
+    def get_connection(self, command_name, *keys, **options):
+        global _down_until
+        if time.monotonic() < _down_until:
+            raise redis.ConnectionError("redis unavailable (cooling down)")
+        try:
+            return super().get_connection(command_name, *keys, **options)
+        except (redis.ConnectionError, redis.TimeoutError):
+            _down_until = time.monotonic() + _COOLDOWN_S
+            raise
+
+
+def get_redis() -> redis.Redis:
+    """
+    Shared client for app-level state (not the Celery broker connection).
+    Short socket timeouts so a missing Redis degrades callers instead of hanging them.
+    """
+    global _client
+    if _client is None:
+        pool = _FailFastPool.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=2.0,
+            socket_connect_timeout=1.0,
+        )
+        _client = redis.Redis(connection_pool=pool)
+    return _client
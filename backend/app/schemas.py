@@ -6,11 +6,16 @@ from pydantic import BaseModel, Field
 
 class CommandRequest(BaseModel):
     text: str = Field(min_length=1)
+    background: bool = False  # true => 202 + run_id now, poll GET /api/runs/{id}
 
 
 class ToolCall(BaseModel):
     name: str
     args: Dict[str, Any] = Field(default_factory=dict)
+    # DAG scheduling (optional): steps without dependencies may run concurrently
+    id: Optional[str] = None  # defaults to "s<index>"
+    depends_on: List[str] = Field(default_factory=list)
+    bind: Dict[str, str] = Field(default_factory=dict)  # arg -> "<step id>.<output.path>"
 
 
 class StepResult(BaseModel):
@@ -20,6 +25,9 @@ class StepResult(BaseModel):
     status: Literal["executed", "queued_approval", "blocked", "error"]
     output: Dict[str, Any] = Field(default_factory=dict)
     error: Optional[str] = None
+    elapsed_ms: Optional[float] = None
+    cached: bool = False  # output served from the executor's memo cache
+    shared: bool = False  # output reused from an identical call in the same batch
 
 
 class CommandResponse(BaseModel):
@@ -28,6 +36,17 @@ class CommandResponse(BaseModel):
     summary: str
     steps: List[StepResult]
     approvals_queued: int = 0
+    elapsed_ms: Optional[float] = None
+
+
+class BatchCommandRequest(BaseModel):
+    commands: List[str] = Field(min_length=1, max_length=100)
+    max_parallel: Optional[int] = Field(default=None, ge=1, le=16)  # default BATCH_MAX_PARALLEL
+
+
+class BatchCommandResponse(BaseModel):
+    results: List[CommandResponse]  # same order as the request
+    timing: Dict[str, Any] = Field(default_factory=dict)
 
 
 class ApprovalDecision(BaseModel):
@@ -43,6 +62,8 @@ class StatusResponse(BaseModel):
     redis_url: str
     local_actions_enabled: bool
     ollama_enabled: bool
+    ollama_model_resident: Optional[bool] = None
+    ollama: Dict[str, Any] = Field(default_factory=dict)
 
 
 class StatusSummary(BaseModel):
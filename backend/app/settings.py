@@ -15,18 +15,60 @@ class Settings(BaseSettings):
     # ✅ Required by your db.py
     DATABASE_PATH: str = "/data/app.db"
     WORKSPACE_DIR: str = "/workspace"
+    SQLITE_WAL: int = 1  # WAL journal + synchronous=NORMAL (concurrent API/worker writers)
 
     # Background / queue
     REDIS_URL: str = "redis://redis:6379/0"
     CELERY_BROKER_URL: str = "redis://redis:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://redis:6379/0"
+    CELERY_VISIBILITY_TIMEOUT_SECONDS: int = 6 * 3600  # > longest acks_late (batch) task; applies to every queue
+
+    # Periodic tasks: Redis lease per task (app/lease.py); ttl only bounds a crashed holder
+    LEASE_LOCKS_ENABLED: int = 1
+    LEASE_DEFAULT_TTL_SECONDS: int = 300
 
     # Schedules
     NIGHTLY_HOUR: int = 2
     NIGHTLY_MINUTE: int = 10
+    # Warm-up (tasks/warmup.py) this many minutes before the nightly jobs: Ollama model,
+    # Pexels results for the catalog items research is likely to pick
+    NIGHTLY_WARMUP_LEAD_MINUTES: int = 5
+    NIGHTLY_WARMUP_MAX_PEXELS_QUERIES: int = 70  # Pexels allows 200 requests/hour
+    NIGHTLY_WARMUP_CONCURRENCY: int = 4
     REPORT_HOUR: int = 9
     REPORT_MINUTE: int = 0
 
+    # Single-flight coalescing of identical concurrent LLM / Pexels calls
+    SINGLEFLIGHT_REDIS_ENABLED: int = 1
+    SINGLEFLIGHT_WAIT_SECONDS: int = 35  # follower wait + Redis lock TTL (extended while the leader runs)
+    SINGLEFLIGHT_RESULT_TTL_SECONDS: int = 5
+
+    # Orchestrator: max tool steps running at once within one run
+    ORCHESTRATOR_MAX_PARALLEL: int = 4
+    BATCH_MAX_PARALLEL: int = 4  # /api/commands/batch: commands running at once
+
+    # Planner: LRU of plans keyed by normalized command text (0 disables)
+    PLANNER_CACHE_SIZE: int = 512
+
+    # Executor memo cache for idempotent tools
+    TOOL_CACHE_ENABLED: int = 1
+    TOOL_CACHE_MAX_ENTRIES: int = 1024
+    RECENT_TITLES_TTL_SECONDS: int = 30  # research: recent ProductDraft titles (dropped on writes)
+
+    # Idempotency-Key replay protection (commands) and webhook event de-duplication
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_WEBHOOK_TTL_SECONDS: int = 3 * 24 * 3600
+    IDEMPOTENCY_WAIT_SECONDS: int = 30  # a replay waits this long for the in-flight original
+    IDEMPOTENCY_LEASE_SECONDS: int = 10 * 60  # an in_progress claim older than this (owner died) is taken over
+
+    # Raw webhook bodies: stored once in RawBlob (zlib level), referenced by sha256
+    RAW_BLOB_COMPRESS_LEVEL: int = 6
+
+    # Per-run tracing (span tree stored in RunRecord.result_json["trace"])
+    TRACE_ENABLED: int = 1
+    TRACE_MAX_SPANS: int = 500
+    TRACE_EXPORT_DIR: str = ""  # set to also write OTLP/JSON files per run
+
     # Local actions
     LOCAL_ACTIONS_ENABLED: int = 0
 
@@ -34,21 +76,39 @@ class Settings(BaseSettings):
     OLLAMA_ENABLED: int = 0
     OLLAMA_BASE_URL: str = "http://ollama:11434"
     OLLAMA_MODEL: str = "llama3.1"
+    OLLAMA_KEEP_ALIVE: str = "30m"  # passed on every request so the model stays resident
+    OLLAMA_PRELOAD_TIMEOUT_SECONDS: int = 120
+    OLLAMA_KEEPER_SECONDS: int = 240  # keeper ping interval (beat)
+    OLLAMA_KEEPER_ACTIVE_SECONDS: int = 900  # ...only while a webhook arrived within this window
 
     # LLM (optional)
     OPENAI_API_KEY: str = ""
     OPENAI_BASE_URL: str = "https://api.openai.com/v1"
     OPENAI_MODEL: str = "gpt-4o-mini"
 
+    # LLM cost accounting (USD per 1K tokens; Ollama is free)
+    OPENAI_COST_PER_1K_PROMPT: float = 0.00015
+    OPENAI_COST_PER_1K_COMPLETION: float = 0.0006
+    LLM_USAGE_FLUSH_SECONDS: int = 15
+
+    # Answer explicit order-status/refund requests deterministically (intents.FAST_PATH_PHRASES, no LLM call)
+    LLM_INTENT_FAST_PATH: int = 1
+
     # Shopify
     SHOPIFY_SHOP: str = ""
     SHOPIFY_ACCESS_TOKEN: str = ""
     SHOPIFY_API_VERSION: str = "2026-01"
 
     # ✅ ADD (so autopilot never crashes)
-    STORE_NICHE: str = "general"
+    STORE_NICHE: str = "general"  # comma-separated: nightly research runs one branch per niche
+    NIGHTLY_NICHE_SOFT_TIME_LIMIT_SECONDS: int = 600  # per niche branch; the others are not held up
     DEFAULT_INVENTORY_QTY: int = 100
 
+    # Research catalog (app/catalog.py): <name>.v<N>.json|csv files, "" = app/data/catalog
+    CATALOG_DIR: str = ""
+    CATALOG_RELOAD_CHECK_SECONDS: int = 5  # file mtimes are re-checked at most this often
+    CATALOG_MIN_SCORE: float = 0.3  # fuzzy niche match below this resolves to "general"
+
     # Research / Web signals (optional)
     GOOGLE_CSE_API_KEY: str = ""
     GOOGLE_CSE_CX: str = ""
@@ -58,6 +118,8 @@ class Settings(BaseSettings):
     EBAY_MARKETPLACE_ID: str = "EBAY_US"
 
     PEXELS_API_KEY: str = ""
+    PEXELS_CACHE_TTL_SECONDS: int = 6 * 3600  # search results (0 disables)
+    PEXELS_CACHE_MAX_ENTRIES: int = 512  # in-process LRU in front of Redis
     UNSPLASH_ACCESS_KEY: str = ""
 
     # Facebook
@@ -66,6 +128,40 @@ class Settings(BaseSettings):
     FACEBOOK_ACCESS_TOKEN: str = ""
     FACEBOOK_VERIFY_TOKEN: str = "dev-verify-token"
 
+    # Facebook auto-reply (tasks/facebook_auto.py)
+    FACEBOOK_AUTOREPLY_ENABLED: int = 0
+    FACEBOOK_AUTOREPLY_APPROVAL_REQUIRED: int = 0
+    FACEBOOK_AUTOREPLY_MAX_PER_TICK: int = 50
+    FACEBOOK_AUTOREPLY_DRAFT_CONCURRENCY: int = 4  # draft_reply (LLM) calls in flight per tick
+    FACEBOOK_AUTOREPLY_SEND_CONCURRENCY: int = 8  # Graph API sends in flight per tick
+    FACEBOOK_AUTOREPLY_POLL_SECONDS: int = 600  # reconciliation sweep; live replies come from the webhook path
+    FACEBOOK_AUTOREPLY_SWEEP_MIN_AGE_SECONDS: int = 120  # younger events are still owned by the live path
+    # the sweep retries what the (always on) webhook path failed or dropped; FACEBOOK_AUTOREPLY_ENABLED also runs it
+    FACEBOOK_AUTOREPLY_SWEEP_ENABLED: int = 1
+
+    # Webhook replies (tasks/replies.py): "stream" (Redis stream + worker consumer group),
+    # "celery" (one task per delivery) or "local" (in-process pool)
+    WEBHOOK_REPLY_MODE: str = "stream"
+    REPLY_STREAM_MAXLEN: int = 100_000
+    REPLY_STREAM_CLAIM_IDLE_SECONDS: float = 60.0  # take over entries a dead consumer left pending
+    REPLY_STREAM_MAX_DELIVERIES: int = 5  # an entry failing this often is acked and left to the sweep
+    WEBHOOK_REPLY_CONCURRENCY: int = 4
+    REPLY_DEBOUNCE_SECONDS: float = 4.0  # DMs from one sender within this gap get one merged reply (0 = off)
+    REPLY_DEBOUNCE_MAX_WAIT_SECONDS: float = 20.0  # ...but never hold a burst longer than this
+    REPLY_DEBOUNCE_LOOKBACK_SECONDS: int = 15 * 60  # older unanswered DMs are not merged in
+
+    # Webhook admission: reply tier (llm -> cached -> deterministic) drops as the backlog grows
+    ADMISSION_ENABLED: int = 1
+    ADMISSION_REFRESH_SECONDS: float = 1.0
+    ADMISSION_WINDOW_SECONDS: int = 15 * 60  # older unclaimed events are the autoreply tick's problem
+    ADMISSION_CACHED_DEPTH: int = 50
+    ADMISSION_CACHED_LAG_SECONDS: float = 20.0
+    ADMISSION_DETERMINISTIC_DEPTH: int = 200
+    ADMISSION_DETERMINISTIC_LAG_SECONDS: float = 60.0
+    ADMISSION_SHED_DEPTH: int = 2000  # above this replies are left to the sweep (deterministic tier if it is off)
+    REPLY_CACHE_TTL_SECONDS: int = 6 * 3600
+    REPLY_CACHE_MAX_ENTRIES: int = 2048
+
     # WhatsApp
     WHATSAPP_PHONE_NUMBER_ID: str = ""
     WHATSAPP_ACCESS_TOKEN: str = ""
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Tuple
+
+from .redis_client import get_redis
+from .settings import settings
+
+logger = logging.getLogger("singleflight")
+
+_LOCK_PREFIX = "jarvis:sf:lock:"
+_RESULT_PREFIX = "jarvis:sf:res:"
+
+# Deletes the lock only if we still own it.
+_RELEASE_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Extends the lock only if we still own it.
+_REFRESH_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return f"{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]}"
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+_lock = threading.Lock()
+_calls: Dict[str, _Call] = {}
+
+
+def do(key: str, fn: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Runs fn() once per key among concurrent callers and returns (result, shared).
+
+    - In-process: later callers block on the leader's Event.
+    - Across workers: the leader holds a Redis NX lock and publishes its JSON result
+      for SINGLEFLIGHT_RESULT_TTL_SECONDS; followers in other processes poll for it.
+      The lock expires after SINGLEFLIGHT_WAIT_SECONDS but is extended while the
+      leader runs, so a slow call (an Ollama timeout followed by the OpenAI fallback)
+      does not let a second process become leader.
+
+    Redis problems never fail the call: the caller just runs fn() itself.
+    """
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+
+    if not leader:
+        call.event.wait(float(settings.SINGLEFLIGHT_WAIT_SECONDS))
+        if call.event.is_set():
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        # leader is stuck: don't wait forever
+        return fn(), False
+
+    try:
+        result, shared = _do_distributed(key, fn)
+        call.result = result
+        return result, shared
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _calls.pop(key, None)
+        call.event.set()
+
+
+def _do_distributed(key: str, fn: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+    if not bool(settings.SINGLEFLIGHT_REDIS_ENABLED):
+        return fn(), False
+
+    lock_key = _LOCK_PREFIX + key
+    result_key = _RESULT_PREFIX + key
+    token = uuid.uuid4().hex
+    wait_s = float(settings.SINGLEFLIGHT_WAIT_SECONDS)
+
+    try:
+        r = get_redis()
+        cached = r.get(result_key)
+        if cached is not None:
+            return json.loads(cached), True
+        acquired = bool(r.set(lock_key, token, nx=True, px=int(wait_s * 1000)))
+    except Exception as e:
+        logger.debug("singleflight_redis_unavailable", extra={"extra": {"err": str(e)}})
+        return fn(), False
+
+    if acquired:
+        stop = threading.Event()
+        threading.Thread(
+            target=_keep_lock, args=(r, lock_key, token, int(wait_s * 1000), stop), name="singleflight-lock", daemon=True
+        ).start()
+        try:
+            result = fn()
+            try:
+                r.set(result_key, json.dumps(result, default=str), ex=int(settings.SINGLEFLIGHT_RESULT_TTL_SECONDS))
+            except Exception:
+                pass
+            return result, False
+        finally:
+            stop.set()
+            try:
+                r.eval(_RELEASE_LUA, 1, lock_key, token)
+            except Exception:
+                pass
+
+    # follower in another process: poll for the leader's result
+    deadline = time.monotonic() + wait_s
+    try:
+        while time.monotonic() < deadline:
+            cached = r.get(result_key)
+            if cached is not None:
+                return json.loads(cached), True
+            if not r.exists(lock_key):
+                # leader finished without publishing (or died): one last look, then run ourselves
+                cached = r.get(result_key)
+                if cached is not None:
+                    return json.loads(cached), True
+                break
+            time.sleep(0.05)
+    except Exception:
+        pass
+    return fn(), False
+
+
+def _keep_lock(r: Any, lock_key: str, token: str, ttl_ms: int, stop: threading.Event) -> None:
+    # re-arm the lock at a third of its TTL until the leader is done (or lost it)
+    while not stop.wait(ttl_ms / 3000.0):
+        try:
+            if not r.eval(_REFRESH_LUA, 1, lock_key, token, ttl_ms):
+                return
+        except Exception:
+            return
@@ -1,135 +1,274 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List, Optional
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterable, List, Optional, Set
 from datetime import datetime, timedelta, timezone
 
+from sqlalchemy import update
 from sqlmodel import Session, select
 
-from ..db import engine
+from .. import admission
+from ..db import engine, write_lock
+from ..lease import exclusive
 from ..models import MessageEvent, AuditLog, Approval
 from ..settings import settings
-from ..tools.content import draft_reply
-from ..tools import facebook as facebook_tool
 
+logger = logging.getLogger("tasks.facebook_auto")
 
-def _already_replied(session: Session, channel: str, external_id: str) -> bool:
-    # Simple dedupe: if we logged an auto-reply for this external_id, skip
-    q = select(AuditLog).where(
+
+def _already_replied(session: Session, external_ids: Iterable[str]) -> Set[str]:
+    # Simple dedupe: external_ids we already logged an auto-reply for (one query per tick)
+    ids = sorted({x for x in external_ids if x})
+    if not ids:
+        return set()
+    q = select(AuditLog.payload["external_id"].as_string()).where(
         AuditLog.event_type == "system",
         AuditLog.message == "facebook_auto_replied",
-        AuditLog.payload["external_id"].as_string() == external_id,
+        AuditLog.payload["external_id"].as_string().in_(ids),
     )
-    row = session.exec(q).first()
-    return row is not None
+    return {str(x) for x in session.exec(q).all()}
+
 
+@dataclass
+class _Job:
+    # plain snapshot of the claimed burst (ORM rows stay on the tick's thread/session);
+    # channel/external_id/from_user are the newest event's: who/what we reply to
+    channel: str
+    external_id: str
+    from_user: str
+    event_ids: List[int]
+    external_ids: List[str]
+    text: str  # merged inbound text
+    reply_text: str = ""
+    result: Optional[Dict[str, Any]] = None
+    outcome: str = ""  # queued, sent, failed, exception, skipped
+    rows: List[Any] = field(default_factory=list)  # AuditLog / Approval, written in stage 4
 
+
+@exclusive("facebook_autoreply_tick")
 def facebook_autoreply_tick() -> Dict[str, Any]:
     """
-    - Reads recent MessageEvent
-    - Generates reply text using tools/llm.py via draft_reply()
-    - Queues approval OR sends immediately (based on settings)
+    Reconciliation sweep (beat, FACEBOOK_AUTOREPLY_POLL_SECONDS): live replies are
+    event-driven, this only catches events the webhook path never finished.
+
+    Pipeline per tick:
+    1. select unanswered MessageEvent (processed=False, older than the sweep min age),
+       drop already-replied ones, claim them (DMs: the sender's whole burst, see
+       tasks/replies.claim_burst)
+    2. draft: up to FACEBOOK_AUTOREPLY_DRAFT_CONCURRENCY draft_reply() calls in flight
+    3. send: each draft goes straight to the send pool (FACEBOOK_AUTOREPLY_SEND_CONCURRENCY
+       Graph calls in flight), or becomes an Approval when approvals are required
+    4. one transaction writes every AuditLog / Approval and releases failed claims
+
+    Runs while FACEBOOK_AUTOREPLY_SWEEP_ENABLED (default) or FACEBOOK_AUTOREPLY_ENABLED
+    is set: the webhook path is not gated, so without the sweep a failed reply would
+    never be retried.
     """
-    if not settings.FACEBOOK_AUTOREPLY_ENABLED:
+    if not admission.sweep_enabled():
         return {"ok": True, "enabled": False}
 
+    # deferred: worker boot should not load LLM/Graph clients until a tick needs them
+    from .replies import claim_burst, merged_text
+
+    # the tick also answers events shed by webhook admission: same tier as live replies
+    tier = admission.current_tier()
+
     with Session(engine) as session:
-        # last 24h events (avoid infinite)
-        since = datetime.now(timezone.utc) - timedelta(hours=24)
+        # last 24h events (avoid infinite); the newest ones still belong to the live path
+        now = datetime.now(timezone.utc)
+        since = now - timedelta(hours=24)
+        until = now - timedelta(seconds=int(settings.FACEBOOK_AUTOREPLY_SWEEP_MIN_AGE_SECONDS))
 
         events: List[MessageEvent] = session.exec(
             select(MessageEvent)
-            .where(MessageEvent.created_at >= since)
+            .where(
+                MessageEvent.processed == False,  # noqa: E712
+                MessageEvent.channel.in_(("facebook_message", "facebook_comment")),
+                MessageEvent.created_at >= since,
+                MessageEvent.created_at <= until,
+            )
             .order_by(MessageEvent.id.desc())
             .limit(settings.FACEBOOK_AUTOREPLY_MAX_PER_TICK)
         ).all()
 
-        processed = 0
-        queued = 0
-        sent = 0
         skipped = 0
-        errors = 0
+        jobs: List[_Job] = []
+        claimed: Set[int] = set()  # event ids inside a burst claimed by this tick
+        replied = _already_replied(session, (ev.external_id for ev in events))
 
+        # ---------- 1) dedupe + claim ----------
         for ev in events:
-            # Only react to facebook DM + comment
-            if ev.channel not in ("facebook_message", "facebook_comment"):
+            if ev.id in claimed:  # answered with an earlier burst: counted with that job
                 continue
-
-            # Dedup
-            if ev.external_id and _already_replied(session, ev.channel, ev.external_id):
+            if ev.external_id in replied:
                 skipped += 1
                 continue
 
-            # Generate reply text
-            drafted = draft_reply(channel=ev.channel, from_user=ev.from_user, text=ev.text, brand=None)
-            reply_text = str(drafted.get("text") or "").strip()
-            if not reply_text:
+            # processed meanwhile by the live path; a sender still typing is left for
+            # the next tick
+            session.refresh(ev)
+            burst = [] if ev.processed else claim_burst(session, ev)
+            if not isinstance(burst, list) or not burst:
                 skipped += 1
                 continue
-
-            # If approvals required: create Approval record
-            if settings.FACEBOOK_AUTOREPLY_APPROVAL_REQUIRED:
-                tool_name = "facebook.reply_message" if ev.channel == "facebook_message" else "facebook.reply_comment"
-                tool_args = {"user_id": ev.from_user, "text": reply_text} if ev.channel == "facebook_message" else {"comment_id": ev.external_id, "text": reply_text}
-
-                session.add(
-                    Approval(
-                        status="pending",
-                        risk_level="high",
-                        tool_name=tool_name,
-                        tool_args=tool_args,
-                        decision_note="auto_reply_generated",
-                    )
+            claimed.update(int(e.id) for e in burst)
+            last = burst[-1]
+            jobs.append(
+                _Job(
+                    channel=last.channel,
+                    external_id=last.external_id,
+                    from_user=last.from_user,
+                    event_ids=[int(e.id) for e in burst],
+                    external_ids=[e.external_id for e in burst],
+                    text=merged_text(burst),
                 )
-                session.add(
-                    AuditLog(
-                        event_type="system",
-                        message="facebook_auto_reply_queued",
-                        payload={"channel": ev.channel, "external_id": ev.external_id, "to": ev.from_user, "text": reply_text},
-                    )
-                )
-                session.commit()
-                queued += 1
-                processed += 1
+            )
+
+        # ---------- 2) + 3) draft -> send ----------
+        _run_pipeline(jobs, tier)
+
+        # ---------- 4) one batched write ----------
+        # counts are per event: a 3-message DM burst answered once is 3 sent (2 merged)
+        counts = {"queued": 0, "sent": 0, "failed": 0, "exception": 0, "skipped": 0}
+        merged = 0
+        release_ids: List[int] = []
+        for job in jobs:
+            counts[job.outcome] += len(job.event_ids)
+            merged += len(job.event_ids) - 1
+            if job.outcome in ("failed", "exception", "skipped"):
+                release_ids.extend(job.event_ids)
+            session.add_all(job.rows)
+        if release_ids:
+            session.exec(
+                update(MessageEvent)
+                .where(MessageEvent.id.in_(release_ids))
+                .values(processed=False)
+                .execution_options(synchronize_session=False)
+            )
+        with write_lock:
+            session.commit()
+
+        processed = counts["queued"] + counts["sent"] + counts["failed"] + counts["exception"]
+        return {
+            "ok": True,
+            "enabled": True,
+            "tier": tier,
+            "processed": processed,
+            "queued": counts["queued"],
+            "sent": counts["sent"],
+            "skipped": skipped + counts["skipped"],
+            "errors": counts["failed"] + counts["exception"],
+            "merged": merged,
+        }
+
+
+def _run_pipeline(jobs: List[_Job], tier: str) -> None:
+    if not jobs:
+        return
+    drafters = max(1, min(len(jobs), int(settings.FACEBOOK_AUTOREPLY_DRAFT_CONCURRENCY)))
+    senders = max(1, min(len(jobs), int(settings.FACEBOOK_AUTOREPLY_SEND_CONCURRENCY)))
+
+    with ThreadPoolExecutor(drafters, thread_name_prefix="autoreply-draft") as draft_pool, ThreadPoolExecutor(
+        senders, thread_name_prefix="autoreply-send"
+    ) as send_pool:
+        drafts: Dict[Future, _Job] = {draft_pool.submit(_draft, job, tier): job for job in jobs}
+        sends: List[Future] = []
+        for fut in as_completed(drafts):
+            job = drafts[fut]
+            if job.outcome:  # skipped / exception while drafting
                 continue
+            if settings.FACEBOOK_AUTOREPLY_APPROVAL_REQUIRED:
+                _queue_approval(job)
+            else:
+                sends.append(send_pool.submit(_send, job))
+        for fut in sends:
+            fut.result()
 
-            # Otherwise send immediately
-            try:
-                if ev.channel == "facebook_message":
-                    r = facebook_tool.reply_message(ev.from_user, reply_text)
-                else:
-                    r = facebook_tool.reply_comment(ev.external_id, reply_text)
-
-                if r.get("ok"):
-                    sent += 1
-                    session.add(
-                        AuditLog(
-                            event_type="system",
-                            message="facebook_auto_replied",
-                            payload={"channel": ev.channel, "external_id": ev.external_id, "to": ev.from_user, "text": reply_text, "result": r},
-                        )
-                    )
-                    session.commit()
-                else:
-                    errors += 1
-                    session.add(
-                        AuditLog(
-                            event_type="system",
-                            message="facebook_auto_reply_failed",
-                            payload={"channel": ev.channel, "external_id": ev.external_id, "to": ev.from_user, "text": reply_text, "error": r},
-                        )
-                    )
-                    session.commit()
-            except Exception as e:
-                errors += 1
-                session.add(
-                    AuditLog(
-                        event_type="system",
-                        message="facebook_auto_reply_exception",
-                        payload={"err": str(e), "channel": ev.channel, "external_id": ev.external_id},
-                    )
-                )
-                session.commit()
 
-            processed += 1
+def _draft(job: _Job, tier: str) -> None:
+    from ..tools.content import draft_reply
+
+    try:
+        drafted = draft_reply(channel=job.channel, from_user=job.from_user, text=job.text, brand=None, tier=tier)
+        job.reply_text = str(drafted.get("text") or "").strip()
+        if not job.reply_text:
+            job.outcome = "skipped"
+    except Exception as e:
+        logger.exception("facebook_auto_reply_draft_failed", extra={"extra": {"external_id": job.external_id}})
+        _exception(job, e)
 
-        return {"ok": True, "enabled": True, "processed": processed, "queued": queued, "sent": sent, "skipped": skipped, "errors": errors}
+
+def _queue_approval(job: _Job) -> None:
+    tool_name = "facebook.reply_message" if job.channel == "facebook_message" else "facebook.reply_comment"
+    tool_args = {"user_id": job.from_user, "text": job.reply_text} if job.channel == "facebook_message" else {"comment_id": job.external_id, "text": job.reply_text}
+
+    job.rows.append(
+        Approval(
+            status="pending",
+            risk_level="high",
+            tool_name=tool_name,
+            tool_args=tool_args,
+            decision_note="auto_reply_generated",
+        )
+    )
+    job.rows.append(
+        AuditLog(
+            event_type="system",
+            message="facebook_auto_reply_queued",
+            payload={"channel": job.channel, "external_id": job.external_id, "to": job.from_user, "text": job.reply_text},
+        )
+    )
+    job.outcome = "queued"
+
+
+def _send(job: _Job) -> None:
+    from ..tools import facebook as facebook_tool
+
+    try:
+        if job.channel == "facebook_message":
+            r = facebook_tool.reply_message(job.from_user, job.reply_text)
+        else:
+            r = facebook_tool.reply_comment(job.external_id, job.reply_text)
+    except Exception as e:
+        _exception(job, e)
+        return
+
+    job.result = r
+    if r.get("ok"):
+        job.outcome = "sent"
+        job.rows.append(
+            AuditLog(
+                event_type="system",
+                message="facebook_auto_replied",
+                payload={
+                    "channel": job.channel,
+                    "external_id": job.external_id,
+                    "external_ids": job.external_ids,
+                    "to": job.from_user,
+                    "text": job.reply_text,
+                    "result": r,
+                },
+            )
+        )
+    else:
+        job.outcome = "failed"
+        job.rows.append(
+            AuditLog(
+                event_type="system",
+                message="facebook_auto_reply_failed",
+                payload={"channel": job.channel, "external_id": job.external_id, "to": job.from_user, "text": job.reply_text, "error": r},
+            )
+        )
+
+
+def _exception(job: _Job, e: Exception) -> None:
+    job.outcome = "exception"
+    job.rows.append(
+        AuditLog(
+            event_type="system",
+            message="facebook_auto_reply_exception",
+            payload={"err": str(e), "channel": job.channel, "external_id": job.external_id},
+        )
+    )
@@ -1,18 +1,25 @@
 from __future__ import annotations
 
 import logging
-from celery import shared_task
+import re
+import time
+from typing import Any, Dict, List
+
+from celery import chord, group, shared_task
+from celery.exceptions import SoftTimeLimitExceeded
 from sqlmodel import Session
 
+from .. import idempotency
+from ..lease import exclusive
 from ..db import engine
-from ..models import AuditLog
+from ..models import AuditLog, ProductDraft, RunRecord
+from ..settings import settings
 from ..agent.orchestrator import Orchestrator
+from ..tasks.facebook_auto import facebook_autoreply_tick
+from ..tasks.warmup import nightly_warmup
+from ..tools import ollama
 
 logger = logging.getLogger("tasks.jobs")
-from __future__ import annotations
-
-from celery import shared_task
-from ..tasks.facebook_auto import facebook_autoreply_tick
 
 
 @shared_task(name="app.tasks.jobs.facebook_autoreply_tick")
@@ -20,6 +27,46 @@ def facebook_autoreply_tick_job():
     return facebook_autoreply_tick()
 
 
+@shared_task(name="app.tasks.jobs.nightly_warmup")
+def nightly_warmup_job():
+    return nightly_warmup()
+
+
+@shared_task(name="app.tasks.jobs.ollama_keepalive_tick")
+@exclusive("ollama_keepalive_tick", ttl_s=120)
+def ollama_keepalive_tick():
+    return ollama.keepalive_tick()
+
+
+@shared_task(name="app.tasks.jobs.purge_idempotency_keys")
+@exclusive("purge_idempotency_keys")
+def purge_idempotency_keys():
+    return {"ok": True, "purged": idempotency.purge_expired()}
+
+
+def run_in_background(run_id: int) -> dict:
+    """Executes a RunRecord created by the API in background mode (Celery or in-process)."""
+    with Session(engine) as session:
+        run = session.get(RunRecord, run_id)
+        if not run:
+            return {"ok": False, "error": "run_not_found", "run_id": run_id}
+        try:
+            return Orchestrator(session=session).execute_run(run).model_dump()
+        except Exception as e:
+            logger.exception("background_run_failed", extra={"extra": {"run_id": run_id, "err": str(e)}})
+            session.rollback()
+            run = session.get(RunRecord, run_id)
+            run.status = "failed"
+            run.summary = f"Failed: {e}"
+            session.add(run)
+            session.commit()
+            return {"ok": False, "error": "exception", "run_id": run_id, "message": str(e)}
+
+
+@shared_task(name="app.tasks.jobs.execute_run")
+def execute_run(run_id: int):
+    return run_in_background(run_id)
+
 
 def _run_command(text: str) -> dict:
     with Session(engine) as session:
@@ -29,6 +76,7 @@ def _run_command(text: str) -> dict:
 
 
 @shared_task(name="app.tasks.jobs.nightly_inbox_triage")
+@exclusive("nightly_inbox_triage")
 def nightly_inbox_triage():
     out = _run_command("Triage inbox")
     with Session(engine) as session:
@@ -38,7 +86,12 @@ def nightly_inbox_triage():
 
 
 @shared_task(name="app.tasks.jobs.nightly_product_research")
+@exclusive("nightly_product_research")
 def nightly_product_research():
+    niches = store_niches()
+    if len(niches) > 1:
+        return _fan_out_research(niches)
+
     out = _run_command("Add a winning product and prepare it to sell")
     with Session(engine) as session:
         session.add(AuditLog(event_type="system", message="nightly_product_research", payload=out))
@@ -46,7 +99,114 @@ def nightly_product_research():
     return out
 
 
+# ------------------------------
+# Multi-niche research: chord(group(research_niche per niche), research_summary)
+# ------------------------------
+def store_niches() -> List[str]:
+    seen: Dict[str, str] = {}
+    for n in (settings.STORE_NICHE or "").split(","):
+        n = n.strip()
+        if n and n.casefold() not in seen:
+            seen[n.casefold()] = n
+    return list(seen.values())
+
+
+def _fan_out_research(niches: List[str]) -> Dict[str, Any]:
+    header = group(research_niche.s(n) for n in niches)
+    try:
+        res = chord(header)(research_summary.s(niches))
+        return {"ok": True, "fanned_out": niches, "chord_id": res.id}
+    except Exception as e:
+        # no broker/result backend: same pipeline, one niche after another in this process
+        logger.warning("research_fanout_unavailable_running_inline", extra={"extra": {"err": str(e)}})
+        return research_summary([research_niche(n) for n in niches], niches)
+
+
+@shared_task(
+    name="app.tasks.jobs.research_niche",
+    soft_time_limit=settings.NIGHTLY_NICHE_SOFT_TIME_LIMIT_SECONDS,
+    time_limit=settings.NIGHTLY_NICHE_SOFT_TIME_LIMIT_SECONDS + 60,
+)
+def research_niche(niche: str) -> Dict[str, Any]:
+    """One chord branch. Never raises: a failed/slow niche must not cancel the others' summary."""
+    t0 = time.perf_counter()
+    base = {"niche": niche}
+    try:
+        out = _run_command(f"Add a winning product and prepare it to sell niche={niche}")
+    except SoftTimeLimitExceeded:
+        return {**base, "ok": False, "error": "timeout", "elapsed_s": round(time.perf_counter() - t0, 1)}
+    except Exception as e:
+        logger.exception("research_niche_failed", extra={"extra": {"niche": niche}})
+        return {**base, "ok": False, "error": str(e), "elapsed_s": round(time.perf_counter() - t0, 1)}
+
+    product = next(
+        (st.get("output") or {} for st in out.get("steps") or [] if st.get("tool") == "shopify.autopilot_add_product"),
+        {},
+    )
+    return {
+        **base,
+        "ok": bool(product.get("ok")),
+        "run_id": out.get("run_id"),
+        "title": product.get("title"),
+        "draft_id": product.get("draft_id"),
+        "simulated": bool(product.get("simulated")),
+        "chosen_niche": product.get("chosen_niche"),
+        "error": None if product.get("ok") else (product.get("error") or out.get("summary")),
+        "elapsed_s": round(time.perf_counter() - t0, 1),
+    }
+
+
+def _title_key(title: str) -> str:
+    return re.sub(r"\s+", " ", (title or "").strip()).casefold()
+
+
+@shared_task(name="app.tasks.jobs.research_summary")
+def research_summary(results: List[Dict[str, Any]], niches: List[str]) -> Dict[str, Any]:
+    """
+    Chord callback: keeps the first product per title, drops later duplicates (simulated
+    drafts are deleted; published ones are only flagged) and writes one AuditLog.
+    """
+    kept: List[Dict[str, Any]] = []
+    duplicates: List[Dict[str, Any]] = []
+    first_by_title: Dict[str, Dict[str, Any]] = {}
+
+    with Session(engine) as session:
+        for r in results:
+            if not r.get("ok") or not r.get("title"):
+                continue
+            key = _title_key(r["title"])
+            if key not in first_by_title:
+                first_by_title[key] = r
+                kept.append(r)
+                continue
+            dup = {**r, "duplicate_of": first_by_title[key].get("niche"), "removed": False}
+            if r.get("simulated") and r.get("draft_id"):
+                draft = session.get(ProductDraft, r["draft_id"])
+                if draft is not None:
+                    session.delete(draft)
+                    dup["removed"] = True
+            duplicates.append(dup)
+
+        summary = {
+            "niches": niches,
+            "products": kept,
+            "duplicates": duplicates,
+            "failed": [r for r in results if not r.get("ok")],
+            "timeouts": sum(1 for r in results if r.get("error") == "timeout"),
+            "slowest_s": max((r.get("elapsed_s") or 0 for r in results), default=0),
+        }
+        session.add(AuditLog(event_type="system", message="nightly_product_research", payload=summary))
+        session.commit()
+
+    logger.info(
+        "nightly_product_research_summary",
+        extra={"extra": {"niches": len(niches), "products": len(kept), "duplicates": len(duplicates), "failed": len(summary["failed"])}},
+    )
+    return {"ok": True, **summary}
+
+
 @shared_task(name="app.tasks.jobs.nightly_content_generation")
+@exclusive("nightly_content_generation")
 def nightly_content_generation():
     out = _run_command("Generate 7 posts and queue for approval")
     with Session(engine) as session:
@@ -56,6 +216,7 @@ def nightly_content_generation():
 
 
 @shared_task(name="app.tasks.jobs.daily_report")
+@exclusive("daily_report")
 def daily_report():
     out = _run_command("Show me system status")
     with Session(engine) as session:
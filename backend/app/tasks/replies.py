@@ -0,0 +1,298 @@
+"""
+Webhook reply pipeline: drafts and sends replies for stored MessageEvents off the
+request path. Webhook handlers persist events, return 200, then call dispatch().
+
+- WEBHOOK_REPLY_MODE=stream: one Redis stream entry per delivery, consumed by the
+  workers' consumer group (tasks/reply_stream.py)
+- WEBHOOK_REPLY_MODE=celery: one Celery task per delivery
+- WEBHOOK_REPLY_MODE=local: a bounded in-process thread pool
+Stream and celery fall back to the next mode down if Redis / the broker is unreachable.
+
+Each event is claimed with a conditional UPDATE on MessageEvent.processed, so the
+facebook_autoreply_tick, a retried task and the webhook path never reply twice.
+The reply tier (llm / cached / deterministic) is chosen at admission time by
+app/admission.py and travels with the task.
+
+Debounce (REPLY_DEBOUNCE_SECONDS): Messenger DMs from one sender are answered once
+per burst. A task whose sender has a pending DM younger than the window defers
+itself; once the sender has been quiet for the window (or the burst is
+REPLY_DEBOUNCE_MAX_WAIT_SECONDS old) one UPDATE ... RETURNING claims every pending DM
+of the burst and a single reply answers the merged text.
+
+Deferrals survive restarts: they write the due time to a Redis sorted set (DUE_KEY)
+drained with poll_due() by the stream consumers, or by a poller thread in realtime
+workers (celery mode) / the API process (local mode). Only with Redis down does a
+deferral fall back to a countdown task or an in-process timer, and the events
+themselves are MessageEvent rows, so the reconciliation sweep answers anything lost.
+Celery mode avoids countdown tasks on purpose: an ETA task a dead worker had reserved
+is only redelivered after the broker visibility timeout (see celery_app.py).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Union
+
+from celery import shared_task
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from ..admission import REPLY_CHANNELS
+from ..db import engine
+from ..models import AuditLog, MessageEvent, utcnow
+from ..redis_client import get_redis
+from ..settings import settings
+
+logger = logging.getLogger("tasks.replies")
+
+DUE_KEY = "jarvis:replies:due"  # ZSET: "<tier>:<id>,<id>" scored by the epoch it is due at
+
+_pool_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+_poller: Optional[threading.Thread] = None
+
+
+def _claim(session: Session, event_id: int, processed: bool = True) -> bool:
+    res = session.exec(
+        update(MessageEvent)
+        .where(MessageEvent.id == event_id, MessageEvent.processed == (not processed))
+        .values(processed=processed)
+    )
+    session.commit()
+    return int(res.rowcount or 0) == 1
+
+
+def _age_s(dt: datetime, now: datetime) -> float:
+    # SQLite hands back naive datetimes
+    return (now.replace(tzinfo=None) - dt.replace(tzinfo=None)).total_seconds()
+
+
+def claim_burst(session: Session, ev: MessageEvent) -> Union[List[MessageEvent], float]:
+    """
+    Claims ev for replying. Returns the claimed events (oldest first; [] if someone else
+    already has it), or the seconds to wait when ev's sender is still typing.
+
+    Comments and a disabled debounce claim ev alone. DMs claim the sender's whole
+    pending burst (within REPLY_DEBOUNCE_LOOKBACK_SECONDS) in one statement.
+    """
+    window = float(settings.REPLY_DEBOUNCE_SECONDS)
+    if ev.channel != "facebook_message" or window <= 0:
+        return [ev] if _claim(session, int(ev.id)) else []
+
+    now = utcnow()
+    since = now - timedelta(seconds=int(settings.REPLY_DEBOUNCE_LOOKBACK_SECONDS))
+    pending = [MessageEvent.channel == ev.channel, MessageEvent.from_user == ev.from_user, MessageEvent.processed == False]  # noqa: E712
+    first, last = session.exec(
+        select(func.min(MessageEvent.created_at), func.max(MessageEvent.created_at)).where(
+            *pending, MessageEvent.created_at >= since
+        )
+    ).one()
+    if last is None:
+        return []
+
+    quiet_in = window - _age_s(last, now)
+    cap_in = float(settings.REPLY_DEBOUNCE_MAX_WAIT_SECONDS) - _age_s(first, now)
+    if quiet_in > 0 and cap_in > 0:
+        return max(0.05, min(quiet_in, cap_in))
+
+    claimed = session.exec(
+        update(MessageEvent)
+        .where(*pending, MessageEvent.created_at >= since)
+        .values(processed=True)
+        .returning(MessageEvent.id)
+        .execution_options(synchronize_session=False)  # re-selected below after the commit
+    ).all()
+    session.commit()
+    ids = sorted(int(r[0]) for r in claimed)
+    if not ids:
+        return []
+    return list(session.exec(select(MessageEvent).where(MessageEvent.id.in_(ids)).order_by(MessageEvent.id)).all())
+
+
+def merged_text(burst: List[MessageEvent]) -> str:
+    return "\n".join(t for t in ((e.text or "").strip() for e in burst) if t)
+
+
+def release(session: Session, burst: List[MessageEvent]) -> None:
+    """Un-claims a burst whose reply failed, leaving it for the autoreply tick / a retry."""
+    session.exec(
+        update(MessageEvent).where(MessageEvent.id.in_([int(e.id) for e in burst])).values(processed=False)
+    )
+    session.commit()
+
+
+def reply_to_event(event_id: int, tier: str = "llm") -> Dict[str, Any]:
+    from ..tools.content import draft_reply  # deferred: LLM/Graph clients load on first reply
+    from ..tools import facebook as fb
+
+    with Session(engine) as session:
+        ev = session.get(MessageEvent, event_id)
+        if ev is None:
+            return {"ok": False, "error": "not_found", "event_id": event_id}
+        if ev.channel not in REPLY_CHANNELS or ev.processed:
+            return {"ok": True, "skipped": True, "event_id": event_id}
+        burst = claim_burst(session, ev)
+        if isinstance(burst, float):
+            return {"ok": True, "deferred": True, "retry_in": burst, "event_id": event_id}
+        if not burst:
+            return {"ok": True, "skipped": True, "event_id": event_id}
+        ev = burst[-1]
+
+        drafted: Dict[str, Any] = {}
+        try:
+            drafted = draft_reply(
+                channel=ev.channel, from_user=ev.from_user, text=merged_text(burst), brand=None, tier=tier
+            )
+            text = str(drafted.get("text") or "").strip()
+            if ev.channel == "facebook_message":
+                result = fb.reply_message(ev.from_user, text)
+            else:
+                result = fb.reply_comment(ev.external_id, text)
+        except Exception as e:
+            logger.exception("webhook_reply_failed", extra={"extra": {"event_id": event_id, "err": str(e)}})
+            result, text = {"ok": False, "error": "exception", "message": str(e)}, ""
+
+        ok = result.get("ok") is True
+        if not ok:
+            release(session, burst)
+        session.add(
+            AuditLog(
+                event_type="system",
+                message="facebook_auto_replied" if ok else "facebook_auto_reply_failed",
+                payload={
+                    "channel": ev.channel,
+                    "external_id": ev.external_id,
+                    "external_ids": [e.external_id for e in burst],
+                    "to": ev.from_user,
+                    "text": text,
+                    "result": result,
+                    "via": "webhook",
+                    "tier": tier,
+                    "provider": drafted.get("provider"),
+                },
+            )
+        )
+        session.commit()
+        return {"ok": ok, "event_id": event_id, "merged": len(burst)}
+
+
+def process_events(event_ids: List[int], tier: str = "llm") -> Dict[str, Any]:
+    workers = max(1, min(len(event_ids), int(settings.WEBHOOK_REPLY_CONCURRENCY)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reply") as pool:
+        results = list(pool.map(lambda i: reply_to_event(i, tier), event_ids))
+    deferred = [r for r in results if r.get("deferred")]
+    return {
+        "ok": True,
+        "events": len(event_ids),
+        "tier": tier,
+        "sent": sum(1 for r in results if r.get("ok") and "merged" in r),
+        "merged": sum(r.get("merged", 0) for r in results if r.get("ok")),
+        "skipped": sum(1 for r in results if r.get("skipped")),
+        "deferred": [r["event_id"] for r in deferred],
+        "retry_in": max((r["retry_in"] for r in deferred), default=0.0),
+        "errors": sum(1 for r in results if not r.get("ok")),
+    }
+
+
+@shared_task(name="app.tasks.replies.process_message_events")
+def process_message_events(event_ids: List[int], tier: str = "llm"):
+    out = process_events(event_ids, tier)
+    if out["deferred"] and not defer(out["deferred"], tier, out["retry_in"]):
+        process_message_events.apply_async(args=[out["deferred"], tier], countdown=out["retry_in"])
+    return out
+
+
+def defer(event_ids: List[int], tier: str, delay_s: float) -> bool:
+    """Persists a debounce deferral: poll_due() dispatches the events again once due."""
+    try:
+        get_redis().zadd(DUE_KEY, {f"{tier}:{','.join(str(i) for i in event_ids)}": time.time() + delay_s})
+        return True
+    except Exception as e:
+        logger.warning("reply_defer_failed", extra={"extra": {"events": len(event_ids), "err": str(e)}})
+        return False
+
+
+def poll_due(limit: int = 16) -> int:
+    """Dispatches deferrals that are due. Raises on Redis errors."""
+    r = get_redis()
+    n = 0
+    for member in r.zrangebyscore(DUE_KEY, "-inf", time.time(), start=0, num=limit):
+        if not r.zrem(DUE_KEY, member):  # another poller got it first
+            continue
+        tier, _, ids = member.partition(":")
+        dispatch([int(x) for x in ids.split(",") if x], tier or "llm")
+        n += 1
+    return n
+
+
+def _poll_due_loop() -> None:
+    while True:
+        try:
+            poll_due()
+        except Exception as e:
+            logger.debug("reply_poll_due_failed", extra={"extra": {"err": str(e)}})
+            time.sleep(5.0)
+        time.sleep(0.5)
+
+
+def start_due_poller() -> None:
+    """Starts this process's poll_due() thread (idempotent). Stream consumers poll themselves."""
+    global _poller
+    with _pool_lock:
+        if _poller is None:
+            _poller = threading.Thread(target=_poll_due_loop, name="webhook-reply-due", daemon=True)
+            _poller.start()
+
+
+def _local_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=max(1, int(settings.WEBHOOK_REPLY_CONCURRENCY)), thread_name_prefix="webhook-reply"
+            )
+    if settings.WEBHOOK_REPLY_MODE == "local":  # not when stream/celery merely fell back to local
+        start_due_poller()
+    return _pool
+
+
+def dispatch(event_ids: List[int], tier: str = "llm") -> str:
+    """Hands stored events to the reply pipeline. Returns where they went."""
+    if not event_ids:
+        return "none"
+
+    if settings.WEBHOOK_REPLY_MODE == "stream":
+        from .reply_stream import publish
+
+        try:
+            publish(list(event_ids), tier)
+            return "stream"
+        except Exception as e:
+            logger.warning("reply_publish_failed_enqueueing_task", extra={"extra": {"events": len(event_ids), "err": str(e)}})
+
+    if settings.WEBHOOK_REPLY_MODE in ("stream", "celery"):
+        from ..celery_app import celery_app  # deferred: keeps celery out of API import time
+
+        try:
+            celery_app.send_task(
+                "app.tasks.replies.process_message_events", args=[list(event_ids), tier], ignore_result=True
+            )
+            return "celery"
+        except Exception as e:
+            logger.warning("reply_enqueue_failed_running_locally", extra={"extra": {"events": len(event_ids), "err": str(e)}})
+
+    pool = _local_pool()
+    for event_id in event_ids:
+        pool.submit(_reply_local, event_id, tier)
+    return "local"
+
+
+def _reply_local(event_id: int, tier: str) -> None:
+    out = reply_to_event(event_id, tier)
+    if out.get("deferred") and not defer([event_id], tier, out["retry_in"]):
+        t = threading.Timer(out["retry_in"], lambda: _local_pool().submit(_reply_local, event_id, tier))
+        t.daemon = True
+        t.start()
@@ -0,0 +1,132 @@
+"""
+Event-driven webhook replies over a Redis stream (WEBHOOK_REPLY_MODE=stream).
+
+    API:     dispatch() -> publish(ids, tier)       XADD one entry per delivery
+    worker:  start_consumer() per worker process    XREADGROUP in a consumer group, XACK
+             poll_due() every loop                  debounce deferrals back onto the stream
+
+Each worker process (every prefork child of a realtime worker, see celery_app.py)
+runs one consumer thread in the "replies" group, so an entry is handed to exactly one
+process and a node handles up to concurrency x WEBHOOK_REPLY_CONCURRENCY replies at
+once. Entries are acked once handled; an entry whose handling raised stays pending,
+like one left by a worker that died, and is taken over with XAUTOCLAIM after
+REPLY_STREAM_CLAIM_IDLE_SECONDS (at most REPLY_STREAM_MAX_DELIVERIES times). The
+MessageEvent.processed claim in tasks/replies.py makes redelivery harmless, and
+anything that never made it through (Redis down, a reply that failed) is picked up by
+the facebook_autoreply_tick reconciliation sweep.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+from ..redis_client import get_redis
+from ..settings import settings
+from .replies import defer, poll_due, process_events
+
+logger = logging.getLogger("tasks.reply_stream")
+
+STREAM = "jarvis:stream:message_events"
+GROUP = "replies"
+
+_BATCH = 16
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def publish(event_ids: List[int], tier: str = "llm") -> str:
+    """Raises on Redis errors so the caller can fall back."""
+    return get_redis().xadd(
+        STREAM,
+        {"ids": ",".join(str(i) for i in event_ids), "tier": tier},
+        maxlen=int(settings.REPLY_STREAM_MAXLEN),
+        approximate=True,
+    )
+
+
+def _ensure_group() -> None:
+    try:
+        get_redis().xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _handle(entry_id: str, fields: Dict[str, str]) -> None:
+    try:
+        ids = [int(x) for x in (fields.get("ids") or "").split(",") if x]
+        tier = fields.get("tier") or "llm"
+        if ids:
+            out = process_events(ids, tier)
+            if out["deferred"]:  # debounce: sender still typing (a failed defer is left to the sweep)
+                defer(out["deferred"], tier, out["retry_in"])
+    except Exception as e:
+        # not acked: the entry stays pending and is reclaimed after the idle time
+        logger.exception("reply_stream_entry_failed", extra={"extra": {"entry": entry_id, "err": str(e)}})
+        return
+    get_redis().xack(STREAM, GROUP, entry_id)
+
+
+def _deliveries(entry_id: str) -> int:
+    pending = get_redis().xpending_range(STREAM, GROUP, min=entry_id, max=entry_id, count=1)
+    return int(pending[0]["times_delivered"]) if pending else 0
+
+
+def _reclaim(consumer: str) -> int:
+    idle_ms = int(float(settings.REPLY_STREAM_CLAIM_IDLE_SECONDS) * 1000)
+    res = get_redis().xautoclaim(STREAM, GROUP, consumer, min_idle_time=idle_ms, start_id="0-0", count=_BATCH)
+    entries = res[1] if len(res) > 1 else []
+    for entry_id, fields in entries:
+        if not fields:  # deleted entries (trimmed by MAXLEN) come back empty
+            get_redis().xack(STREAM, GROUP, entry_id)
+        elif _deliveries(entry_id) > int(settings.REPLY_STREAM_MAX_DELIVERIES):
+            # poison entry: stop redelivering, its events stay processed=False for the sweep
+            logger.warning("reply_stream_entry_dropped", extra={"extra": {"entry": entry_id, "ids": fields.get("ids")}})
+            get_redis().xack(STREAM, GROUP, entry_id)
+        else:
+            _handle(entry_id, fields)
+    return len(entries)
+
+
+def consume(consumer: str, stop: threading.Event = _stop) -> None:
+    next_reclaim = 0.0
+    group_ready = False
+    while not stop.is_set():
+        try:
+            if not group_ready:
+                _ensure_group()
+                group_ready = True
+            if time.monotonic() >= next_reclaim:
+                _reclaim(consumer)
+                next_reclaim = time.monotonic() + float(settings.REPLY_STREAM_CLAIM_IDLE_SECONDS)
+            poll_due()
+
+            resp = get_redis().xreadgroup(GROUP, consumer, {STREAM: ">"}, count=_BATCH, block=1000)
+            for _stream, entries in resp or []:
+                for entry_id, fields in entries:
+                    _handle(entry_id, fields)
+        except Exception as e:
+            group_ready = False
+            logger.warning("reply_stream_unavailable", extra={"extra": {"err": str(e)}})
+            stop.wait(2.0)
+
+
+def start_consumer() -> Optional[threading.Thread]:
+    """Starts this process's consumer thread (idempotent)."""
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return _thread
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    _stop.clear()
+    _thread = threading.Thread(target=consume, args=(consumer,), name="reply-stream", daemon=True)
+    _thread.start()
+    logger.info("reply_stream_consumer_started", extra={"extra": {"consumer": consumer}})
+    return _thread
+
+
+def stop_consumer() -> None:
+    _stop.set()
@@ -0,0 +1,173 @@
+"""
+Nightly warm-up (beat, NIGHTLY_WARMUP_LEAD_MINUTES before NIGHTLY_HOUR:NIGHTLY_MINUTE).
+
+The nightly jobs otherwise all start cold inside the same few minutes:
+- catalog: the niche index (app/catalog.py) is loaded
+- Ollama: OLLAMA_MODEL is loaded (and its keep_alive reset) so the first draft does
+  not pay the model load
+- Pexels: the image queries of the catalog items research can pick for STORE_NICHE
+  are fetched into the shared result cache (tools/stock_images.py), items not used in
+  recent titles first, at most NIGHTLY_WARMUP_MAX_PEXELS_QUERIES requests
+
+The report (one AuditLog "nightly_warmup") gives coverage per step and time_saved_ms:
+the upstream time spent now that the nightly jobs will not spend.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from sqlmodel import Session
+
+from ..db import engine
+from ..lease import exclusive
+from ..models import AuditLog
+from ..settings import settings
+
+logger = logging.getLogger("tasks.warmup")
+
+
+@exclusive("nightly_warmup")
+def nightly_warmup() -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    report: Dict[str, Any] = {"catalog": _warm_catalog()}  # the Pexels step resolves niches through it
+    with ThreadPoolExecutor(2, thread_name_prefix="warmup") as pool:
+        ollama_fut = pool.submit(_warm_ollama)
+        pexels_fut = pool.submit(_warm_pexels)
+        report.update(ollama=ollama_fut.result(), pexels=pexels_fut.result())
+
+    report["time_saved_ms"] = round(sum(float(step.get("saved_ms") or 0) for step in report.values()), 1)
+    report["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    with Session(engine) as session:
+        session.add(AuditLog(event_type="system", message="nightly_warmup", payload=report))
+        session.commit()
+
+    logger.info(
+        "nightly_warmup",
+        extra={
+            "extra": {
+                "ollama": report["ollama"].get("ok"),
+                "pexels_coverage": report["pexels"].get("coverage"),
+                "time_saved_ms": report["time_saved_ms"],
+                "elapsed_ms": report["elapsed_ms"],
+            }
+        },
+    )
+    return {"ok": True, **report}
+
+
+def _warm_catalog() -> Dict[str, Any]:
+    from .. import catalog
+
+    try:
+        st = catalog.stats()
+    except Exception as e:
+        return {"ok": False, "error": "exception", "message": str(e)}
+    # per process: only saves the build in a worker process that also runs research
+    return {"ok": True, "files": st["files"], "niches": st["niches"], "items": st["items"], "saved_ms": st["build_ms"]}
+
+
+def _warm_ollama() -> Dict[str, Any]:
+    from ..tools import ollama
+
+    if not bool(settings.OLLAMA_ENABLED):
+        return {"ok": True, "enabled": False}
+    out = ollama.preload_model(reason="nightly_warmup")
+    # a model that was already resident answers in a few ms: that is all it saves then
+    return {**out, "saved_ms": out.get("ms") if out.get("ok") else 0}
+
+
+def _candidate_titles() -> List[Tuple[str, str]]:
+    """(niche, catalog title) for STORE_NICHE, round-robin across niches, unused titles first."""
+    from .. import catalog
+    from ..tools.research_multisource import _recent_titles
+    from .jobs import store_niches
+
+    recent = " | ".join(t.lower() for t in _recent_titles(150))
+    pools: List[List[Tuple[str, str]]] = []
+    seen_keys = set()
+    for niche in store_niches() or ["general"]:
+        key = catalog.resolve(niche)
+        if key in seen_keys:
+            continue
+        seen_keys.add(key)
+        items = [str(item["base"]) for item in catalog.items(key) or catalog.items(catalog.FALLBACK)]
+        items.sort(key=lambda base: base.lower() in recent)  # stable: catalog order otherwise
+        pools.append([(key, base) for base in items])
+
+    out: List[Tuple[str, str]] = []
+    for i in range(max((len(p) for p in pools), default=0)):
+        out.extend(p[i] for p in pools if i < len(p))
+    return out
+
+
+def _warm_pexels() -> Dict[str, Any]:
+    if not settings.PEXELS_API_KEY:
+        return {"ok": True, "enabled": False, "reason": "missing_pexels_api_key"}
+    if int(settings.PEXELS_CACHE_TTL_SECONDS) <= 0:
+        return {"ok": True, "enabled": False, "reason": "pexels_cache_disabled"}
+
+    from ..tools.shopify_autopilot import image_queries
+    from ..tools.stock_images import pexels_search_image
+
+    candidates = _candidate_titles()
+    budget = int(settings.NIGHTLY_WARMUP_MAX_PEXELS_QUERIES)
+
+    # whole items only: a half-warmed item still pays Pexels at pick time
+    planned: List[Tuple[str, str, List[str]]] = []
+    n_queries = 0
+    for niche, title in candidates:
+        qs = image_queries(title)
+        if n_queries + len(qs) > budget:
+            break
+        planned.append((niche, title, qs))
+        n_queries += len(qs)
+
+    def fetch(q: str) -> Tuple[Dict[str, Any], float]:
+        t = time.perf_counter()
+        r = pexels_search_image(q, orientation="square")
+        return r, (time.perf_counter() - t) * 1000.0
+
+    queries = [q for _, _, qs in planned for q in qs]
+    workers = max(1, min(len(queries) or 1, int(settings.NIGHTLY_WARMUP_CONCURRENCY)))
+    with ThreadPoolExecutor(workers, thread_name_prefix="warmup-pexels") as pool:
+        results = dict(zip(queries, pool.map(fetch, queries)))
+
+    fetched = already = failed = 0
+    saved_ms = 0.0
+    by_niche: Dict[str, Dict[str, int]] = {}
+    for niche, title, qs in planned:
+        warm = True
+        for q in qs:
+            r, ms = results[q]
+            if r.get("cached"):
+                already += 1
+            elif r.get("ok") or r.get("error") in ("no_results", "no_relevant_results"):
+                fetched += 1
+                saved_ms += ms
+            else:
+                failed += 1
+                warm = False
+        stats = by_niche.setdefault(niche, {"items": 0, "warm": 0})
+        stats["items"] += 1
+        stats["warm"] += int(warm)
+    for niche, _ in candidates[len(planned):]:
+        by_niche.setdefault(niche, {"items": 0, "warm": 0})["items"] += 1
+
+    warm_items = sum(s["warm"] for s in by_niche.values())
+    return {
+        "ok": failed == 0,
+        "enabled": True,
+        "items": len(candidates),
+        "items_warm": warm_items,
+        "coverage": round(warm_items / len(candidates), 3) if candidates else 1.0,
+        "queries": len(queries),
+        "fetched": fetched,
+        "already_cached": already,
+        "failed": failed,
+        "niches": by_niche,
+        "saved_ms": round(saved_ms, 1),
+    }
@@ -5,6 +5,7 @@ from typing import Any, Dict, List, Optional
 from sqlmodel import Session, select
 
 from ..db import engine
+from ..intents import customer_intent
 from ..models import MessageEvent, ProductDraft
 from ..settings import settings
 from .llm import generate
@@ -16,21 +17,15 @@ def triage_inbox(limit: int = 50) -> Dict[str, Any]:
 
     buckets = {"order": [], "refund": [], "general": []}
     for m in msgs:
-        t = (m.text or "").lower()
         row = {"id": m.id, "channel": m.channel, "from": m.from_user, "text": m.text}
-        if any(k in t for k in ["order", "shipping", "delivery", "where"]):
-            buckets["order"].append(row)
-        elif any(k in t for k in ["refund", "return", "money back"]):
-            buckets["refund"].append(row)
-        else:
-            buckets["general"].append(row)
+        buckets[customer_intent(m.text)].append(row)
 
     return {"ok": True, "limit": limit, "counts": {k: len(v) for k, v in buckets.items()}, "buckets": buckets}
 
 
-def draft_reply(channel: str, from_user: str, text: str, brand: Optional[str]) -> Dict[str, Any]:
+def draft_reply(channel: str, from_user: str, text: str, brand: Optional[str], tier: str = "llm") -> Dict[str, Any]:
     brand_name = brand or settings.BRAND_NAME
-    out = generate(brand=brand_name, user_text=text, channel=channel)
+    out = generate(brand=brand_name, user_text=text, channel=channel, tier=tier)
     return {"ok": True, "channel": channel, "to": from_user, "text": out["text"], "provider": out["provider"]}
 
 
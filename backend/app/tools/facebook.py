@@ -3,7 +3,7 @@ from __future__ import annotations
 import logging
 from typing import Any, Dict, List
 
-import httpx
+from .. import http_pool
 from ..settings import settings
 
 logger = logging.getLogger("tools.facebook")
@@ -35,7 +35,7 @@ def create_post(text_from: str = "generated", text: str | None = None) -> Dict[s
         _require_token()
         url = _graph_url(f"/{settings.FACEBOOK_PAGE_ID}/feed")
         payload = {"message": post_text, "access_token": settings.FACEBOOK_ACCESS_TOKEN}
-        with httpx.Client(timeout=20.0) as client:
+        with http_pool.client(timeout=20.0) as client:
             r = client.post(url, data=payload)
         if r.status_code >= 400:
             logger.error("facebook_create_post_failed", extra={"extra": {"status": r.status_code, "body": r.text}})
@@ -54,7 +54,7 @@ def reply_comment(comment_id: str, text: str) -> Dict[str, Any]:
         _require_token()
         url = _graph_url(f"/{comment_id}/comments")
         payload = {"message": text, "access_token": settings.FACEBOOK_ACCESS_TOKEN}
-        with httpx.Client(timeout=20.0) as client:
+        with http_pool.client(timeout=20.0) as client:
             r = client.post(url, data=payload)
         if r.status_code >= 400:
             logger.error("facebook_reply_comment_failed", extra={"extra": {"status": r.status_code, "body": r.text}})
@@ -84,7 +84,7 @@ def reply_message(psid: str, text: str) -> Dict[str, Any]:
             "messaging_type": "RESPONSE",
             "access_token": settings.FACEBOOK_ACCESS_TOKEN,
         }
-        with httpx.Client(timeout=20.0) as client:
+        with http_pool.client(timeout=20.0) as client:
             r = client.post(url, json=payload)
 
         if r.status_code >= 400:
@@ -2,11 +2,13 @@ from __future__ import annotations
 
 import logging
 import re
+import time
 from typing import Any, Dict
 
-import httpx
-
+from .. import http_pool, singleflight, tracing
+from ..intents import fast_reply_text
 from ..settings import settings
+from . import llm_usage, reply_cache
 
 logger = logging.getLogger("tools.llm")
 
@@ -75,22 +77,11 @@ def _finalize(brand: str, text: str) -> str:
 # Deterministic fallback (human style)
 # ------------------------------
 def _deterministic_reply(brand: str, user_text: str, channel: str) -> str:
-    t = (user_text or "").lower().strip()
-
     is_public = "comment" in (channel or "")
-    short_end = "" if is_public else " (so I can look it up)."
 
-    if any(k in t for k in ["order", "shipping", "delivery", "delivered", "where", "track", "tracking"]):
-        return _finalize(
-            brand,
-            "Sure—please share your order number and the email/phone used at checkout" + short_end,
-        )
-
-    if any(k in t for k in ["refund", "return", "money back", "cancel"]):
-        return _finalize(
-            brand,
-            "I can help with next steps—please share your order number and a human will review your request.",
-        )
+    fast = fast_reply_text(user_text, channel)
+    if fast:
+        return _finalize(brand, fast)
 
     # generic
     if is_public:
@@ -101,53 +92,141 @@ def _deterministic_reply(brand: str, user_text: str, channel: str) -> str:
 # ------------------------------
 # Main generator
 # ------------------------------
-def generate(brand: str, user_text: str, channel: str = "generic") -> Dict[str, Any]:
+def _ms_since(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def generate(brand: str, user_text: str, channel: str = "generic", tier: str = "llm") -> Dict[str, Any]:
+    """
+    tier comes from webhook admission (app/admission.py): "llm" (normal), "cached"
+    (reply cache, else deterministic) or "deterministic" (no LLM call at all).
+    """
+    with tracing.span("llm.generate", channel=channel, tier=tier) as sp:
+        out = _generate_shared(brand, user_text, channel, tier)
+        if sp is not None:
+            sp.set(provider=str(out.get("provider")), shared=bool(out.get("shared")), fast_path=bool(out.get("fast_path")))
+        return out
+
+
+def _generate_shared(brand: str, user_text: str, channel: str, tier: str = "llm") -> Dict[str, Any]:
+    t_start = time.perf_counter()
+
+    # 0) explicit order-status/refund requests have a fixed answer: skip the LLM
+    if bool(settings.LLM_INTENT_FAST_PATH):
+        fast = fast_reply_text(user_text, channel, precise=True)
+        if fast:
+            llm_usage.record("deterministic", _ms_since(t_start), fallback_reason="intent_fast_path")
+            return {"ok": True, "provider": "deterministic", "text": _finalize(brand, fast), "fast_path": True}
+
+    if not (bool(settings.OLLAMA_ENABLED) or settings.OPENAI_API_KEY):
+        return _generate(brand, user_text, channel)
+
+    # 1) under load: reuse an earlier LLM reply to the same text, or answer deterministically
+    if tier != "llm":
+        hit = reply_cache.get(brand, channel, user_text) if tier == "cached" else None
+        if hit:
+            llm_usage.record(str(hit.get("provider") or "unknown"), _ms_since(t_start), cache_hit=True)
+            return {"ok": True, "provider": hit.get("provider"), "text": hit.get("text"), "reply_cached": True}
+        llm_usage.record("deterministic", _ms_since(t_start), fallback_reason=f"load_{tier}")
+        return {"ok": True, "provider": "deterministic", "text": _deterministic_reply(brand, user_text, channel)}
+
+    # identical concurrent prompts (viral post => same comment N times) share one generation
+    is_public = "comment" in (channel or "")
+    key = singleflight.make_key(
+        "llm",
+        brand,
+        is_public,
+        reply_cache.normalize(user_text),
+        bool(settings.OLLAMA_ENABLED) and settings.OLLAMA_MODEL,
+        bool(settings.OPENAI_API_KEY) and settings.OPENAI_MODEL,
+    )
+    out, shared = singleflight.do(key, lambda: _generate(brand, user_text, channel))
+    if shared:
+        llm_usage.record(str(out.get("provider") or "unknown"), _ms_since(t_start), cache_hit=True)
+        return {**out, "shared": True}
+    if out.get("provider") in ("ollama", "openai"):
+        reply_cache.put(brand, channel, user_text, str(out["provider"]), str(out.get("text") or ""))
+    return out
+
+
+def _generate(brand: str, user_text: str, channel: str) -> Dict[str, Any]:
+    t_start = time.perf_counter()
+    fallback_reason = None
+
     # 1) Ollama
     if bool(settings.OLLAMA_ENABLED):
-        try:
-            url = f"{settings.OLLAMA_BASE_URL.rstrip('/')}/api/generate"
-            payload = {
-                "model": settings.OLLAMA_MODEL,
-                "prompt": f"{system_prompt(brand, channel)}\nUser: {user_text}\nAssistant:",
-                "stream": False,
-            }
-            with httpx.Client(timeout=30.0) as client:
-                r = client.post(url, json=payload)
-                if r.status_code < 400:
-                    data = r.json()
-                    text = str(data.get("response", "")).strip()
-                    if not text:
-                        return {"ok": True, "provider": "ollama", "text": _deterministic_reply(brand, user_text, channel)}
-                    return {"ok": True, "provider": "ollama", "text": _finalize(brand, text)}
-                logger.warning("ollama_failed", extra={"extra": {"status": r.status_code, "body": r.text}})
-        except Exception as e:
-            logger.warning("ollama_exception", extra={"extra": {"err": str(e)}})
+        with tracing.span("llm.ollama", model=settings.OLLAMA_MODEL):
+            t0 = time.perf_counter()
+            try:
+                url = f"{settings.OLLAMA_BASE_URL.rstrip('/')}/api/generate"
+                payload = {
+                    "model": settings.OLLAMA_MODEL,
+                    "prompt": f"{system_prompt(brand, channel)}\nUser: {user_text}\nAssistant:",
+                    "stream": False,
+                    "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+                }
+                with http_pool.client(timeout=30.0) as client:
+                    r = client.post(url, json=payload)
+                    if r.status_code < 400:
+                        data = r.json()
+                        text = str(data.get("response", "")).strip()
+                        llm_usage.record(
+                            "ollama",
+                            _ms_since(t0),
+                            ok=bool(text),
+                            prompt_tokens=data.get("prompt_eval_count") or 0,
+                            completion_tokens=data.get("eval_count") or 0,
+                        )
+                        if not text:
+                            return {"ok": True, "provider": "ollama", "text": _deterministic_reply(brand, user_text, channel)}
+                        return {"ok": True, "provider": "ollama", "text": _finalize(brand, text)}
+                    logger.warning("ollama_failed", extra={"extra": {"status": r.status_code, "body": r.text}})
+                    fallback_reason = f"ollama_http_{r.status_code}"
+            except Exception as e:
+                logger.warning("ollama_exception", extra={"extra": {"err": str(e)}})
+                fallback_reason = f"ollama_{type(e).__name__}"
+            llm_usage.record("ollama", _ms_since(t0), ok=False)
 
     # 2) OpenAI
     if settings.OPENAI_API_KEY:
-        try:
-            url = f"{settings.OPENAI_BASE_URL.rstrip('/')}/chat/completions"
-            headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY}", "Content-Type": "application/json"}
-            payload = {
-                "model": settings.OPENAI_MODEL,
-                "messages": [
-                    {"role": "system", "content": system_prompt(brand, channel)},
-                    {"role": "user", "content": user_text},
-                ],
-                "temperature": 0.2,
-            }
-            with httpx.Client(timeout=30.0) as client:
-                r = client.post(url, headers=headers, json=payload)
-                if r.status_code < 400:
-                    data = r.json()
-                    text = (((data.get("choices") or [{}])[0].get("message") or {}).get("content")) or ""
-                    text = text.strip()
-                    if not text:
-                        return {"ok": True, "provider": "openai", "text": _deterministic_reply(brand, user_text, channel)}
-                    return {"ok": True, "provider": "openai", "text": _finalize(brand, text)}
-                logger.warning("openai_failed", extra={"extra": {"status": r.status_code, "body": r.text}})
-        except Exception as e:
-            logger.warning("openai_exception", extra={"extra": {"err": str(e)}})
+        with tracing.span("llm.openai", model=settings.OPENAI_MODEL):
+            t0 = time.perf_counter()
+            try:
+                url = f"{settings.OPENAI_BASE_URL.rstrip('/')}/chat/completions"
+                headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY}", "Content-Type": "application/json"}
+                payload = {
+                    "model": settings.OPENAI_MODEL,
+                    "messages": [
+                        {"role": "system", "content": system_prompt(brand, channel)},
+                        {"role": "user", "content": user_text},
+                    ],
+                    "temperature": 0.2,
+                }
+                with http_pool.client(timeout=30.0) as client:
+                    r = client.post(url, headers=headers, json=payload)
+                    if r.status_code < 400:
+                        data = r.json()
+                        text = (((data.get("choices") or [{}])[0].get("message") or {}).get("content")) or ""
+                        text = text.strip()
+                        usage = data.get("usage") or {}
+                        llm_usage.record(
+                            "openai",
+                            _ms_since(t0),
+                            ok=bool(text),
+                            prompt_tokens=usage.get("prompt_tokens") or 0,
+                            completion_tokens=usage.get("completion_tokens") or 0,
+                            fallback_reason=fallback_reason,
+                        )
+                        if not text:
+                            return {"ok": True, "provider": "openai", "text": _deterministic_reply(brand, user_text, channel)}
+                        return {"ok": True, "provider": "openai", "text": _finalize(brand, text)}
+                    logger.warning("openai_failed", extra={"extra": {"status": r.status_code, "body": r.text}})
+                    fallback_reason = f"openai_http_{r.status_code}"
+            except Exception as e:
+                logger.warning("openai_exception", extra={"extra": {"err": str(e)}})
+                fallback_reason = f"openai_{type(e).__name__}"
+            llm_usage.record("openai", _ms_since(t0), ok=False)
 
     # 3) fallback
+    llm_usage.record("deterministic", _ms_since(t_start), fallback_reason=fallback_reason or "no_provider")
     return {"ok": True, "provider": "deterministic", "text": _deterministic_reply(brand, user_text, channel)}
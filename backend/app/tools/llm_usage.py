@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from ..db import engine, write_lock
+from ..models import LlmUsageRollup
+from ..settings import settings
+
+logger = logging.getLogger("tools.llm_usage")
+
+# Upper bounds (ms). The last histogram slot counts everything slower.
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+def _minute(ts: float) -> datetime:
+    return datetime.fromtimestamp(int(ts // 60) * 60, tz=timezone.utc)
+
+
+def _bucket(latency_ms: float) -> int:
+    for i, b in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= b:
+            return i
+    return len(LATENCY_BUCKETS_MS)
+
+
+def cost_usd(provider: str, prompt_tokens: int, completion_tokens: int) -> float:
+    if provider != "openai":
+        return 0.0
+    return (
+        prompt_tokens / 1000.0 * float(settings.OPENAI_COST_PER_1K_PROMPT)
+        + completion_tokens / 1000.0 * float(settings.OPENAI_COST_PER_1K_COMPLETION)
+    )
+
+
+@dataclass
+class _Acc:
+    calls: int = 0
+    errors: int = 0
+    cache_hits: int = 0
+    fallbacks: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_ms_sum: float = 0.0
+    latency_ms_max: float = 0.0
+    latency_hist: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1))
+    fallback_reasons: Dict[str, int] = field(default_factory=dict)
+
+
+_lock = threading.Lock()
+_pending: Dict[Tuple[datetime, str], _Acc] = {}
+_last_flush = time.monotonic()
+
+# Background flusher: record() sits on the reply path and never writes the DB itself
+_wake = threading.Event()
+_flusher_pid: Optional[int] = None  # started lazily per process (Celery prefork children)
+
+
+def record(
+    provider: str,
+    latency_ms: float,
+    ok: bool = True,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cache_hit: bool = False,
+    fallback_reason: Optional[str] = None,
+) -> None:
+    """
+    Adds one generation attempt to the in-process rollup. A background thread flushes
+    it to the DB once per LLM_USAGE_FLUSH_SECONDS or when the minute rolls over.
+    """
+    _ensure_flusher()
+
+    now = time.time()
+    key = (_minute(now), provider)
+    with _lock:
+        acc = _pending.get(key)
+        if acc is None:
+            acc = _pending[key] = _Acc()
+        acc.calls += 1
+        acc.errors += 0 if ok else 1
+        acc.cache_hits += 1 if cache_hit else 0
+        acc.prompt_tokens += int(prompt_tokens or 0)
+        acc.completion_tokens += int(completion_tokens or 0)
+        acc.cost_usd += cost_usd(provider, int(prompt_tokens or 0), int(completion_tokens or 0))
+        acc.latency_ms_sum += latency_ms
+        acc.latency_ms_max = max(acc.latency_ms_max, latency_ms)
+        acc.latency_hist[_bucket(latency_ms)] += 1
+        if fallback_reason:
+            acc.fallbacks += 1
+            acc.fallback_reasons[fallback_reason] = acc.fallback_reasons.get(fallback_reason, 0) + 1
+
+        due = (time.monotonic() - _last_flush) >= float(settings.LLM_USAGE_FLUSH_SECONDS) or any(
+            m < key[0] for m, _ in _pending
+        )
+
+    if due:
+        _wake.set()
+
+
+def _ensure_flusher() -> None:
+    global _flusher_pid
+
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name="llm-usage-flush", daemon=True).start()
+
+
+def _flush_loop() -> None:
+    while True:
+        _wake.wait(float(settings.LLM_USAGE_FLUSH_SECONDS))
+        _wake.clear()
+        try:
+            flush()
+        except Exception:  # flush() logs; the loop must survive anything
+            pass
+
+
+_COUNTERS = (
+    "calls", "errors", "cache_hits", "fallbacks", "prompt_tokens", "completion_tokens", "cost_usd", "latency_ms_sum",
+)
+
+
+def _merge_json(row: LlmUsageRollup, acc: _Acc) -> None:
+    hist = list(row.latency_hist or [])
+    hist += [0] * (len(acc.latency_hist) - len(hist))
+    row.latency_hist = [a + b for a, b in zip(hist, acc.latency_hist)]
+
+    reasons = dict(row.fallback_reasons or {})
+    for k, v in acc.fallback_reasons.items():
+        reasons[k] = reasons.get(k, 0) + v
+    row.fallback_reasons = reasons
+
+
+def _merge_acc(dst: _Acc, src: _Acc) -> None:
+    dst.calls += src.calls
+    dst.errors += src.errors
+    dst.cache_hits += src.cache_hits
+    dst.fallbacks += src.fallbacks
+    dst.prompt_tokens += src.prompt_tokens
+    dst.completion_tokens += src.completion_tokens
+    dst.cost_usd += src.cost_usd
+    dst.latency_ms_sum += src.latency_ms_sum
+    dst.latency_ms_max = max(dst.latency_ms_max, src.latency_ms_max)
+    dst.latency_hist = [a + b for a, b in zip(dst.latency_hist, src.latency_hist)]
+    for k, v in src.fallback_reasons.items():
+        dst.fallback_reasons[k] = dst.fallback_reasons.get(k, 0) + v
+
+
+def _write(batch: Dict[Tuple[datetime, str], _Acc]) -> None:
+    """
+    Counters are added by the upsert itself; the JSON histogram / reasons are merged
+    afterwards in the same transaction, which already holds SQLite's write lock.
+    """
+    table = LlmUsageRollup.__table__
+    with write_lock, Session(engine) as session:
+        for (minute, provider), acc in batch.items():
+            values = {c: getattr(acc, c) for c in _COUNTERS}
+            stmt = sqlite_insert(LlmUsageRollup).values(
+                minute=minute,
+                provider=provider,
+                latency_ms_max=acc.latency_ms_max,
+                latency_hist=[],
+                fallback_reasons={},
+                **values,
+            )
+            session.exec(
+                stmt.on_conflict_do_update(
+                    index_elements=["minute", "provider"],
+                    set_={
+                        **{c: table.c[c] + stmt.excluded[c] for c in _COUNTERS},
+                        "latency_ms_max": func.max(table.c.latency_ms_max, stmt.excluded.latency_ms_max),
+                    },
+                )
+            )
+            row = session.exec(
+                select(LlmUsageRollup).where(LlmUsageRollup.minute == minute, LlmUsageRollup.provider == provider)
+            ).one()
+            _merge_json(row, acc)
+            session.add(row)
+        session.commit()
+
+
+def flush() -> int:
+    """Writes pending rollups (upsert per minute/provider). Returns rows touched."""
+    global _last_flush
+
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+
+    if not batch:
+        return 0
+
+    for attempt in (1, 2):
+        try:
+            _write(batch)
+            return len(batch)
+        except IntegrityError as e:
+            # the upsert makes this unexpected: one retry, then the batch is dropped
+            if attempt == 2:
+                logger.warning("llm_usage_flush_dropped", extra={"extra": {"err": str(e), "rows": len(batch)}})
+        except Exception as e:
+            logger.warning("llm_usage_flush_failed", extra={"extra": {"err": str(e), "rows": len(batch)}})
+            break
+    return 0
+
+
+atexit.register(flush)
+
+
+# ------------------------------
+# Read side
+# ------------------------------
+def _percentile(hist: List[int], q: float, max_ms: float) -> Optional[float]:
+    """Upper bound of the bucket holding the q-th percentile (None if no data)."""
+    total = sum(hist)
+    if total <= 0:
+        return None
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen >= rank:
+            return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else round(max_ms, 1)
+    return round(max_ms, 1)
+
+
+def _summary(acc: _Acc) -> Dict[str, Any]:
+    hist = acc.latency_hist
+    return {
+        "calls": acc.calls,
+        "errors": acc.errors,
+        "cache_hits": acc.cache_hits,
+        "fallbacks": acc.fallbacks,
+        "fallback_reasons": acc.fallback_reasons,
+        "prompt_tokens": acc.prompt_tokens,
+        "completion_tokens": acc.completion_tokens,
+        "cost_usd": round(acc.cost_usd, 6),
+        "latency_ms": {
+            "avg": round(acc.latency_ms_sum / acc.calls, 1) if acc.calls else None,
+            "max": round(acc.latency_ms_max, 1),
+            "p50": _percentile(hist, 0.50, acc.latency_ms_max),
+            "p90": _percentile(hist, 0.90, acc.latency_ms_max),
+            "p99": _percentile(hist, 0.99, acc.latency_ms_max),
+        },
+    }
+
+
+def usage_report(session: Session, minutes: int = 60) -> Dict[str, Any]:
+    flush()
+
+    since = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    rows = session.exec(
+        select(LlmUsageRollup).where(LlmUsageRollup.minute >= since).order_by(LlmUsageRollup.minute)
+    ).all()
+
+    per_provider: Dict[str, _Acc] = {}
+    total = _Acc()
+    for r in rows:
+        acc = _Acc(
+            calls=r.calls,
+            errors=r.errors,
+            cache_hits=r.cache_hits,
+            fallbacks=r.fallbacks,
+            prompt_tokens=r.prompt_tokens,
+            completion_tokens=r.completion_tokens,
+            cost_usd=r.cost_usd,
+            latency_ms_sum=r.latency_ms_sum,
+            latency_ms_max=r.latency_ms_max,
+            latency_hist=(list(r.latency_hist or []) + [0] * (len(LATENCY_BUCKETS_MS) + 1))[: len(LATENCY_BUCKETS_MS) + 1],
+            fallback_reasons=dict(r.fallback_reasons or {}),
+        )
+        _merge_acc(per_provider.setdefault(r.provider, _Acc()), acc)
+        _merge_acc(total, acc)
+
+    return {
+        "ok": True,
+        "window_minutes": minutes,
+        "buckets_ms": list(LATENCY_BUCKETS_MS),
+        "providers": {k: _summary(v) for k, v in sorted(per_provider.items())},
+        "totals": _summary(total),
+    }
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from ..redis_client import get_redis
+from ..settings import settings
+
+logger = logging.getLogger("tools.ollama")
+
+_TRAFFIC_KEY = "jarvis:traffic:last_webhook"
+
+_state_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "resident": None,  # None = unknown / not checked yet
+    "checked_at": 0.0,
+    "last_preload_at": None,
+    "last_preload_ms": None,
+    "last_error": None,
+}
+
+
+def _base_url() -> str:
+    return settings.OLLAMA_BASE_URL.rstrip("/")
+
+
+def preload_model(reason: str = "startup") -> Dict[str, Any]:
+    """
+    Loads OLLAMA_MODEL into memory (an empty /api/generate call) and resets its keep_alive timer.
+    """
+    if not bool(settings.OLLAMA_ENABLED):
+        return {"ok": True, "enabled": False}
+
+    import httpx  # deferred: keeps app/worker import time down
+
+    t0 = time.perf_counter()
+    try:
+        payload = {"model": settings.OLLAMA_MODEL, "keep_alive": settings.OLLAMA_KEEP_ALIVE}
+        with httpx.Client(timeout=float(settings.OLLAMA_PRELOAD_TIMEOUT_SECONDS)) as client:
+            r = client.post(f"{_base_url()}/api/generate", json=payload)
+        ms = round((time.perf_counter() - t0) * 1000.0, 1)
+        ok = r.status_code < 400
+        with _state_lock:
+            _state.update(
+                resident=ok,
+                checked_at=time.time(),
+                last_preload_at=time.time(),
+                last_preload_ms=ms,
+                last_error=None if ok else f"http_{r.status_code}",
+            )
+        log = logger.info if ok else logger.warning
+        log("ollama_preload", extra={"extra": {"reason": reason, "ok": ok, "ms": ms, "model": settings.OLLAMA_MODEL}})
+        return {"ok": ok, "enabled": True, "reason": reason, "ms": ms, "status_code": r.status_code}
+    except Exception as e:
+        with _state_lock:
+            _state.update(resident=False, checked_at=time.time(), last_error=str(e))
+        logger.warning("ollama_preload_exception", extra={"extra": {"reason": reason, "err": str(e)}})
+        return {"ok": False, "enabled": True, "reason": reason, "error": "exception", "message": str(e)}
+
+
+def preload_in_background(reason: str) -> None:
+    """Startup hook: never block app/worker boot on a model load."""
+    if bool(settings.OLLAMA_ENABLED):
+        threading.Thread(target=preload_model, args=(reason,), name="ollama-preload", daemon=True).start()
+
+
+def _tagged(name: str) -> str:
+    # "llama3" and "llama3:latest" are the same model; "llama3:8b" is another one
+    name = name.strip()
+    return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+
+def model_state(max_age_seconds: float = 30.0) -> Dict[str, Any]:
+    """
+    Is OLLAMA_MODEL loaded right now? Asks /api/ps at most once per max_age_seconds
+    (this backs /api/status, which is polled by health checks).
+    """
+    if not bool(settings.OLLAMA_ENABLED):
+        return {"enabled": False, "resident": None}
+
+    with _state_lock:
+        fresh = (time.time() - float(_state["checked_at"])) < max_age_seconds
+
+    if not fresh:
+        import httpx
+
+        try:
+            with httpx.Client(timeout=1.0) as client:
+                r = client.get(f"{_base_url()}/api/ps")
+            models = []
+            if r.status_code < 400:
+                models = (r.json() or {}).get("models") or []
+            want = _tagged(settings.OLLAMA_MODEL)
+            resident = any(_tagged(m.get("name") or m.get("model") or "") == want for m in models)
+            with _state_lock:
+                _state.update(resident=resident, checked_at=time.time(), last_error=None)
+        except Exception as e:
+            with _state_lock:
+                _state.update(resident=None, checked_at=time.time(), last_error=str(e))
+
+    with _state_lock:
+        return {"enabled": True, "model": settings.OLLAMA_MODEL, "keep_alive": settings.OLLAMA_KEEP_ALIVE, **_state}
+
+
+# ------------------------------
+# Traffic-driven keeper
+# ------------------------------
+def mark_webhook_traffic() -> None:
+    try:
+        get_redis().set(_TRAFFIC_KEY, str(time.time()), ex=int(settings.OLLAMA_KEEPER_ACTIVE_SECONDS))
+    except Exception:
+        pass
+
+
+def keepalive_tick() -> Dict[str, Any]:
+    """Re-pings the model only while webhooks have seen traffic recently."""
+    if not bool(settings.OLLAMA_ENABLED):
+        return {"ok": True, "enabled": False}
+
+    try:
+        last = get_redis().get(_TRAFFIC_KEY)
+    except Exception as e:
+        return {"ok": False, "error": "redis_unavailable", "message": str(e)}
+
+    if not last:
+        return {"ok": True, "enabled": True, "active": False}
+
+    out = preload_model(reason="keepalive")
+    return {**out, "active": True, "last_webhook_age_s": round(time.time() - float(last), 1)}
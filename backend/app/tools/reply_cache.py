@@ -0,0 +1,39 @@
+"""
+Reply cache for the admission "cached" tier: LLM replies keyed by (brand, public/private,
+normalized text). Filled on every successful LLM reply; read only when the webhook
+backlog has pushed replies off the LLM. Storage is app/ttl_cache.py (Redis + local LRU).
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, Optional
+
+from .. import singleflight
+from ..settings import settings
+from ..ttl_cache import TwoTierCache
+
+_cache = TwoTierCache(
+    "jarvis:replycache:",
+    ttl=lambda: settings.REPLY_CACHE_TTL_SECONDS,
+    max_entries=lambda: settings.REPLY_CACHE_MAX_ENTRIES,
+)
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").strip()).casefold()
+
+
+def key(brand: str, channel: str, user_text: str) -> str:
+    return singleflight.make_key("reply", brand, "comment" in (channel or ""), normalize(user_text))
+
+
+def get(brand: str, channel: str, user_text: str) -> Optional[Dict[str, Any]]:
+    return _cache.get(key(brand, channel, user_text))
+
+
+def put(brand: str, channel: str, user_text: str, provider: str, text: str) -> None:
+    _cache.put(key(brand, channel, user_text), {"provider": provider, "text": text})
+
+
+def stats() -> Dict[str, Any]:
+    return _cache.stats()
@@ -3,9 +3,9 @@ from __future__ import annotations
 import logging
 from typing import Dict
 
-import httpx
 from sqlmodel import Session
 
+from .. import http_pool, tracing
 from ..db import engine
 from ..models import ProductDraft
 from ..settings import settings
@@ -72,7 +72,7 @@ def publish_product(product_id: int) -> Dict:
         payload = {"product": {"id": int(ext_id), "status": "active"}}
 
         try:
-            with httpx.Client(timeout=15.0) as client:
+            with tracing.span("shopify.publish"), http_pool.client(timeout=15.0) as client:
                 r = client.put(url, headers=_shopify_headers(), json=payload)
                 if r.status_code >= 400:
                     logger.warning("shopify_publish_failed", extra={"extra": {"status": r.status_code, "body": r.text}})
@@ -4,9 +4,9 @@ import math
 import re
 from typing import Any, Dict, List, Tuple
 
-import httpx
 from sqlmodel import Session
 
+from .. import http_pool, tracing
 from ..db import engine
 from ..models import ProductDraft
 from ..settings import settings
@@ -392,15 +392,10 @@ def _alt_matches_product_strict(title: str, alt: str | None) -> bool:
     return all(r in a for r in req)
 
 
-def _image_urls(title: str, niche: str) -> List[str]:
-    """
-    Two-stage selection:
-    A) STRICT: must match product noun/phrase
-    B) FALLBACK: if strict fails, still return relevant images but reject obvious wrong.
-    """
+def image_queries(title: str) -> List[str]:
+    """Pexels queries _image_urls() runs for a product title (also prefetched by the nightly warm-up)."""
     core = _build_strict_product_query(title)
-
-    queries = [
+    return [
         f"{core} product photo",
         f"{core} isolated on white background",
         f"{core} close up",
@@ -410,6 +405,15 @@ def _image_urls(title: str, niche: str) -> List[str]:
         f"{core} in hand",
     ]
 
+
+def _image_urls(title: str, niche: str) -> List[str]:
+    """
+    Two-stage selection:
+    A) STRICT: must match product noun/phrase
+    B) FALLBACK: if strict fails, still return relevant images but reject obvious wrong.
+    """
+    queries = image_queries(title)
+
     strict_urls: List[str] = []
     relaxed_urls: List[str] = []
 
@@ -534,7 +538,7 @@ def add_product_full_auto(
         payload["product"]["images"] = [{"src": u, "alt": seo_title} for u in urls]
 
     try:
-        with httpx.Client(timeout=45.0) as client:
+        with tracing.span("shopify.create_product", images=len(urls)), http_pool.client(timeout=45.0) as client:
             resp = client.post(create_url, headers=_shopify_headers(), json=payload)
             if resp.status_code >= 400:
                 return {
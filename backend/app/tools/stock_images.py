@@ -2,9 +2,10 @@ from __future__ import annotations
 
 from typing import Any, Dict, List
 import re
-import httpx
 
+from .. import http_pool, singleflight, tracing
 from ..settings import settings
+from ..ttl_cache import TwoTierCache
 
 
 _BAD_TOKENS = {
@@ -120,7 +121,48 @@ def _score_photo(query_tokens: List[str], photo: Dict[str, Any]) -> int:
     return score
 
 
+# ------------------------------
+# Result cache (PEXELS_CACHE_TTL_SECONDS, app/ttl_cache.py): shared across workers, so
+# the nightly warm-up fills it for research. Only answers that would come back the
+# same are cached, never HTTP errors/exceptions.
+# ------------------------------
+_CACHEABLE = {None, "no_results", "no_relevant_results"}  # error values
+
+_cache = TwoTierCache(
+    "jarvis:pexels:",
+    ttl=lambda: settings.PEXELS_CACHE_TTL_SECONDS,
+    max_entries=lambda: settings.PEXELS_CACHE_MAX_ENTRIES,
+)
+
+
+def cache_stats() -> Dict[str, Any]:
+    return _cache.stats()
+
+
 def pexels_search_image(query: str, orientation: str = "square") -> Dict[str, Any]:
+    """
+    Cached for PEXELS_CACHE_TTL_SECONDS (hits carry "cached": True); concurrent callers
+    with the same (query, orientation) share one Pexels request.
+    """
+    if not (getattr(settings, "PEXELS_API_KEY", "") and (query or "").strip()):
+        return _pexels_search_image(query, orientation)
+
+    key = singleflight.make_key("pexels", (query or "").strip().lower(), orientation)
+    if int(settings.PEXELS_CACHE_TTL_SECONDS) > 0:
+        hit = _cache.get(key)
+        if hit is not None:
+            return {**hit, "cached": True}
+
+    with tracing.span("pexels.search", query=(query or "").strip()[:80]) as sp:
+        out, shared = singleflight.do(key, lambda: _pexels_search_image(query, orientation))
+        if sp is not None:
+            sp.set(ok=out.get("ok") is True, shared=shared)
+    if int(settings.PEXELS_CACHE_TTL_SECONDS) > 0 and not shared and out.get("error") in _CACHEABLE:
+        _cache.put(key, out)
+    return out
+
+
+def _pexels_search_image(query: str, orientation: str = "square") -> Dict[str, Any]:
     """
     Returns ONE best matching image from Pexels (public URL), or ok=False.
 
@@ -150,7 +192,7 @@ def pexels_search_image(query: str, orientation: str = "square") -> Dict[str, An
     }
 
     try:
-        with httpx.Client(timeout=20.0) as client:
+        with http_pool.client(timeout=20.0) as client:
             r = client.get(url, headers=headers, params=params)
             if r.status_code >= 400:
                 return {
@@ -3,7 +3,7 @@ from __future__ import annotations
 import logging
 from typing import Any, Dict
 
-import httpx
+from .. import http_pool
 from ..settings import settings
 
 logger = logging.getLogger("tools.whatsapp")
@@ -18,7 +18,7 @@ def send_reply(to: str, text: str) -> Dict[str, Any]:
         headers = {"Authorization": f"Bearer {settings.WHATSAPP_ACCESS_TOKEN}", "Content-Type": "application/json"}
         payload = {"messaging_product": "whatsapp", "to": to, "type": "text", "text": {"body": text}}
 
-        with httpx.Client(timeout=15.0) as client:
+        with http_pool.client(timeout=15.0) as client:
             r = client.post(url, headers=headers, json=payload)
             if r.status_code >= 400:
                 return {"ok": False, "error": "whatsapp_error", "status_code": r.status_code, "body": r.text}
@@ -0,0 +1,275 @@
+"""
+Lightweight per-run tracing.
+
+    with tracing.start_trace("run", run_id=7) as trace:
+        with tracing.span("plan"):
+            ...
+        run.result_json["trace"] = trace.compact()
+
+span() is a no-op outside a trace, so tools can be instrumented unconditionally.
+The current span lives in a contextvar: threads started with a copied context
+(executor tool threads, orchestrator pool via copy_context().run) nest correctly.
+
+Span names are "<category>[.<detail>]"; the category drives the timing breakdown
+(plan, policy, db, tool, llm, pexels, shopify, ...).
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .settings import settings
+
+logger = logging.getLogger("tracing")
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "id", "parent_id", "name", "start_ns", "end_ns", "attrs", "error")
+
+    def __init__(self, trace: "Trace", parent_id: Optional[int], name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.id = 0
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attrs = attrs
+        self.error: Optional[str] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def finish(self, error: Optional[str] = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+        if error:
+            self.error = error
+
+
+class Trace:
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+        self.dropped = 0
+        self.root = self._add(None, name, attrs)
+
+    def _add(self, parent_id: Optional[int], name: str, attrs: Dict[str, Any]) -> Optional[Span]:
+        with self._lock:
+            if len(self._spans) >= max(1, int(settings.TRACE_MAX_SPANS)):
+                self.dropped += 1
+                return None
+            s = Span(self, parent_id, name, attrs)
+            s.id = len(self._spans) + 1
+            self._spans.append(s)
+            return s
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        JSON-safe span list for RunRecord.result_json["trace"]. Offsets are ms from the
+        root start; unfinished spans are closed at "now".
+        """
+        now = time.time_ns()
+        t0 = self.root.start_ns
+        with self._lock:
+            spans = list(self._spans)
+        out = []
+        for s in spans:
+            row: Dict[str, Any] = {
+                "id": s.id,
+                "parent": s.parent_id,
+                "name": s.name,
+                "start_ms": round((s.start_ns - t0) / 1e6, 2),
+                "dur_ms": round(((s.end_ns or now) - s.start_ns) / 1e6, 2),
+            }
+            if s.attrs:
+                row["attrs"] = s.attrs
+            if s.error:
+                row["error"] = s.error
+            out.append(row)
+        return {
+            "trace_id": self.trace_id,
+            "start_unix_ns": t0,
+            "dropped": self.dropped,
+            "spans": out,
+            "breakdown_ms": breakdown(out),
+        }
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def start_trace(name: str, **attrs: Any) -> Iterator[Optional[Trace]]:
+    """Opens a new trace with a root span (yields None when TRACE_ENABLED=0)."""
+    if not bool(settings.TRACE_ENABLED):
+        yield None
+        return
+    trace = Trace(name, attrs)
+    token = _current.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.finish(error=type(e).__name__)
+        raise
+    finally:
+        trace.root.finish()
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    parent = _current.get()
+    s = parent.trace._add(parent.id, name, attrs) if parent is not None else None
+    if s is None:
+        yield None
+        return
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.finish(error=type(e).__name__)
+        raise
+    finally:
+        s.finish()
+        _current.reset(token)
+
+
+# ------------------------------
+# Summaries / export
+# ------------------------------
+def breakdown(spans: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Wall ms per category. A span nested under a span of the same category is not
+    counted again (tool -> tool retry), but db time inside a tool counts for both.
+    Parallel steps add up, so categories can exceed the run's elapsed time.
+    """
+    by_id = {s["id"]: s for s in spans}
+    totals: Dict[str, float] = {}
+    for s in spans:
+        if s["parent"] is None:
+            continue
+        cat = s["name"].split(".", 1)[0]
+        p = by_id.get(s["parent"])
+        nested = False
+        while p is not None:
+            if p["name"].split(".", 1)[0] == cat:
+                nested = True
+                break
+            p = by_id.get(p["parent"])
+        if not nested:
+            totals[cat] = round(totals.get(cat, 0.0) + s["dur_ms"], 2)
+    return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+
+def waterfall(compact: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Spans in start order with depth, ready for a frontend waterfall."""
+    spans = compact.get("spans") or []
+    depth: Dict[int, int] = {}
+    for s in spans:  # parents are always recorded before their children
+        depth[s["id"]] = depth.get(s["parent"], -1) + 1 if s["parent"] is not None else 0
+    rows = [{**s, "depth": depth[s["id"]]} for s in spans]
+    rows.sort(key=lambda r: (r["start_ms"], r["depth"]))
+    return rows
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": v if isinstance(v, str) else json.dumps(v, default=str)}
+
+
+def to_otlp(compact: Dict[str, Any], service_name: str = "jarvis-backend") -> Dict[str, Any]:
+    """OTLP/JSON (ExportTraceServiceRequest) built from a compact trace."""
+    t0 = int(compact.get("start_unix_ns") or 0)
+    trace_id = compact.get("trace_id") or ""
+    spans = []
+    for s in compact.get("spans") or []:
+        start = t0 + int(s["start_ms"] * 1e6)
+        span_json: Dict[str, Any] = {
+            "traceId": trace_id,
+            "spanId": f"{s['id']:016x}",
+            "name": s["name"],
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int(s["dur_ms"] * 1e6)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in (s.get("attrs") or {}).items()],
+            "status": {"code": 2, "message": s["error"]} if s.get("error") else {"code": 1},
+        }
+        if s["parent"] is not None:
+            span_json["parentSpanId"] = f"{s['parent']:016x}"
+        spans.append(span_json)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def export(compact: Dict[str, Any], label: str) -> Optional[str]:
+    """Writes OTLP JSON to TRACE_EXPORT_DIR (if set). Never raises."""
+    out_dir = (settings.TRACE_EXPORT_DIR or "").strip()
+    if not out_dir:
+        return None
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"{label}-{compact.get('trace_id')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(to_otlp(compact), f, separators=(",", ":"))
+        return path
+    except Exception as e:
+        logger.warning("trace_export_failed", extra={"extra": {"err": str(e), "dir": out_dir}})
+        return None
+
+
+# ------------------------------
+# DB spans (every engine, only while a trace is active)
+# ------------------------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _db_span_start(conn, cursor, statement, parameters, context, executemany) -> None:
+    parent = _current.get()
+    s = None
+    if parent is not None:
+        verb = (statement or "").lstrip().split(" ", 1)[0].lower() or "query"
+        s = parent.trace._add(parent.id, f"db.{verb}", {"db.statement": (statement or "")[:120]})
+    # pushed even when untraced so start/end always pair up on this connection
+    conn.info.setdefault("trace_db_spans", []).append(s)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _db_span_end(conn, cursor, statement, parameters, context, executemany) -> None:
+    stack = conn.info.get("trace_db_spans")
+    if stack:
+        s = stack.pop()
+        if s is not None:
+            s.finish()
+
+
+@event.listens_for(Engine, "handle_error")
+def _db_span_error(ctx) -> None:
+    conn = ctx.connection
+    stack = conn.info.get("trace_db_spans") if conn is not None else None
+    if stack:
+        s = stack.pop()
+        if s is not None:
+            s.finish(error=type(ctx.original_exception).__name__)
@@ -0,0 +1,75 @@
+"""
+Two-tier TTL cache for JSON-serializable values: Redis shares entries across API and
+worker processes, a small in-process LRU sits in front and is the only store when
+Redis is down. Redis errors never reach the caller.
+
+    _cache = TwoTierCache("jarvis:replycache:", ttl=lambda: settings.REPLY_CACHE_TTL_SECONDS,
+                          max_entries=lambda: settings.REPLY_CACHE_MAX_ENTRIES)
+
+ttl / max_entries are read on every call, so settings changed at runtime apply.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .redis_client import get_redis
+
+logger = logging.getLogger("ttl_cache")
+
+
+class TwoTierCache:
+    def __init__(self, prefix: str, ttl: Callable[[], float], max_entries: Callable[[], int]) -> None:
+        self.prefix = prefix
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "puts": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._local.get(key)
+            if hit is not None and hit[0] > now:
+                self._local.move_to_end(key)
+                self._stats["hits"] += 1
+                return hit[1]
+
+        value = None
+        try:
+            raw = get_redis().get(self.prefix + key)
+            value = json.loads(raw) if raw else None
+        except Exception as e:
+            logger.debug("ttl_cache_redis_unavailable", extra={"extra": {"prefix": self.prefix, "err": str(e)}})
+
+        with self._lock:
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._remember(key, value, now)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._stats["puts"] += 1
+            self._remember(key, value, time.monotonic())
+        try:
+            get_redis().set(self.prefix + key, json.dumps(value), ex=int(self._ttl()))
+        except Exception:
+            pass
+
+    def _remember(self, key: str, value: Any, now: float) -> None:
+        self._local[key] = (now + float(self._ttl()), value)
+        self._local.move_to_end(key)
+        while len(self._local) > int(self._max_entries()):
+            self._local.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "local_entries": len(self._local)}
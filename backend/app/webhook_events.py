@@ -0,0 +1,166 @@
+"""
+Webhook payload -> normalized inbound events, stored in bulk.
+
+    events = facebook_events(payload)            # generator, nothing stored yet
+    ids = store_delivery("facebook_event", payload, events)
+
+One Meta delivery can batch many entry[].messaging[] / changes[] items. The
+extractors walk the payload lazily and skip malformed items (or a body that is not
+a JSON object) instead of failing the delivery; store_delivery() writes the raw body (once, to the blob store), the audit
+row, the de-dupe markers and all new MessageEvents in a single commit. Rows keep the
+blob ref plus the item's path in the delivery; see blobstore.event_raw().
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from . import blobstore, idempotency
+from .agent import tool_cache
+from .db import engine, write_lock
+from .models import AuditLog, MessageEvent, utcnow
+
+
+@dataclass(frozen=True)
+class InboundEvent:
+    channel: str  # facebook_message, facebook_comment, whatsapp_message
+    external_id: str
+    from_user: str
+    text: str
+    raw: Dict[str, Any]
+    dedupe_id: str = ""  # idempotency key within the channel ("" = never de-duplicated)
+    path: Tuple[Any, ...] = ()  # where raw sits inside the delivery payload
+
+
+def _dicts(value: Any) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    for i, item in enumerate(value if isinstance(value, list) else ()):
+        if isinstance(item, dict):
+            yield i, item
+
+
+def _entries(payload: Any) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    return _dicts(payload.get("entry") if isinstance(payload, dict) else None)
+
+
+def facebook_events(payload: Any) -> Iterator[InboundEvent]:
+    for e, entry in _entries(payload):
+        # ---------- Messenger messages ----------
+        for j, msg in _dicts(entry.get("messaging")):
+            sender = (msg.get("sender") or {}).get("id") or ""
+            message = msg.get("message") or {}
+            text = message.get("text") or ""
+            mid = message.get("mid") or ""
+            if message.get("is_echo") is True:  # our own replies
+                continue
+            if sender and text:
+                yield InboundEvent(
+                    "facebook_message", mid, sender, text, msg, dedupe_id=mid, path=("entry", e, "messaging", j)
+                )
+
+        # ---------- Feed comments (entry[].changes[].value) ----------
+        for j, ch in _dicts(entry.get("changes")):
+            value = ch.get("value") or {}
+            verb = value.get("verb")
+            if value.get("item") != "comment" or verb not in ("add", "edited"):
+                continue
+            comment_id = value.get("comment_id") or value.get("id") or ""
+            comment_text = value.get("message") or ""
+            from_id = (value.get("from") or {}).get("id") or value.get("from_id") or ""
+            if comment_id and comment_text:
+                yield InboundEvent(
+                    "facebook_comment",
+                    comment_id,
+                    from_id or "unknown",
+                    comment_text,
+                    ch,
+                    dedupe_id=f"{comment_id}:{verb}",
+                    path=("entry", e, "changes", j),
+                )
+
+
+def whatsapp_events(payload: Any) -> Iterator[InboundEvent]:
+    for e, entry in _entries(payload):
+        for c, ch in _dicts(entry.get("changes")):
+            for j, m in _dicts((ch.get("value") or {}).get("messages")):
+                body = ((m.get("text") or {}).get("body")) or ""
+                mid = m.get("id", "")
+                if body:
+                    yield InboundEvent(
+                        "whatsapp_message",
+                        mid,
+                        m.get("from", ""),
+                        body,
+                        m,
+                        dedupe_id=mid,
+                        path=("entry", e, "changes", c, "value", "messages", j),
+                    )
+
+
+def store_delivery(message: str, payload: Any, events: Iterable[InboundEvent]) -> List[int]:
+    """
+    Stores one webhook delivery in one transaction. Events whose dedupe_id was already
+    seen (a redelivery, or a repeat inside this payload) are dropped. Returns the new
+    MessageEvent ids in payload order.
+
+    The core inserts bypass the Session flush hooks, so the tool cache's MessageEvent
+    generation is bumped here once new rows are committed.
+    """
+    now = utcnow()
+    fresh: List[InboundEvent] = []
+    keys: List[tuple] = []
+    batch_seen = set()
+    for ev in events:
+        if ev.dedupe_id:
+            k = (ev.channel, ev.dedupe_id)
+            if k in batch_seen:
+                continue
+            batch_seen.add(k)
+            keys.append(k)
+        fresh.append(ev)
+
+    with write_lock, Session(engine) as session:
+        # blob + audit row first: the transaction then holds SQLite's write lock, so
+        # the marker upsert below cannot race another process
+        sha = blobstore.put(session, payload)
+        session.exec(
+            insert(AuditLog).values(
+                created_at=now,
+                run_id=None,
+                step_index=0,
+                event_type="webhook",
+                message=message,
+                payload={
+                    "raw_blob": sha,
+                    "object": payload.get("object") if isinstance(payload, dict) else None,
+                    "events": len(fresh),
+                },
+            )
+        )
+        new_keys = idempotency.claim_webhook_events(session, keys)
+        fresh = [ev for ev in fresh if not ev.dedupe_id or (ev.channel, ev.dedupe_id) in new_keys]
+
+        ids: List[int] = []
+        if fresh:
+            rows = session.execute(
+                insert(MessageEvent).returning(MessageEvent.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "created_at": now,
+                        "channel": ev.channel,
+                        "external_id": ev.external_id,
+                        "from_user": ev.from_user,
+                        "text": ev.text,
+                        "processed": False,
+                        "meta": {"raw_blob": sha, "raw_path": list(ev.path)},
+                    }
+                    for ev in fresh
+                ],
+            )
+            ids = [r[0] for r in rows]
+        session.commit()
+    if ids:
+        tool_cache.invalidate("MessageEvent")
+    return ids
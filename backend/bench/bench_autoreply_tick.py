@@ -0,0 +1,93 @@
+"""
+Microbenchmark: one facebook_autoreply_tick over a backlog of unanswered events.
+
+The LLM draft and the Graph send are replaced by sleeps (--llm-ms / --graph-ms) so
+the run measures the tick's pipeline, not a provider. Compares draft/send
+concurrency 1/1 (the old one-event-at-a-time loop) with the configured
+FACEBOOK_AUTOREPLY_DRAFT_CONCURRENCY / FACEBOOK_AUTOREPLY_SEND_CONCURRENCY.
+
+Run from backend/:
+    python -m bench.bench_autoreply_tick
+    python -m bench.bench_autoreply_tick --events 100 --llm-ms 400 --graph-ms 120
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Dict
+
+_TMP = tempfile.mkdtemp(prefix="bench-autoreply-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+os.environ.update(FACEBOOK_AUTOREPLY_ENABLED="1", FACEBOOK_AUTOREPLY_SWEEP_MIN_AGE_SECONDS="0", DRY_RUN="1")
+
+import app.models  # noqa: E402,F401
+from app.db import init_db  # noqa: E402
+from app.settings import settings  # noqa: E402
+from app.tasks.facebook_auto import facebook_autoreply_tick  # noqa: E402
+from app.tools import content, facebook  # noqa: E402
+from app.webhook_events import facebook_events, store_delivery  # noqa: E402
+
+
+def _simulate(llm_ms: float, graph_ms: float) -> None:
+    def draft_reply(channel: str, from_user: str, text: str, brand: Any = None, tier: str = "llm") -> Dict[str, Any]:
+        time.sleep(llm_ms / 1000.0)
+        return {"ok": True, "text": f"re: {text}", "provider": "bench"}
+
+    def send(*_args: Any) -> Dict[str, Any]:
+        time.sleep(graph_ms / 1000.0)
+        return {"ok": True, "dry_run": True}
+
+    content.draft_reply = draft_reply
+    facebook.reply_message = send
+    facebook.reply_comment = send
+
+
+def _seed(events: int, tag: str) -> None:
+    payload = {
+        "entry": [
+            {
+                "changes": [
+                    {"value": {"item": "comment", "verb": "add", "comment_id": f"{tag}-{i}", "message": "how much?", "from": {"id": f"f{i}"}}}
+                    for i in range(events)
+                ]
+            }
+        ]
+    }
+    store_delivery("facebook_event", payload, facebook_events(payload))
+
+
+def _run(events: int, drafters: int, senders: int, tag: str) -> tuple[float, Dict[str, Any]]:
+    settings.FACEBOOK_AUTOREPLY_DRAFT_CONCURRENCY = drafters
+    settings.FACEBOOK_AUTOREPLY_SEND_CONCURRENCY = senders
+    _seed(events, tag)
+    t0 = time.perf_counter()
+    out = facebook_autoreply_tick()
+    return time.perf_counter() - t0, out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=40)
+    ap.add_argument("--llm-ms", type=float, default=300.0)
+    ap.add_argument("--graph-ms", type=float, default=100.0)
+    args = ap.parse_args()
+
+    init_db()
+    _simulate(args.llm_ms, args.graph_ms)
+    settings.FACEBOOK_AUTOREPLY_MAX_PER_TICK = args.events
+    drafters, senders = int(settings.FACEBOOK_AUTOREPLY_DRAFT_CONCURRENCY), int(settings.FACEBOOK_AUTOREPLY_SEND_CONCURRENCY)
+
+    seq_s, seq = _run(args.events, 1, 1, "seq")
+    par_s, par = _run(args.events, drafters, senders, "par")
+    assert seq["sent"] == par["sent"] == args.events, (seq, par)
+
+    print(f"backlog:     {args.events} events  llm {args.llm_ms:.0f} ms  graph {args.graph_ms:.0f} ms")
+    print(f"sequential:  {seq_s:7.2f} s  ({args.events / seq_s:6.1f} events/s)")
+    print(f"pipeline:    {par_s:7.2f} s  ({args.events / par_s:6.1f} events/s)  draft {drafters} / send {senders}")
+    print(f"speedup:     {seq_s / par_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
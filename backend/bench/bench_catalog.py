@@ -0,0 +1,68 @@
+"""
+Microbenchmark: catalog niche resolution (app/catalog.py).
+
+Reports the index build time, resolve() latency for unseen texts (full trigram/token
+scoring) and for repeated texts (memo), and how a few free-text niches resolve.
+
+Run from backend/:
+    python -m bench.bench_catalog
+    python -m bench.bench_catalog --n 20000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from app import catalog
+
+SAMPLES = [
+    "home kitchen gadgets",
+    "phone accesories",
+    "beauty & personal care",
+    "skin care",
+    "car acessories",
+    "fitnes",
+    "jewellery",
+    "shoes for men",
+    "earbuds",
+    "dog toys",
+    "baby toys",
+    "gardening tools",
+    "smartphone accessories",
+    "phone cases",
+    "cheap phone accessories",
+]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=5000)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    idx = catalog.load()
+    load_ms = (time.perf_counter() - t0) * 1000.0
+
+    texts = [f"{SAMPLES[i % len(SAMPLES)]} {i}" for i in range(args.n)]  # all distinct: no memo hits
+    t0 = time.perf_counter()
+    for t in texts:
+        idx.resolve(t)
+    cold_us = (time.perf_counter() - t0) / args.n * 1e6
+
+    t0 = time.perf_counter()
+    for i in range(args.n):
+        idx.resolve(SAMPLES[i % len(SAMPLES)])
+    memo_us = (time.perf_counter() - t0) / args.n * 1e6
+
+    st = idx.stats()
+    print(f"catalog:   {st['niches']} niches  {st['items']} items  {st['index_tokens']} tokens  files {st['files']}")
+    print(f"load:      {load_ms:8.2f} ms  (index build {st['build_ms']:.2f} ms)")
+    print(f"resolve:   {cold_us:8.1f} us  unseen text")
+    print(f"resolve:   {memo_us:8.1f} us  memoized")
+    for s in SAMPLES:
+        r = idx.resolve(s)
+        print(f"  {s!r:26s} -> {r.niche:12s} {r.score:5.3f} {r.via}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold-start import benchmark for the API and the Celery worker.
+
+Runs `python -X importtime` in fresh interpreters (bytecode already compiled),
+reports the median total and the heaviest imports, and compares against the
+cold-start targets below.
+
+Run from backend/:
+    python -m bench.bench_importtime
+    python -m bench.bench_importtime --runs 7 --top 15 --check   # exit 1 over target
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Seconds of import work (median). Framework imports (fastapi/pydantic/sqlalchemy,
+# celery/kombu) are most of this; tool modules and their clients must stay lazy.
+TARGETS: Dict[str, Tuple[str, float]] = {
+    "api": ("import app.main", 1.0),
+    "worker": ("import app.celery_app, app.tasks.jobs, app.tasks.facebook_auto", 0.8),
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _profile(stmt: str) -> Tuple[float, List[Tuple[int, str]]]:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_PATH", os.path.join(os.getcwd(), ".bench-importtime.db"))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", stmt],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    total_us = 0
+    rows: List[Tuple[int, str]] = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        cumulative, indent, name = int(m.group(2)), len(m.group(3)), m.group(4)
+        if indent <= 1:  # top-level import of the statement
+            total_us += cumulative
+        rows.append((cumulative, name))
+    return total_us / 1e6, rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--check", action="store_true", help="exit 1 if any median exceeds its target")
+    args = ap.parse_args()
+
+    over = False
+    for label, (stmt, target_s) in TARGETS.items():
+        _profile(stmt)  # compile .pyc / warm the page cache
+        totals: List[float] = []
+        rows: List[Tuple[int, str]] = []
+        for _ in range(args.runs):
+            total, rows = _profile(stmt)
+            totals.append(total)
+        median = statistics.median(totals)
+        over = over or median > target_s
+
+        print(f"== {label}: {stmt}")
+        print(f"   median {median:.3f}s  min {min(totals):.3f}s  target {target_s:.1f}s  "
+              f"{'OK' if median <= target_s else 'OVER'}")
+        print("   heaviest app modules (cumulative):")
+        for us, name in sorted((r for r in rows if r[1].startswith("app")), reverse=True)[: args.top]:
+            print(f"     {us / 1000:8.1f} ms  {name}")
+
+    if args.check and over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
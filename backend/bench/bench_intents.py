@@ -0,0 +1,75 @@
+"""
+Microbenchmark: intent classification over synthetic inbox messages.
+
+Compares the old per-call-site substring loops (triage + deterministic reply +
+planner keyword checks) with the single compiled pass in app.intents.
+
+Run from backend/:
+    python -m bench.bench_intents            # 1,000,000 messages
+    python -m bench.bench_intents --n 200000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from app.intents import classify, customer_intent
+
+_WORDS = (
+    "hi hello price size color available tomorrow thanks love this great blue black "
+    "where is my order please refund return cancel tracking delivery shipping money back "
+    "can i get it in l xl how much cash on delivery dhaka"
+).split()
+
+
+def _messages(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(_WORDS, k=rng.randint(2, 14))) for _ in range(n)]
+
+
+def _legacy(text: str) -> tuple:
+    # What triage_inbox, _deterministic_reply and planner.plan each did per message.
+    t = text.lower()
+    triage_order = any(k in t for k in ["order", "shipping", "delivery", "where"])
+    triage_refund = any(k in t for k in ["refund", "return", "money back"])
+    reply_order = any(k in t for k in ["order", "shipping", "delivery", "delivered", "where", "track", "tracking"])
+    reply_refund = any(k in t for k in ["refund", "return", "money back", "cancel"])
+    status = any(k in t for k in ["show me system status", "system status", "status summary", "health"])
+    add = any(h in t for h in ("add", "create", "make", "publish", "post", "put", "launch", "upload"))
+    product = any(p in t for p in ("product", "item", "goods", "sku"))
+    return triage_order, triage_refund, reply_order, reply_refund, status, add, product
+
+
+def _compiled(text: str) -> tuple:
+    found = classify(text)
+    return customer_intent(intents=found), found
+
+
+def _time(fn: Callable[[str], object], msgs: List[str]) -> float:
+    start = time.perf_counter()
+    for m in msgs:
+        fn(m)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    msgs = _messages(args.n)
+    _time(_compiled, msgs[:1000])  # warm
+
+    legacy_s = _time(_legacy, msgs)
+    compiled_s = _time(_compiled, msgs)
+
+    print(f"messages:        {args.n:,}")
+    print(f"legacy loops:    {legacy_s:.2f}s  ({args.n / legacy_s:,.0f} msg/s)")
+    print(f"compiled regex:  {compiled_s:.2f}s  ({args.n / compiled_s:,.0f} msg/s)")
+    print(f"speedup:         {legacy_s / compiled_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Microbenchmark: command planning throughput.
+
+Mixes the fixed commands the API/nightly jobs send with unique add-product
+commands, and times the rule table uncached (every call classifies + extracts)
+against plan() with its LRU.
+
+Run from backend/:
+    python -m bench.bench_planner             # 200,000 commands
+    python -m bench.bench_planner --n 50000 --unique 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from app.agent import planner
+
+_FIXED = (
+    "Show me system status",
+    "Triage inbox",
+    "Add a winning product and prepare it to sell",
+    "Analyze product and propose best price",
+    "Publish product 123",
+)
+_NICHES = ("kitchen", "home decor", "pet", "summer", "electronics", "beauty", "fitness", "baby care")
+
+
+def _commands(n: int, unique: float, seed: int = 11) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        if rng.random() < unique:
+            out.append(f"add a {rng.choice(_NICHES)} product qty={i % 500} for store {i}")
+        else:
+            out.append(rng.choice(_FIXED))
+    return out
+
+
+def _time(fn: Callable[[str], object], cmds: List[str]) -> float:
+    start = time.perf_counter()
+    for c in cmds:
+        fn(c)
+    return time.perf_counter() - start
+
+
+def _uncached(text: str) -> object:
+    return planner._match(planner._norm(text))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--unique", type=float, default=0.05, help="share of never-seen-before commands")
+    args = ap.parse_args()
+
+    cmds = _commands(args.n, args.unique)
+    _time(planner.plan, cmds[:1000])  # warm
+
+    uncached_s = _time(_uncached, cmds)
+    cached_s = _time(planner.plan, cmds)
+
+    print(f"commands:        {args.n:,}  (unique share {args.unique:.0%}, {len(planner.RULES)} rules)")
+    print(f"rule table:      {uncached_s:.2f}s  ({args.n / uncached_s:,.0f} plans/s)")
+    print(f"plan() + LRU:    {cached_s:.2f}s  ({args.n / cached_s:,.0f} plans/s, incl. ToolCall copies)")
+    print(f"cache:           {planner.plan_cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark: reply latency while a heavy nightly job is running.
+
+Two topologies with the same total worker slots:
+  - single: every task on one queue, one worker (the old layout)
+  - split:  replies on "realtime", nightly jobs on "batch", one worker per queue
+            (routes/priorities from app.celery_app.TASK_ROUTES)
+
+--heavy nightly-style jobs (sleep --heavy-s each) are queued first, then --probes
+reply-style tasks are sent every --interval-ms; each probe records the time from
+send to start. Workers run in-process (threads pool) on Celery's memory transport
+unless --broker points at a real one.
+
+Run from backend/:
+    python -m bench.bench_queue_isolation
+    python -m bench.bench_queue_isolation --heavy 6 --heavy-s 3 --probes 30
+    python -m bench.bench_queue_isolation --broker redis://localhost:6379/15
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+_ARGS = argparse.ArgumentParser()
+_ARGS.add_argument("--heavy", type=int, default=4)
+_ARGS.add_argument("--heavy-s", type=float, default=2.0)
+_ARGS.add_argument("--probes", type=int, default=20)
+_ARGS.add_argument("--interval-ms", type=float, default=50.0)
+_ARGS.add_argument("--slots", type=int, default=3, help="total worker slots (split: 1 realtime + rest batch)")
+_ARGS.add_argument("--broker", default="memory://")
+ARGS = _ARGS.parse_args()
+
+os.environ["CELERY_BROKER_URL"] = ARGS.broker
+os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
+
+from celery.contrib.testing.worker import start_worker  # noqa: E402
+
+from app.celery_app import TASK_ROUTES, celery_app  # noqa: E402
+
+# memory:// polls once a second by default, which would swamp the measurement
+celery_app.conf.broker_transport_options = {**celery_app.conf.broker_transport_options, "polling_interval": 0.01}
+
+_started: Dict[str, float] = {}
+
+
+@celery_app.task(name="bench.heavy")
+def heavy(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+@celery_app.task(name="bench.probe")
+def probe(key: str, sent_at: float) -> None:
+    _started[key] = time.perf_counter() - sent_at
+
+
+def _pct(sorted_ms: List[float], q: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))]
+
+
+def _scenario(name: str, workers: List[tuple], heavy_opts: Dict, probe_opts: Dict) -> List[float]:
+    _started.clear()
+    ctxs = [
+        start_worker(
+            celery_app,
+            pool="threads",
+            concurrency=c,
+            queues=q,
+            prefetch_multiplier=p,
+            perform_ping_check=False,
+            loglevel="ERROR",
+        )
+        for q, c, p in workers
+    ]
+    for ctx in ctxs:
+        ctx.__enter__()
+    try:
+        for _ in range(ARGS.heavy):
+            heavy.apply_async(args=[ARGS.heavy_s], **heavy_opts)
+        time.sleep(0.2)  # heavy jobs are running / queued before replies arrive
+        for i in range(ARGS.probes):
+            probe.apply_async(args=[f"{name}-{i}", time.perf_counter()], **probe_opts)
+            time.sleep(ARGS.interval_ms / 1000.0)
+
+        deadline = time.monotonic() + ARGS.heavy * ARGS.heavy_s + 30
+        while len(_started) < ARGS.probes and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        for ctx in reversed(ctxs):
+            ctx.__exit__(None, None, None)
+    return sorted(v * 1000.0 for v in _started.values())
+
+
+def _report(name: str, lat: List[float]) -> None:
+    if len(lat) < ARGS.probes:
+        print(f"{name:8s} only {len(lat)}/{ARGS.probes} probes ran", file=sys.stderr)
+    if not lat:
+        return
+    print(
+        f"{name:8s} probe latency ms: p50 {statistics.median(lat):8.1f}  p95 {_pct(lat, 0.95):8.1f}  max {lat[-1]:8.1f}"
+    )
+
+
+def main() -> None:
+    reply_route = TASK_ROUTES["app.tasks.replies.process_message_events"]
+    nightly_route = TASK_ROUTES["app.tasks.jobs.nightly_product_research"]
+
+    # prefetch as in docker-compose (single = Celery's default of 4)
+    single = _scenario("single", [(["default"], ARGS.slots, 4)], {"queue": "default"}, {"queue": "default"})
+    split = _scenario(
+        "split",
+        [(["realtime"], 1, 4), (["batch"], max(1, ARGS.slots - 1), 1)],
+        {"queue": nightly_route["queue"], "priority": nightly_route["priority"]},
+        {"queue": reply_route["queue"], "priority": reply_route["priority"]},
+    )
+
+    print(f"heavy jobs: {ARGS.heavy} x {ARGS.heavy_s:.1f}s   probes: {ARGS.probes} every {ARGS.interval_ms:.0f} ms   "
+          f"slots: {ARGS.slots}   broker: {ARGS.broker}")
+    _report("single", single)
+    _report("split", split)
+
+
+if __name__ == "__main__":
+    main()
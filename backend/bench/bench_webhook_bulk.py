@@ -0,0 +1,119 @@
+"""
+Microbenchmark: storing one large webhook delivery.
+
+Builds a Facebook payload with --items events (messages + comments) and stores
+it with:
+  - legacy: the old handler's write pattern (audit commit, then one ORM add +
+    commit per MessageEvent)
+  - bulk:   webhook_events.store_delivery (one transaction, multi-row inserts,
+    de-dupe markers included, raw body stored once as a compressed blob)
+
+and reports time plus raw-payload bytes written per delivery.
+
+Each run uses a fresh scratch SQLite DB (WAL, as in production).
+
+Run from backend/:
+    python -m bench.bench_webhook_bulk
+    python -m bench.bench_webhook_bulk --items 2000 --rounds 5
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List
+
+_TMP = tempfile.mkdtemp(prefix="bench-webhook-bulk-")
+os.environ["DATABASE_PATH"] = os.path.join(_TMP, "bench.db")
+
+from sqlalchemy import text  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.db import engine, init_db  # noqa: E402
+from app.models import AuditLog, MessageEvent  # noqa: E402
+from app.webhook_events import facebook_events, store_delivery  # noqa: E402
+
+
+def _payload(items: int, tag: str) -> Dict[str, Any]:
+    messages = [
+        {"sender": {"id": f"u{i}"}, "message": {"mid": f"{tag}-m{i}", "text": "price koto? size L ache?"}}
+        for i in range(items // 2)
+    ]
+    changes = [
+        {"field": "feed", "value": {"item": "comment", "verb": "add", "comment_id": f"{tag}-c{i}", "message": "how much?", "from": {"id": f"f{i}"}}}
+        for i in range(items - items // 2)
+    ]
+    return {"object": "page", "entry": [{"id": "page", "messaging": messages, "changes": changes}]}
+
+
+def _legacy(payload: Dict[str, Any]) -> int:
+    n = 0
+    with Session(engine) as session:
+        session.add(AuditLog(event_type="webhook", message="facebook_event", payload=payload))
+        session.commit()
+        for ev in facebook_events(payload):
+            session.add(
+                MessageEvent(
+                    channel=ev.channel, external_id=ev.external_id, from_user=ev.from_user, text=ev.text, meta={"raw": ev.raw}
+                )
+            )
+            session.commit()
+            n += 1
+    return n
+
+
+def _bulk(payload: Dict[str, Any]) -> int:
+    return len(store_delivery("facebook_event", payload, facebook_events(payload)))
+
+
+def _time(fn, items: int, rounds: int, label: str) -> List[float]:
+    out = []
+    for r in range(rounds):
+        payload = _payload(items, f"{label}{r}")
+        t0 = time.perf_counter()
+        stored = fn(payload)
+        out.append((time.perf_counter() - t0) * 1000.0)
+        assert stored == items, (label, stored)
+    return out
+
+
+def _stored_bytes(rounds: int) -> tuple[float, float]:
+    with engine.connect() as conn:
+        q = lambda sql: float(conn.execute(text(sql)).scalar() or 0)  # noqa: E731
+        legacy = q("SELECT SUM(LENGTH(payload)) FROM auditlog WHERE payload NOT LIKE '%raw_blob%'") + q(
+            "SELECT SUM(LENGTH(meta)) FROM messageevent WHERE external_id LIKE 'legacy%'"
+        )
+        bulk = (
+            q("SELECT SUM(LENGTH(payload)) FROM auditlog WHERE payload LIKE '%raw_blob%'")
+            + q("SELECT SUM(LENGTH(meta)) FROM messageevent WHERE external_id LIKE 'bulk%'")
+            + q("SELECT SUM(LENGTH(data)) FROM rawblob")
+        )
+    return legacy / rounds, bulk / rounds
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=500)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    init_db()
+    _bulk(_payload(10, "warm"))
+
+    legacy = _time(_legacy, args.items, args.rounds, "legacy")
+    bulk = _time(_bulk, args.items, args.rounds, "bulk")
+
+    lm, bm = statistics.median(legacy), statistics.median(bulk)
+    print(f"payload:     {args.items} events in one delivery  (median of {args.rounds})")
+    print(f"legacy:      {lm:8.1f} ms  ({lm / args.items:.2f} ms/event)")
+    print(f"bulk:        {bm:8.1f} ms  ({bm / args.items:.3f} ms/event)")
+    print(f"speedup:     {lm / bm:.1f}x")
+    lb, bb = _stored_bytes(args.rounds)
+    print(f"raw bytes:   legacy {lb / 1024:,.0f} KiB  bulk {bb / 1024:,.0f} KiB per delivery ({lb / bb:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
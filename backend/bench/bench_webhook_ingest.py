@@ -0,0 +1,147 @@
+"""
+Load generator: burst of Facebook webhook deliveries, reports ingest latency.
+
+Starts the API with uvicorn on a scratch DB (or targets --url), fires --n
+deliveries with --concurrency in flight, each carrying --messages Messenger
+messages + --comments feed comments with unique ids, and prints p50/p95/p99.
+Replies run in-process (WEBHOOK_REPLY_MODE=local, DRY_RUN=1) unless --url is used.
+
+Run from backend/:
+    python -m bench.bench_webhook_ingest
+    python -m bench.bench_webhook_ingest --n 2000 --concurrency 64 --messages 3
+    python -m bench.bench_webhook_ingest --url http://localhost:8000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+
+def _payload(i: int, messages: int, comments: int) -> Dict[str, Any]:
+    return {
+        "object": "page",
+        "entry": [
+            {
+                "id": "page",
+                "time": int(time.time() * 1000),
+                "messaging": [
+                    {"sender": {"id": f"u{i}-{k}"}, "message": {"mid": f"m{i}-{k}", "text": "price koto? size L ache?"}}
+                    for k in range(messages)
+                ],
+                "changes": [
+                    {
+                        "field": "feed",
+                        "value": {
+                            "item": "comment",
+                            "verb": "add",
+                            "comment_id": f"c{i}-{k}",
+                            "message": "how much?",
+                            "from": {"id": f"f{i}-{k}"},
+                        },
+                    }
+                    for k in range(comments)
+                ],
+            }
+        ],
+    }
+
+
+def _pct(sorted_ms: List[float], q: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(q * len(sorted_ms)))]
+
+
+async def _burst(url: str, n: int, concurrency: int, messages: int, comments: int) -> List[float]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=60.0, limits=limits) as client:
+
+        async def one(i: int) -> None:
+            body = _payload(i, messages, comments)
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/webhooks/facebook", json=body)
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+                r.raise_for_status()
+
+        await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(tmp: str) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update(
+        DATABASE_PATH=os.path.join(tmp, "bench.db"),
+        WEBHOOK_REPLY_MODE="local",
+        DRY_RUN="1",
+        LOG_LEVEL="WARNING",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url + "/api/status", timeout=1.0).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("API did not start")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=500)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--messages", type=int, default=2)
+    ap.add_argument("--comments", type=int, default=1)
+    ap.add_argument("--url", default="")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = None
+        url = args.url
+        if not url:
+            proc, url = _start_server(tmp)
+        try:
+            asyncio.run(_burst(url, 20, 4, args.messages, args.comments))  # warm
+            t0 = time.perf_counter()
+            lat = sorted(asyncio.run(_burst(url, args.n, args.concurrency, args.messages, args.comments)))
+            wall = time.perf_counter() - t0
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(10)
+
+    print(f"deliveries:   {args.n:,}  concurrency {args.concurrency}  "
+          f"events/delivery {args.messages + args.comments}")
+    print(f"throughput:   {args.n / wall:,.0f} deliveries/s  ({wall:.2f}s)")
+    print(f"latency ms:   p50 {statistics.median(lat):.1f}  p95 {_pct(lat, 0.95):.1f}  "
+          f"p99 {_pct(lat, 0.99):.1f}  max {lat[-1]:.1f}")
+
+
+if __name__ == "__main__":
+    main()